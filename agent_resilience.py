@@ -0,0 +1,262 @@
+import asyncio
+import math
+import os
+import time
+import logging
+from collections import deque
+from typing import Any, Awaitable, Callable, Deque, Dict, Optional, Set, Tuple
+
+from metrics import AGENT_CIRCUIT_STATE, AGENT_HEDGES, stage_timer
+
+logger = logging.getLogger(__name__)
+
+# Circuit breaker: abre quando a taxa de erro na janela passa do limite
+BREAKER_ERROR_RATE = float(os.environ.get("AGENT_BREAKER_ERROR_RATE", "0.5"))
+BREAKER_MIN_CALLS = int(os.environ.get("AGENT_BREAKER_MIN_CALLS", "10"))
+BREAKER_WINDOW_SECONDS = float(os.environ.get("AGENT_BREAKER_WINDOW_SECONDS", "60"))
+BREAKER_OPEN_SECONDS = float(os.environ.get("AGENT_BREAKER_OPEN_SECONDS", "30"))
+
+# Hedging: segunda chamada quando a primeira passa do percentil de latência
+HEDGE_ENABLED = os.environ.get("AGENT_HEDGE_ENABLED", "0") == "1"
+HEDGE_PERCENTILE = float(os.environ.get("AGENT_HEDGE_PERCENTILE", "95"))
+HEDGE_MIN_SAMPLES = int(os.environ.get("AGENT_HEDGE_MIN_SAMPLES", "20"))
+LATENCY_WINDOW = int(os.environ.get("AGENT_LATENCY_WINDOW", "200"))
+
+STATE_CLOSED = "closed"
+STATE_HALF_OPEN = "half_open"
+STATE_OPEN = "open"
+
+# Valor exportado em agent_circuit_state
+STATE_VALUES = {STATE_CLOSED: 0, STATE_HALF_OPEN: 1, STATE_OPEN: 2}
+
+
+class CircuitOpenError(Exception):
+    """O circuito do agente está aberto: use o fallback sem chamar o LLM"""
+
+
+class LatencyWindow:
+    """
+    Latências das últimas chamadas bem-sucedidas de um agente
+    """
+
+    def __init__(self, size: int = LATENCY_WINDOW):
+        self.samples: Deque[float] = deque(maxlen=size)
+
+    def add(self, seconds: float):
+        self.samples.append(seconds)
+
+    def percentile(self, p: float) -> float:
+        ordered = sorted(self.samples)
+        rank = max(math.ceil(p / 100 * len(ordered)) - 1, 0)
+        return ordered[rank]
+
+    def __len__(self):
+        return len(self.samples)
+
+
+class CircuitBreaker:
+    """
+    Circuit breaker por taxa de erro.
+
+    Fechado: as chamadas passam e o resultado de cada uma entra na janela de
+    BREAKER_WINDOW_SECONDS. Com pelo menos BREAKER_MIN_CALLS chamadas e taxa
+    de erro >= BREAKER_ERROR_RATE o circuito abre, e as chamadas falham na
+    hora (CircuitOpenError) por BREAKER_OPEN_SECONDS. Depois disso uma única
+    chamada de teste é liberada (meio-aberto): se der certo o circuito fecha,
+    se falhar abre de novo.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        error_rate: float = BREAKER_ERROR_RATE,
+        min_calls: int = BREAKER_MIN_CALLS,
+        window_seconds: float = BREAKER_WINDOW_SECONDS,
+        open_seconds: float = BREAKER_OPEN_SECONDS,
+    ):
+        self.name = name
+        self.error_rate = error_rate
+        self.min_calls = min_calls
+        self.window_seconds = window_seconds
+        self.open_seconds = open_seconds
+
+        self.state = STATE_CLOSED
+        self.opened_at = 0.0
+        self._probe_in_flight = False
+        # (instante, sucesso) das chamadas na janela
+        self._outcomes: Deque[Tuple[float, bool]] = deque()
+
+        self.times_opened = 0
+        self.rejected = 0
+        self._set_state(STATE_CLOSED)
+
+    def _set_state(self, state: str):
+        self.state = state
+        AGENT_CIRCUIT_STATE.labels(self.name).set(STATE_VALUES[state])
+
+    def _trim(self, now: float):
+        while self._outcomes and self._outcomes[0][0] < now - self.window_seconds:
+            self._outcomes.popleft()
+
+    def _open(self, now: float):
+        self._set_state(STATE_OPEN)
+        self.opened_at = now
+        self.times_opened += 1
+        self._outcomes.clear()
+        logger.warning(f"🔌 Circuito do {self.name} aberto por {self.open_seconds:.0f}s")
+
+    def before_call(self):
+        """
+        Libera a chamada ou levanta CircuitOpenError
+        """
+        now = time.monotonic()
+        if self.state == STATE_OPEN:
+            if now < self.opened_at + self.open_seconds:
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuito do {self.name} aberto")
+            self._set_state(STATE_HALF_OPEN)
+            self._probe_in_flight = False
+        if self.state == STATE_HALF_OPEN:
+            if self._probe_in_flight:
+                self.rejected += 1
+                raise CircuitOpenError(f"Circuito do {self.name} em teste")
+            self._probe_in_flight = True
+
+    def record(self, success: bool):
+        now = time.monotonic()
+        if self.state == STATE_HALF_OPEN:
+            self._probe_in_flight = False
+            if success:
+                self._set_state(STATE_CLOSED)
+                logger.info(f"🔌 Circuito do {self.name} fechado")
+            else:
+                self._open(now)
+            return
+        if self.state == STATE_OPEN:
+            return
+
+        self._outcomes.append((now, success))
+        self._trim(now)
+        failures = sum(1 for _, ok in self._outcomes if not ok)
+        if len(self._outcomes) >= self.min_calls and failures / len(self._outcomes) >= self.error_rate:
+            self._open(now)
+
+    def release(self):
+        """
+        Chamada cancelada sem resultado: libera a vaga de teste do meio-aberto
+        """
+        self._probe_in_flight = False
+
+    def stats(self) -> Dict[str, Any]:
+        self._trim(time.monotonic())
+        failures = sum(1 for _, ok in self._outcomes if not ok)
+        return {
+            "state": self.state,
+            "window_calls": len(self._outcomes),
+            "window_error_rate": round(failures / len(self._outcomes), 3) if self._outcomes else 0.0,
+            "times_opened": self.times_opened,
+            "rejected": self.rejected,
+        }
+
+
+class AgentGuard:
+    """
+    Deadline, hedging e circuit breaker em volta das chamadas de um agente.
+
+    run() recebe uma factory que faz uma chamada ao agente (ex.: lambda:
+    agent.run(deps=form_data)). A chamada inteira, hedge incluído, respeita o
+    timeout e levanta asyncio.TimeoutError quando ele estoura. Com hedging
+    ligado (AGENT_HEDGE_ENABLED=1) e latências suficientes na janela, uma
+    segunda chamada é disparada quando a primeira passa do percentil
+    AGENT_HEDGE_PERCENTILE; vale a primeira que terminar com sucesso e a
+    outra é cancelada. Timeouts e erros contam para o circuit breaker, e com
+    o circuito aberto run() levanta CircuitOpenError sem chamar o agente.
+    O estado é por processo.
+    """
+
+    def __init__(self, name: str, stage: str, hedge_enabled: bool = HEDGE_ENABLED):
+        self.name = name
+        self.stage = stage
+        self.hedge_enabled = hedge_enabled
+        self.breaker = CircuitBreaker(name)
+        self.latencies = LatencyWindow()
+
+        self.hedges_launched = 0
+        self.hedges_won = 0
+
+    def hedge_delay(self) -> Optional[float]:
+        """
+        Segundos até o hedge, ou None quando o hedging não se aplica
+        """
+        if not self.hedge_enabled or self.breaker.state != STATE_CLOSED or len(self.latencies) < HEDGE_MIN_SAMPLES:
+            return None
+        return self.latencies.percentile(HEDGE_PERCENTILE)
+
+    async def run(self, factory: Callable[[], Awaitable[Any]], timeout: Optional[float] = None) -> Any:
+        self.breaker.before_call()
+        start = time.perf_counter()
+        with stage_timer(self.stage):
+            try:
+                result = await self._run_hedged(factory, timeout)
+            except asyncio.CancelledError:
+                self.breaker.release()
+                raise
+            except Exception:
+                self.breaker.record(False)
+                raise
+        self.breaker.record(True)
+        self.latencies.add(time.perf_counter() - start)
+        return result
+
+    async def _run_hedged(self, factory: Callable[[], Awaitable[Any]], timeout: Optional[float]) -> Any:
+        loop = asyncio.get_running_loop()
+        deadline = None if timeout is None else loop.time() + timeout
+        delay = self.hedge_delay()
+        hedge_at = None if delay is None else loop.time() + delay
+
+        first = asyncio.ensure_future(factory())
+        attempts: Set[asyncio.Future] = {first}
+        error: Optional[BaseException] = None
+        try:
+            while attempts:
+                now = loop.time()
+                waits = [moment - now for moment in (deadline, hedge_at) if moment is not None]
+                done, attempts = await asyncio.wait(
+                    attempts,
+                    timeout=max(min(waits), 0) if waits else None,
+                    return_when=asyncio.FIRST_COMPLETED,
+                )
+                for attempt in done:
+                    if attempt.exception() is None:
+                        if attempt is not first:
+                            self.hedges_won += 1
+                            AGENT_HEDGES.labels(self.name, "won").inc()
+                        return attempt.result()
+                    error = attempt.exception()
+                if not attempts:
+                    break
+
+                now = loop.time()
+                if deadline is not None and now >= deadline:
+                    raise asyncio.TimeoutError()
+                if hedge_at is not None and now >= hedge_at:
+                    hedge_at = None
+                    self.hedges_launched += 1
+                    AGENT_HEDGES.labels(self.name, "launched").inc()
+                    logger.info(f"🪃 {self.name} passou de {delay:.1f}s, disparando segunda chamada")
+                    attempts.add(asyncio.ensure_future(factory()))
+            raise error
+        finally:
+            for attempt in attempts:
+                attempt.cancel()
+
+    def stats(self) -> Dict[str, Any]:
+        delay = self.hedge_delay()
+        return {
+            **self.breaker.stats(),
+            "hedge_enabled": self.hedge_enabled,
+            "hedge_delay_seconds": round(delay, 2) if delay is not None else None,
+            "latency_samples": len(self.latencies),
+            "hedges_launched": self.hedges_launched,
+            "hedges_won": self.hedges_won,
+        }
@@ -0,0 +1,111 @@
+import re
+import unicodedata
+from functools import lru_cache
+from typing import Dict, Mapping, Optional, Set
+
+_NON_ALNUM = re.compile(r"[^0-9a-z]+")
+# Separa o rótulo do detalhe da resposta ("Alta - Próximos 3 meses", "Crítica! Para ontem")
+_LABEL_SEPARATOR = re.compile(r"\s+-\s+|!")
+
+
+def fold(value: Optional[str]) -> str:
+    """
+    Forma canônica de uma resposta: sem acentos, casefold e só letras/dígitos
+    separados por um espaço ("Usamos relatórios (Excel)" -> "usamos relatorios excel")
+    """
+    if not value:
+        return ""
+    decomposed = unicodedata.normalize("NFKD", value)
+    without_accents = "".join(char for char in decomposed if not unicodedata.combining(char))
+    return _NON_ALNUM.sub(" ", without_accents.casefold()).strip()
+
+
+def label(value: Optional[str]) -> Optional[str]:
+    """
+    Rótulo dobrado de uma resposta com detalhe ("Alta - Próximos 3 meses" -> "alta"),
+    ou None se a resposta não tiver separador
+    """
+    if not value:
+        return None
+    parts = _LABEL_SEPARATOR.split(value, maxsplit=1)
+    if len(parts) < 2:
+        return None
+    return fold(parts[0]) or None
+
+
+class _TrieNode:
+    __slots__ = ("children", "code")
+
+    def __init__(self):
+        self.children: Dict[str, "_TrieNode"] = {}
+        # Código da resposta que termina neste nó
+        self.code: Optional[int] = None
+
+
+class AnswerIndex:
+    """
+    Índice pré-compilado das respostas conhecidas de cada pergunta.
+
+    Mapeia qualquer texto recebido do formulário para o código canônico da
+    resposta (a posição dela no mapa da pergunta), ou None. As respostas
+    são comparadas já dobradas (fold) em uma trie de palavras:
+
+    1. a resposta conhecida mais longa que é prefixo do texto recebido,
+       palavra a palavra ("Usamos relatórios básicos e planilhas (Excel/Google Sheets)");
+    2. senão, o rótulo antes de " - " ou "!", se o texto recebido também
+       tiver o separador e o rótulo for de uma única resposta
+       ("Alta - Gostaríamos de agir..." -> "Alta - Próximos 3 meses").
+
+    Um texto que só começa como uma resposta conhecida ("Custos",
+    "Alta prioridade mas sem data") não é reconhecido.
+
+    Os resultados ficam em cache, então o custo por campo é O(1) para
+    respostas repetidas.
+    """
+
+    def __init__(self, questions: Mapping[str, Mapping[str, float]], cache_size: int = 4096):
+        self.answers: Dict[str, tuple] = {}
+        self._tries: Dict[str, _TrieNode] = {}
+        self._labels: Dict[str, Dict[str, int]] = {}
+        for question, answers in questions.items():
+            self.answers[question] = tuple(answers)
+            root = _TrieNode()
+            labels: Dict[str, Set[int]] = {}
+            for code, answer in enumerate(answers):
+                node = root
+                for token in fold(answer).split():
+                    node = node.children.setdefault(token, _TrieNode())
+                node.code = code
+                answer_label = label(answer)
+                if answer_label is not None:
+                    labels.setdefault(answer_label, set()).add(code)
+            self._tries[question] = root
+            # Rótulos ambíguos (de mais de uma resposta) ficam de fora
+            self._labels[question] = {key: next(iter(codes)) for key, codes in labels.items() if len(codes) == 1}
+        self.lookup = lru_cache(maxsize=cache_size)(self._lookup)
+
+    def _lookup(self, question: str, value: Optional[str]) -> Optional[int]:
+        node = self._tries[question]
+        longest_answer: Optional[int] = None
+        for token in fold(value).split():
+            node = node.children.get(token)
+            if node is None:
+                break
+            if node.code is not None:
+                longest_answer = node.code
+
+        if longest_answer is not None:
+            return longest_answer
+        value_label = label(value)
+        return None if value_label is None else self._labels[question].get(value_label)
+
+    def answer_id(self, question: str, value: Optional[str]) -> Optional[str]:
+        """
+        Id estável da resposta canônica ("maturity:1"), ou None se não reconhecida
+        """
+        code = self.lookup(question, value)
+        return None if code is None else f"{question}:{code}"
+
+    def canonical(self, question: str, value: Optional[str]) -> Optional[str]:
+        code = self.lookup(question, value)
+        return None if code is None else self.answers[question][code]
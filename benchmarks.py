@@ -0,0 +1,358 @@
+#!/usr/bin/env python3
+"""
+Benchmarks do pipeline de diagnóstico (sem chamadas reais à OpenAI)
+
+Uso:
+    python benchmarks.py pipeline [--requests 50] [--latency 0.2]
+    python benchmarks.py render [--iterations 200]
+    python benchmarks.py render-trace [--iterations 200]
+    python benchmarks.py scoring [--requests 10000]
+    python benchmarks.py storage [--requests 200]
+    python benchmarks.py assets [--iterations 10] [--fetch]   (--fetch baixa os assets da CDN para somar ao payload)
+    python benchmarks.py db [--iterations 200]   (requer DB_HOST/DB_USER/DB_PASSWORD ou DATABASE_URL)
+"""
+
+import argparse
+import asyncio
+import logging
+import os
+import statistics
+import time
+from types import SimpleNamespace
+
+# Os agentes pydantic-ai exigem uma chave na importação; os benchmarks usam stubs
+os.environ.setdefault("OPENAI_API_KEY", "benchmark")
+
+from schemas import LeadProfileInput, OpportunitiesOutput
+
+SAMPLE_FORM = {
+    "name": "Maria Silva",
+    "email": "maria.silva@corporate.com",
+    "phone": "11999998888",
+    "sector": "Serviços Profissionais (Consultoria, Advocacia, etc.)",
+    "company_size": "51-250 funcionários",
+    "role": "Gerente/Coordenador(a)",
+    "main_pain": "Processos manuais e repetitivos que consomem muito tempo da equipe",
+    "critical_area": "Financeiro/Cobrança",
+    "pain_quantification": "Nossa equipe gasta umas 30 horas por mês em tarefas de faturamento manual.",
+    "digital_maturity": "Usamos relatórios básicos e planilhas (Excel/Google Sheets)",
+    "investment_capacity": "Até R$ 30.000 (projeto piloto/teste)",
+    "urgency": "Alta - Gostaríamos de agir nos próximos 3 meses"
+}
+
+SAMPLE_REPORT = {
+    "empresa": {"nome": "Nexus Corp"},
+    "scores_radar": {
+        "poder_de_decisao": 8.8,
+        "cultura_e_talentos": 6.5,
+        "processos_e_automacao": 9.2,
+        "inovacao_de_produtos": 7.1,
+        "inteligencia_de_mercado": 5.5
+    },
+    "score_final": 7.4,
+    "introduction": "O setor de tecnologia está passando por uma transformação digital acelerada. " * 4,
+    "relatorio_oportunidades": [
+        {
+            "titulo": f"Oportunidade {i}",
+            "description": "Descrição personalizada da oportunidade para o perfil da empresa. " * 3,
+            "roi": "Redução de 30% nos custos de suporte ao cliente.",
+            "priority": "alta",
+            "case": "Um case de sucesso de uma empresa similar com resultados mensuráveis."
+        }
+        for i in range(3)
+    ],
+    "relatorio_riscos": [
+        {"titulo": "Segurança de Dados", "descricao": "A implementação de IA exige atenção redobrada à segurança dos dados e conformidade com a LGPD."},
+        {"titulo": "Gestão da Mudança", "descricao": "A adoção de novas tecnologias requer uma comunicação clara e treinamento para garantir a adesão da equipe."}
+    ],
+    "data_geracao": None,
+    "ano_atual": None
+}
+
+
+class StubAgent:
+    """Agente falso que simula a latência de uma chamada ao LLM"""
+
+    def __init__(self, latency: float, output):
+        self.latency = latency
+        self.output = output
+
+    async def run(self, *args, **kwargs):
+        await asyncio.sleep(self.latency)
+        return SimpleNamespace(output=self.output)
+
+
+def percentile(samples, pct):
+    ordered = sorted(samples)
+    index = min(len(ordered) - 1, int(round(pct / 100 * (len(ordered) - 1))))
+    return ordered[index]
+
+
+def print_latencies(label, samples):
+    print(f"{label:<14} p50={percentile(samples, 50) * 1000:8.1f}ms  "
+          f"p95={percentile(samples, 95) * 1000:8.1f}ms  "
+          f"mean={statistics.mean(samples) * 1000:8.1f}ms")
+
+
+async def bench_pipeline(args):
+    from pipeline import generate_opportunities, generate_introduction, run_agents, fallback_opportunities
+    from llm_cache import llm_cache
+
+    # Mede a latência dos agentes, não do cache
+    llm_cache.enabled = False
+
+    form_data = LeadProfileInput(**SAMPLE_FORM)
+    opportunity_agent = StubAgent(args.latency, OpportunitiesOutput(opportunities=fallback_opportunities(form_data)))
+    research_agent = StubAgent(args.latency, "Introdução de teste")
+
+    async def sequential():
+        await generate_opportunities(form_data, agent=opportunity_agent)
+        await generate_introduction(form_data, agent=research_agent)
+
+    async def concurrent():
+        await run_agents(form_data, opportunity_agent=opportunity_agent, research_agent=research_agent)
+
+    async def measure(stage):
+        start = time.perf_counter()
+        await stage()
+        return time.perf_counter() - start
+
+    for label, stage in (("sequencial", sequential), ("paralelo", concurrent)):
+        samples = await asyncio.gather(*(measure(stage) for _ in range(args.requests)))
+        print_latencies(label, samples)
+
+
+def time_per_call(fn, iterations):
+    fn()  # aquecimento
+    start = time.perf_counter()
+    for _ in range(iterations):
+        fn()
+    return (time.perf_counter() - start) / iterations
+
+
+async def bench_render(args):
+    import jinja2
+    from render_report import TEMPLATE_DIR, TEMPLATE_NAME, register_report_globals, report_renderer
+
+    def uncached():
+        # Caminho antigo: Environment novo, stat() e compilação a cada chamada
+        env = jinja2.Environment(loader=jinja2.FileSystemLoader(searchpath=TEMPLATE_DIR))
+        register_report_globals(env)
+        os.path.exists(os.path.join(TEMPLATE_DIR, TEMPLATE_NAME))
+        env.get_template(TEMPLATE_NAME).render(SAMPLE_REPORT)
+
+    def cached():
+        report_renderer.get_template().render(SAMPLE_REPORT)
+
+    before = time_per_call(uncached, args.iterations)
+    after = time_per_call(cached, args.iterations)
+    print(f"sem cache      {before * 1000:8.3f}ms/render")
+    print(f"com cache      {after * 1000:8.3f}ms/render  ({before / after:.1f}x)")
+
+
+async def bench_render_trace(args):
+    from render_report import renderizar_relatorio
+    from tracing import tracing
+
+    def render_with(enabled):
+        def render():
+            with tracing(enabled):
+                renderizar_relatorio(SAMPLE_REPORT)
+        return render
+
+    off = time_per_call(render_with(False), args.iterations)
+    on = time_per_call(render_with(True), args.iterations)
+    print(f"trace desligado {off * 1000:8.3f}ms/render")
+    print(f"trace ligado    {on * 1000:8.3f}ms/render  (+{(on - off) * 1000:.3f}ms)")
+
+
+async def bench_scoring(args):
+    import random
+    from scoring import ALL_QUESTIONS_DATA, QUESTION_FIELDS, score_batch, score_lead, scoring_tables
+
+    # Leads sintéticos com respostas sorteadas dos mapas (e algumas fora deles)
+    rng = random.Random(42)
+    base = LeadProfileInput(**SAMPLE_FORM)
+    leads = [
+        base.model_copy(update={
+            field: rng.choice(list(ALL_QUESTIONS_DATA[question]) + ["Outra resposta"])
+            for question, field in QUESTION_FIELDS.items()
+        })
+        for _ in range(args.requests)
+    ]
+
+    start = time.perf_counter()
+    one_by_one = [score_lead(lead) for lead in leads]
+    loop_elapsed = time.perf_counter() - start
+
+    start = time.perf_counter()
+    batch = score_batch(leads)
+    batch_elapsed = time.perf_counter() - start
+
+    # Só o cálculo sobre os códigos (o que o --rescore faz por lote, sem montar Scores)
+    codes = scoring_tables.encode_columns({field: [getattr(lead, field) for lead in leads] for field in QUESTION_FIELDS.values()})
+    start = time.perf_counter()
+    scoring_tables.score_codes(codes)
+    core_elapsed = time.perf_counter() - start
+
+    assert [(s.model_dump(), f) for s, f in one_by_one] == [(s.model_dump(), f) for s, f in batch]
+    print(f"um a um        {loop_elapsed * 1000:8.1f}ms para {len(leads)} leads")
+    print(f"em lote        {batch_elapsed * 1000:8.1f}ms para {len(leads)} leads  ({loop_elapsed / batch_elapsed:.1f}x)")
+    print(f"só NumPy       {core_elapsed * 1000:8.1f}ms para {len(leads)} leads  ({loop_elapsed / core_elapsed:.1f}x)")
+
+
+# <head> e radar da versão anterior do template, carregados de CDNs
+LEGACY_HEAD = """<script src="https://cdn.tailwindcss.com"></script>
+    <script src="https://cdn.jsdelivr.net/npm/chart.js"></script>
+    <style>@import url('https://fonts.googleapis.com/css2?family=Source+Serif+Pro:wght@400;600;700&display=swap');</style>"""
+LEGACY_RADAR = """<canvas id="radarChart"></canvas>
+    <script>new Chart(document.getElementById('radarChart'), {type: 'radar', data: {datasets: [{data: %s}]}});</script>"""
+EXTERNAL_URL_RE = r"(?:src=\"|url\(')(https?://[^\"']+)"
+
+
+async def bench_assets(args):
+    import gzip
+    import re
+    from render_report import renderizar_relatorio, report_renderer
+    from report_assets import offline_url_fetcher, radar_svg
+
+    html = renderizar_relatorio(SAMPLE_REPORT)
+    css = report_renderer.env.globals["css_bundle"]
+    radar = radar_svg(SAMPLE_REPORT["scores_radar"])
+    legacy = html.replace(f"<style>{css}</style>", LEGACY_HEAD).replace(
+        radar, LEGACY_RADAR % list(SAMPLE_REPORT["scores_radar"].values())
+    )
+    variants = (("CDN", legacy, None), ("autocontido", html, offline_url_fetcher))
+
+    for label, content, _ in variants:
+        urls = re.findall(EXTERNAL_URL_RE, content)
+        payload = len(content.encode())
+        line = (f"{label:<12} html={payload / 1024:7.1f}KB  gzip={len(gzip.compress(content.encode())) / 1024:6.1f}KB  "
+                f"externos={len(urls)}")
+        if args.fetch and urls:
+            import httpx
+            async with httpx.AsyncClient(timeout=10, follow_redirects=True) as client:
+                responses = await asyncio.gather(*(client.get(url) for url in urls), return_exceptions=True)
+            payload += sum(len(r.content) for r in responses if isinstance(r, httpx.Response))
+            line += f"  payload total={payload / 1024:7.1f}KB"
+        print(line)
+
+    try:
+        from weasyprint import HTML
+    except Exception as e:  # OSError quando faltam as libs do sistema (pango)
+        print(f"PDF          WeasyPrint indisponível: {e}")
+        return
+
+    iterations = min(args.iterations, 10)
+    for label, content, url_fetcher in variants:
+        kwargs = {"url_fetcher": url_fetcher} if url_fetcher else {}
+        elapsed = time_per_call(lambda: HTML(string=content, **kwargs).write_pdf(), iterations)
+        print(f"PDF {label:<8} {elapsed * 1000:8.1f}ms/conversão")
+
+
+async def bench_storage(args):
+    import datetime
+    from render_report import renderizar_relatorio
+    from report_store import StoredReport, compress_html
+
+    # Por lead só os dados do template são guardados; o template (com o CSS) fica uma vez por versão
+    gerado_em = datetime.datetime.now()
+    reports = [
+        StoredReport("bench", {**SAMPLE_REPORT, "empresa": {"nome": f"Empresa {i}"}}, gerado_em)
+        for i in range(args.requests)
+    ]
+    htmls = [renderizar_relatorio(r.data, gerado_em=gerado_em) for r in reports]
+    raw = sum(len(html.encode("utf-8")) for html in htmls)
+    gzipped = sum(len(compress_html(html)) for html in htmls)
+    stored = sum(r.stored_size for r in reports)
+    print(f"HTML bruto     {raw / len(reports) / 1024:7.1f}KB/lead")
+    print(f"gzip           {gzipped / len(reports) / 1024:7.1f}KB/lead")
+    print(f"dados          {stored / len(reports) / 1024:7.1f}KB/lead  ({raw / stored:.1f}x menor que o HTML)")
+
+
+async def time_per_call_async(fn, iterations):
+    await fn()  # aquecimento
+    start = time.perf_counter()
+    for _ in range(iterations):
+        await fn()
+    return (time.perf_counter() - start) / iterations
+
+
+async def bench_db(args):
+    import queries
+    from database import db_manager
+    from lead_writer import lead_profile_row
+    from schemas import FinalReportData
+    from uuid import uuid4
+
+    if not await db_manager.initialize():
+        raise SystemExit("❌ Banco de dados indisponível")
+
+    form_data = LeadProfileInput(**SAMPLE_FORM)
+    report_data = FinalReportData.model_validate(SAMPLE_REPORT)
+    try:
+        async with db_manager.pool.acquire() as conn:
+            async def db_info_four_queries():
+                await conn.fetchval('SELECT version()')
+                await conn.fetchval('SELECT current_database()')
+                await conn.fetchval('SELECT current_user')
+                await conn.fetchval(
+                    "SELECT EXISTS (SELECT FROM information_schema.tables "
+                    "WHERE table_schema = 'public' AND table_name = 'lead_profiles')"
+                )
+
+            async def db_info_prepared():
+                await queries.fetchrow(conn, queries.SELECT_DB_INFO)
+
+            async def insert_text():
+                await conn.execute(queries.STATEMENTS[queries.INSERT_LEAD_PROFILE], *lead_profile_row(uuid4(), form_data, report_data))
+
+            async def insert_prepared():
+                await queries.execute(conn, queries.INSERT_LEAD_PROFILE, *lead_profile_row(uuid4(), form_data, report_data))
+
+            before = await time_per_call_async(db_info_four_queries, args.iterations)
+            after = await time_per_call_async(db_info_prepared, args.iterations)
+            print(f"db-info 4 queries  {before * 1000:8.3f}ms/req")
+            print(f"db-info preparado  {after * 1000:8.3f}ms/req  ({before / after:.1f}x)")
+
+            # Os inserts são desfeitos no fim para não sujar a tabela
+            transaction = conn.transaction()
+            await transaction.start()
+            try:
+                before = await time_per_call_async(insert_text, args.iterations)
+                after = await time_per_call_async(insert_prepared, args.iterations)
+            finally:
+                await transaction.rollback()
+            print(f"insert texto       {before * 1000:8.3f}ms/req")
+            print(f"insert preparado   {after * 1000:8.3f}ms/req  ({before / after:.1f}x)")
+    finally:
+        await db_manager.close()
+
+
+BENCHMARKS = {
+    "pipeline": bench_pipeline,
+    "render": bench_render,
+    "render-trace": bench_render_trace,
+    "scoring": bench_scoring,
+    "assets": bench_assets,
+    "storage": bench_storage,
+    "db": bench_db,
+}
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("benchmark", choices=sorted(BENCHMARKS))
+    parser.add_argument("--requests", type=int, default=50, help="requisições simultâneas simuladas")
+    parser.add_argument("--latency", type=float, default=0.2, help="latência simulada de cada agente (s)")
+    parser.add_argument("--iterations", type=int, default=200, help="repetições por medição")
+    parser.add_argument("--fetch", action="store_true", help="assets: baixa os recursos externos para medir o payload")
+    args = parser.parse_args()
+
+    # Logs vão para /dev/null, mas continuam sendo formatados como em produção
+    logging.basicConfig(level=logging.INFO, stream=open(os.devnull, "w"))
+    asyncio.run(BENCHMARKS[args.benchmark](args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,228 @@
+#!/usr/bin/env python3
+"""
+Runner offline de diagnósticos em lote
+
+Lê um arquivo JSONL com registros LeadProfileInput (com os aliases do
+formulário) linha a linha, sem carregar o arquivo em memória, e roda o
+mesmo pipeline da API em processo: scoring, agentes (com concorrência
+limitada) e renderização. O HTML de cada lead vai para --output-dir e as
+linhas de lead_profiles são gravadas em lotes pelo LeadWriter.
+
+As linhas concluídas são registradas no checkpoint (por padrão
+<arquivo>.checkpoint) só depois que o lead foi gravado no banco, então
+rodar de novo o mesmo comando retoma de onde parou. Linhas com erro não
+entram no checkpoint e são reprocessadas na próxima execução.
+
+Uso:
+    python bulk_diagnostics.py leads.jsonl [--output-dir relatorios] [--concurrency 4]
+    python bulk_diagnostics.py leads.jsonl --no-db   (só gera os HTMLs)
+"""
+
+import argparse
+import asyncio
+import json
+import os
+import statistics
+import time
+import logging
+from typing import Dict, Iterator, List, Optional, Set, Tuple
+from uuid import UUID, uuid4
+
+from schemas import LeadProfileInput
+
+logger = logging.getLogger(__name__)
+
+
+class Checkpoint:
+    """
+    Números das linhas já concluídas, em um arquivo append-only (uma por linha)
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.done: Set[int] = set()
+        if os.path.exists(path):
+            with open(path, encoding="utf-8") as f:
+                self.done = {int(line) for line in f if line.strip()}
+        self._file = open(path, "a", encoding="utf-8")
+
+    def __contains__(self, line_number: int) -> bool:
+        return line_number in self.done
+
+    def __len__(self):
+        return len(self.done)
+
+    def mark(self, line_numbers: List[int]):
+        self.done.update(line_numbers)
+        self._file.write("".join(f"{n}\n" for n in line_numbers))
+        self._file.flush()
+
+    def close(self):
+        self._file.close()
+
+
+class BulkStats:
+    """
+    Contadores e latências para o relatório de throughput
+    """
+
+    def __init__(self):
+        self.started_at = time.perf_counter()
+        self.completed = 0
+        self.failed = 0
+        self.skipped = 0
+        self.latencies: List[float] = []
+
+    def report(self, final: bool = False):
+        elapsed = time.perf_counter() - self.started_at
+        throughput = self.completed / elapsed if elapsed else 0.0
+        line = (
+            f"{'🏁' if final else '📈'} {self.completed} concluídos, {self.failed} com erro, "
+            f"{self.skipped} já no checkpoint - {elapsed:.1f}s, {throughput:.2f} leads/s"
+        )
+        if self.latencies:
+            ordered = sorted(self.latencies)
+            p95 = ordered[min(len(ordered) - 1, int(round(0.95 * (len(ordered) - 1))))]
+            line += f", p50 {statistics.median(ordered):.2f}s, p95 {p95:.2f}s por lead"
+        logger.info(line)
+
+
+def iter_leads(path: str, checkpoint: Checkpoint, stats: BulkStats) -> Iterator[Tuple[int, LeadProfileInput]]:
+    """
+    Lê o JSONL linha a linha, pulando as linhas do checkpoint e as inválidas
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            if line_number in checkpoint:
+                stats.skipped += 1
+                continue
+            try:
+                form_data = LeadProfileInput.model_validate(json.loads(line))
+            except Exception as e:
+                stats.failed += 1
+                logger.warning(f"⚠️  Linha {line_number} ignorada: {e}")
+                continue
+            yield line_number, form_data
+
+
+def write_html(path: str, html_content: str):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        f.write(html_content)
+    os.replace(tmp_path, path)
+
+
+async def run_bulk(args):
+    from database import db_manager
+    from lead_writer import LeadWriter
+    from llm_usage import collect_llm_usage
+    from pipeline import build_report_data, build_template_data, load_precomputed_catalog, run_agents, score_lead
+    from render_report import renderizar_relatorio, report_renderer
+
+    os.makedirs(args.output_dir, exist_ok=True)
+    checkpoint = Checkpoint(args.checkpoint or f"{args.input}.checkpoint")
+    stats = BulkStats()
+    report_renderer.load()
+    load_precomputed_catalog()
+
+    # lead_id -> (linha do arquivo, HTML), até o LeadWriter confirmar a gravação
+    pending: Dict[UUID, Tuple[int, str]] = {}
+
+    def html_path(line_number: int) -> str:
+        # Nome fixo por linha: reprocessar a linha sobrescreve o arquivo em vez de duplicá-lo
+        return os.path.join(args.output_dir, f"{line_number:06d}.html")
+
+    def on_flush(rows):
+        # O HTML só é escrito depois que a linha está no banco: um insert que
+        # falha não deixa arquivo órfão
+        lines = []
+        for row in rows:
+            line_number, html_content = pending.pop(row[0])
+            write_html(html_path(line_number), html_content)
+            lines.append(line_number)
+        checkpoint.mark(lines)
+
+    writer: Optional[LeadWriter] = None
+    if not args.no_db:
+        if not await db_manager.initialize():
+            raise SystemExit("❌ Banco de dados indisponível (use --no-db para gerar só os HTMLs)")
+        writer = LeadWriter(batch_size=args.batch_size, on_flush=on_flush, spool_path=None)
+        writer.start(db_manager.pool)
+
+    async def process(line_number: int, form_data: LeadProfileInput):
+        start = time.perf_counter()
+        radar_scores, final_score = score_lead(form_data)
+        with collect_llm_usage() as llm_usage:
+            opportunities, introduction_output = await run_agents(form_data)
+        report_data = build_report_data(form_data, radar_scores, final_score, opportunities, introduction_output)
+        html_content = renderizar_relatorio(
+            build_template_data(form_data, report_data, introduction_output), gerado_em=report_data.gerado_em
+        )
+
+        if writer is not None:
+            lead_id = uuid4()
+            pending[lead_id] = (line_number, html_content)
+            await writer.submit(form_data, report_data, lead_id=lead_id, llm_usage=llm_usage.summary())
+        else:
+            await asyncio.to_thread(write_html, html_path(line_number), html_content)
+            checkpoint.mark([line_number])
+        stats.latencies.append(time.perf_counter() - start)
+
+    # Fila limitada: o leitor só avança quando há worker livre
+    queue: asyncio.Queue = asyncio.Queue(maxsize=args.concurrency * 2)
+
+    async def worker():
+        while True:
+            item = await queue.get()
+            if item is None:
+                return
+            line_number, form_data = item
+            try:
+                await process(line_number, form_data)
+                stats.completed += 1
+            except Exception as e:
+                stats.failed += 1
+                logger.error(f"❌ Linha {line_number} falhou: {e}")
+            if (stats.completed + stats.failed) % args.progress_every == 0:
+                stats.report()
+
+    workers = [asyncio.create_task(worker()) for _ in range(args.concurrency)]
+    try:
+        for submitted, item in enumerate(iter_leads(args.input, checkpoint, stats)):
+            if args.limit and submitted >= args.limit:
+                break
+            await queue.put(item)
+        for _ in workers:
+            await queue.put(None)
+        await asyncio.gather(*workers)
+    finally:
+        if writer is not None:
+            await writer.stop()
+            await db_manager.close()
+        checkpoint.close()
+
+    stats.report(final=True)
+    if writer is not None:
+        logger.info(f"🗂️  Banco: {writer.stats()}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="arquivo JSONL com registros LeadProfileInput")
+    parser.add_argument("--output-dir", default="relatorios", help="diretório dos relatórios HTML")
+    parser.add_argument("--concurrency", type=int, default=4, help="leads processados em paralelo")
+    parser.add_argument("--batch-size", type=int, default=50, help="linhas por lote gravado em lead_profiles")
+    parser.add_argument("--checkpoint", help="arquivo de checkpoint (padrão: <input>.checkpoint)")
+    parser.add_argument("--limit", type=int, default=0, help="processa no máximo N leads nesta execução")
+    parser.add_argument("--progress-every", type=int, default=100, help="intervalo (em leads) do relatório de throughput")
+    parser.add_argument("--no-db", action="store_true", help="não grava em lead_profiles")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(run_bulk(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -1,13 +1,86 @@
+import asyncio
 import asyncpg
 import os
+import time
+from contextlib import asynccontextmanager
 from urllib.parse import urlparse
 import logging
-from typing import Optional, Dict, Any
+from typing import Optional, Dict, Any, AsyncIterator
 from dotenv import load_dotenv
+from queries import AppConnection, configure_optional_columns, init_connection
+from metrics import set_pool_gauges
 load_dotenv()
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
+
+class InstrumentedPool:
+    """
+    Envolve o asyncpg.Pool medindo o tempo de espera no acquire e quantas
+    coroutines estão na fila por uma conexão. O acquire usa o timeout
+    configurado, para uma requisição não ficar presa atrás de um pool cheio.
+    Os gauges do pool no /metrics são atualizados a cada mudança de estado.
+    Os demais atributos são repassados ao pool original.
+    """
+
+    def __init__(self, pool: asyncpg.Pool, acquire_timeout: Optional[float] = None):
+        self._pool = pool
+        self.acquire_timeout = acquire_timeout
+        self.waiting = 0
+        self.acquisitions = 0
+        self.acquire_timeouts = 0
+        self.total_wait_seconds = 0.0
+        self.max_wait_seconds = 0.0
+        set_pool_gauges(self.stats())
+
+    def __getattr__(self, name):
+        return getattr(self._pool, name)
+
+    @asynccontextmanager
+    async def acquire(self) -> AsyncIterator[asyncpg.Connection]:
+        self.waiting += 1
+        set_pool_gauges(self.stats())
+        start = time.perf_counter()
+        try:
+            conn = await self._pool.acquire(timeout=self.acquire_timeout)
+        except asyncio.TimeoutError:
+            self.acquire_timeouts += 1
+            logger.warning(f"⚠️  Timeout de {self.acquire_timeout}s esperando conexão do pool")
+            raise
+        finally:
+            self.waiting -= 1
+            set_pool_gauges(self.stats())
+
+        wait = time.perf_counter() - start
+        self.acquisitions += 1
+        self.total_wait_seconds += wait
+        self.max_wait_seconds = max(self.max_wait_seconds, wait)
+        try:
+            yield conn
+        finally:
+            await self._pool.release(conn)
+            set_pool_gauges(self.stats())
+
+    async def close(self):
+        await self._pool.close()
+        set_pool_gauges({})
+
+    def stats(self) -> Dict[str, Any]:
+        size = self._pool.get_size()
+        idle = self._pool.get_idle_size()
+        return {
+            "min_size": self._pool.get_min_size(),
+            "max_size": self._pool.get_max_size(),
+            "size": size,
+            "in_use": size - idle,
+            "idle": idle,
+            "waiting": self.waiting,
+            "acquisitions": self.acquisitions,
+            "acquire_timeouts": self.acquire_timeouts,
+            "avg_acquire_wait_ms": round(self.total_wait_seconds / self.acquisitions * 1000, 3) if self.acquisitions else 0.0,
+            "max_acquire_wait_ms": round(self.max_wait_seconds * 1000, 3),
+        }
+
 class DatabaseManager:
     def get_config_from_env_vars(self) -> Optional[Dict[str, Any]]:
         """
@@ -66,7 +139,18 @@ class DatabaseManager:
             logger.error(f"Erro ao processar variáveis separadas: {e}")
             return None
     def __init__(self):
-        self.pool: Optional[asyncpg.Pool] = None
+        self.pool: Optional[InstrumentedPool] = None
+
+        # Parâmetros do pool - configuráveis via variáveis de ambiente
+        self.min_size = int(os.environ.get("DB_POOL_MIN_SIZE", "2"))
+        self.max_size = int(os.environ.get("DB_POOL_MAX_SIZE", "10"))
+        self.command_timeout = float(os.environ.get("DB_COMMAND_TIMEOUT_SECONDS", "60"))
+        self.connect_timeout = float(os.environ.get("DB_CONNECT_TIMEOUT_SECONDS", "15"))
+        self.acquire_timeout = float(os.environ.get("DB_POOL_ACQUIRE_TIMEOUT_SECONDS", "10"))
+        self.max_inactive_connection_lifetime = float(os.environ.get("DB_POOL_MAX_IDLE_SECONDS", "300"))
+        # Use 0 atrás do pgbouncer em modo transaction (ex.: pooler do Supabase na porta 6543)
+        self.statement_cache_size = int(os.environ.get("DB_STATEMENT_CACHE_SIZE", "100"))
+        self.ssl_mode = os.environ.get("DB_SSL_MODE", "require")
     
     def parse_database_url(self, database_url: str) -> Optional[Dict[str, Any]]:
         """
@@ -138,116 +222,50 @@ class DatabaseManager:
             logger.error(f"URL fornecida: {database_url[:50]}...")  # Mostra apenas o início para segurança
             return None
     
-    async def test_connection(self, db_config: Dict[str, Any]) -> bool:
+    async def create_pool(self, db_config: Dict[str, Any]) -> Optional[asyncpg.Pool]:
         """
-        Testa a conexão com o banco de dados
+        Cria o pool de conexões com os parâmetros de DB_POOL_* e abre as
+        min_size conexões iniciais (warm-up) antes de aceitar requisições.
+        Uma única tentativa, com o modo SSL de DB_SSL_MODE.
         """
         try:
-            logger.info(f"Testando conexão com {db_config['host']}:{db_config['port']}")
-            logger.info(f"Usuário: {db_config['user'][:10]}...")
-            logger.info(f"Database: {db_config['database']}")
-            
-            # Primeira tentativa com SSL obrigatório
-            try:
-                conn = await asyncpg.connect(
-                    host=db_config['host'],
-                    port=db_config['port'],
-                    user=db_config['user'],
-                    password=db_config['password'],
-                    database=db_config['database'],
-                    ssl='require',
-                    command_timeout=15
-                )
-                
-                result = await conn.fetchval('SELECT version()')
-                await conn.close()
-                logger.info(f"✅ Conexão SSL testada com sucesso!")
-                return True
-                
-            except Exception as ssl_error:
-                logger.warning(f"⚠️  Falha com SSL require: {ssl_error}")
-                logger.info("🔄 Tentando com SSL prefer...")
-                
-                # Segunda tentativa com SSL prefer
-                conn = await asyncpg.connect(
-                    host=db_config['host'],
-                    port=db_config['port'],
-                    user=db_config['user'],
-                    password=db_config['password'],
-                    database=db_config['database'],
-                    ssl='prefer',
-                    command_timeout=15
-                )
-                
-                result = await conn.fetchval('SELECT version()')
-                await conn.close()
-                logger.info(f"✅ Conexão SSL prefer testada com sucesso!")
-                return True
-            
+            logger.info(
+                f"🔄 Criando pool de conexões (min {self.min_size}, max {self.max_size}, ssl {self.ssl_mode})..."
+            )
+            pool = await asyncpg.create_pool(
+                host=db_config['host'],
+                port=db_config['port'],
+                user=db_config['user'],
+                password=db_config['password'],
+                database=db_config['database'],
+                ssl=self.ssl_mode,
+                min_size=self.min_size,
+                max_size=self.max_size,
+                command_timeout=self.command_timeout,
+                statement_cache_size=self.statement_cache_size,
+                max_inactive_connection_lifetime=self.max_inactive_connection_lifetime,
+                timeout=self.connect_timeout,
+                connection_class=AppConnection,
+                init=init_connection,
+                server_settings={
+                    'application_name': 'ai-hunter-backend',
+                }
+            )
+            logger.info(f"✅ Pool de conexões criado com {pool.get_size()} conexões abertas!")
+            return pool
+
         except asyncpg.exceptions.InvalidAuthorizationSpecificationError as e:
             logger.error(f"❌ Erro de autenticação: {e}")
             logger.error("   Verifique username/password no Supabase")
-            return False
+            return None
         except asyncpg.exceptions.InvalidCatalogNameError as e:
             logger.error(f"❌ Banco de dados não encontrado: {e}")
             logger.error(f"   Verifique se o banco '{db_config['database']}' existe")
-            return False
+            return None
         except asyncpg.exceptions.CannotConnectNowError as e:
             logger.error(f"❌ Não foi possível conectar: {e}")
             logger.error("   O servidor pode estar indisponível")
-            return False
-        except Exception as e:
-            logger.error(f"❌ Erro inesperado na conexão: {type(e).__name__}: {e}")
-            logger.error(f"   Detalhes do erro: {str(e)}")
-            return False
-    
-    async def create_pool(self, db_config: Dict[str, Any]) -> Optional[asyncpg.Pool]:
-        """
-        Cria o pool de conexões
-        """
-        try:
-            logger.info("🔄 Criando pool de conexões...")
-            
-            # Tenta primeiro com SSL require
-            try:
-                pool = await asyncpg.create_pool(
-                    host=db_config['host'],
-                    port=db_config['port'],
-                    user=db_config['user'],
-                    password=db_config['password'],
-                    database=db_config['database'],
-                    ssl='require',
-                    min_size=1,
-                    max_size=5,
-                    command_timeout=60,
-                    server_settings={
-                        'application_name': 'ai-hunter-backend',
-                    }
-                )
-                logger.info("✅ Pool de conexões criado com SSL require!")
-                return pool
-                
-            except Exception as ssl_error:
-                logger.warning(f"⚠️  Falha ao criar pool com SSL require: {ssl_error}")
-                logger.info("🔄 Tentando pool com SSL prefer...")
-                
-                pool = await asyncpg.create_pool(
-                    host=db_config['host'],
-                    port=db_config['port'],
-                    user=db_config['user'],
-                    password=db_config['password'],
-                    database=db_config['database'],
-                    ssl='prefer',
-                    min_size=1,
-                    max_size=5,
-                    command_timeout=60,
-                    server_settings={
-                        'application_name': 'ai-hunter-backend',
-                    }
-                )
-                logger.info("✅ Pool de conexões criado com SSL prefer!")
-                return pool
-            
+            return None
         except Exception as e:
             logger.error(f"❌ Erro ao criar pool: {type(e).__name__}: {e}")
             logger.error(f"   Detalhes: {str(e)}")
@@ -279,16 +297,16 @@ class DatabaseManager:
                 logger.error("❌ DATABASE_URL malformada.")
                 return False
         
-        # Testa a conexão
-        if not await self.test_connection(db_config):
-            logger.error("❌ Falha no teste de conexão.")
-            return False
-        
-        # Cria o pool
-        self.pool = await self.create_pool(db_config)
-        if not self.pool:
+        # Cria o pool (a criação já valida a conexão)
+        pool = await self.create_pool(db_config)
+        if not pool:
             logger.error("❌ Falha ao criar pool.")
             return False
+        try:
+            await configure_optional_columns(pool)
+        except Exception as e:
+            logger.warning(f"⚠️  Não foi possível verificar o schema de lead_profiles: {e}")
+        self.pool = InstrumentedPool(pool, acquire_timeout=self.acquire_timeout)
         
         logger.info("🎉 Banco de dados conectado com sucesso!")
         return True
@@ -307,6 +325,14 @@ class DatabaseManager:
         """
         return self.pool is not None
 
+    def pool_stats(self) -> Dict[str, Any]:
+        """
+        Métricas do pool (conexões em uso, fila de espera, tempo de acquire)
+        """
+        if not self.pool:
+            return {"status": "disconnected"}
+        return {"status": "connected", **self.pool.stats()}
+
 # Instância global
 db_manager = DatabaseManager()
 
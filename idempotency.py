@@ -0,0 +1,142 @@
+import asyncio
+import hashlib
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Awaitable, Callable, Dict, Optional, Tuple
+
+import orjson
+
+from schemas import LeadProfileInput
+from answer_index import fold
+
+logger = logging.getLogger(__name__)
+
+IDEMPOTENCY_HEADER = "Idempotency-Key"
+
+
+class IdempotencyConflict(Exception):
+    """A mesma Idempotency-Key foi reutilizada com outro formulário"""
+
+
+def form_fingerprint(form_data: LeadProfileInput) -> str:
+    """
+    Hash do formulário normalizado: reenvios que só diferem em acentos,
+    caixa, pontuação ou espaços têm o mesmo fingerprint
+    """
+    normalized = {
+        field: fold(value) if isinstance(value, str) else value
+        for field, value in form_data.model_dump().items()
+    }
+    return hashlib.sha256(orjson.dumps(normalized, option=orjson.OPT_SORT_KEYS)).hexdigest()
+
+
+class IdempotencyStore:
+    """
+    Idempotência e coalescência (single-flight) das submissões.
+
+    A chave vem do header Idempotency-Key ou, sem ele, do fingerprint do
+    formulário. Submissões com a mesma chave enquanto a primeira ainda roda
+    aguardam a mesma task; depois que ela termina com sucesso o resultado
+    fica guardado por IDEMPOTENCY_TTL_SECONDS e é devolvido sem rodar o
+    pipeline de novo (nem gravar outro lead ou enfileirar outro webhook).
+    Erros não são guardados: a próxima tentativa roda normalmente.
+
+    A task roda desacoplada da requisição que a iniciou, então um cliente
+    que desconecta não cancela o trabalho dos que estão esperando.
+    O estado é por processo.
+    """
+
+    def __init__(self):
+        self.enabled = os.environ.get("IDEMPOTENCY_ENABLED", "1") == "1"
+        self.ttl_seconds = float(os.environ.get("IDEMPOTENCY_TTL_SECONDS", "600"))
+        self.max_entries = int(os.environ.get("IDEMPOTENCY_MAX_ENTRIES", "512"))
+
+        self._in_flight: Dict[str, Tuple[str, asyncio.Task]] = {}
+        # chave -> (expira em, fingerprint, resultado)
+        self._completed: "OrderedDict[str, Tuple[float, str, Any]]" = OrderedDict()
+
+        self.executed = 0
+        self.coalesced = 0
+        self.replayed = 0
+        self.conflicts = 0
+
+    def _get_completed(self, key: str) -> Optional[Tuple[str, Any]]:
+        entry = self._completed.get(key)
+        if entry is None:
+            return None
+        expires_at, fingerprint, result = entry
+        if expires_at < time.monotonic():
+            del self._completed[key]
+            return None
+        return fingerprint, result
+
+    def _set_completed(self, key: str, fingerprint: str, result: Any):
+        self._completed[key] = (time.monotonic() + self.ttl_seconds, fingerprint, result)
+        self._completed.move_to_end(key)
+        while len(self._completed) > self.max_entries:
+            self._completed.popitem(last=False)
+
+    def _check_fingerprint(self, key: str, expected: str, fingerprint: str):
+        if expected != fingerprint:
+            self.conflicts += 1
+            raise IdempotencyConflict(f"Idempotency-Key {key} já usada com outro formulário")
+
+    async def run(
+        self,
+        scope: str,
+        form_data: LeadProfileInput,
+        factory: Callable[[], Awaitable[Any]],
+        idempotency_key: Optional[str] = None,
+    ) -> Tuple[Any, bool]:
+        """
+        Executa factory() uma única vez por chave. Retorna (resultado, reaproveitado),
+        onde reaproveitado indica que veio de outra submissão (em andamento ou concluída).
+        """
+        if not self.enabled:
+            return await factory(), False
+
+        fingerprint = form_fingerprint(form_data)
+        key = f"{scope}:{idempotency_key or fingerprint}"
+
+        completed = self._get_completed(key)
+        if completed is not None:
+            self._check_fingerprint(key, completed[0], fingerprint)
+            self.replayed += 1
+            logger.info(f"♻️  Resultado reaproveitado para {key[:48]}")
+            return completed[1], True
+
+        in_flight = self._in_flight.get(key)
+        if in_flight is not None:
+            self._check_fingerprint(key, in_flight[0], fingerprint)
+            self.coalesced += 1
+            logger.info(f"🔗 Submissão coalescida com a que está em andamento ({key[:48]})")
+            return await asyncio.shield(in_flight[1]), True
+
+        task = asyncio.create_task(factory())
+        self._in_flight[key] = (fingerprint, task)
+        self.executed += 1
+
+        def on_done(done: asyncio.Task):
+            self._in_flight.pop(key, None)
+            if not done.cancelled() and done.exception() is None:
+                self._set_completed(key, fingerprint, done.result())
+
+        task.add_done_callback(on_done)
+        return await asyncio.shield(task), False
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "enabled": self.enabled,
+            "in_flight": len(self._in_flight),
+            "completed_entries": len(self._completed),
+            "executed": self.executed,
+            "coalesced": self.coalesced,
+            "replayed": self.replayed,
+            "conflicts": self.conflicts,
+        }
+
+
+# Instância global
+idempotency_store = IdempotencyStore()
@@ -0,0 +1,272 @@
+import asyncio
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, AsyncIterator, Awaitable, Callable, Dict, List, Optional
+from uuid import uuid4
+
+from schemas import LeadProfileInput
+import queries
+
+logger = logging.getLogger(__name__)
+
+# Etapas reportadas no canal de progresso, na ordem em que terminam
+JOB_STAGES = ("scoring", "opportunities", "introduction", "render", "persist", "webhook")
+
+# Valores gravados em lead_profiles.status ao longo do job
+STATUS_QUEUED = "QUEUED"
+STATUS_SCORING = "SCORING"
+STATUS_GENERATING = "GENERATING"
+STATUS_RENDERING = "RENDERING"
+STATUS_PERSISTING = "PERSISTING"
+STATUS_SENDING_WEBHOOK = "SENDING_WEBHOOK"
+STATUS_COMPLETED = "COMPLETED"
+STATUS_FAILED = "FAILED"
+TERMINAL_STATUSES = (STATUS_COMPLETED, STATUS_FAILED)
+INTERMEDIATE_STATUSES = (
+    STATUS_QUEUED, STATUS_SCORING, STATUS_GENERATING, STATUS_RENDERING, STATUS_PERSISTING, STATUS_SENDING_WEBHOOK,
+)
+
+
+class JobsFull(Exception):
+    """Fila de jobs cheia: o cliente deve tentar de novo mais tarde"""
+
+
+class Job:
+    """
+    Estado em memória de um diagnóstico assíncrono
+    """
+
+    def __init__(self, job_id: str, form_data: LeadProfileInput):
+        self.id = job_id
+        self.form_data = form_data
+        self.status = STATUS_QUEUED
+        self.stages: Dict[str, str] = {stage: "pending" for stage in JOB_STAGES}
+        self.error: Optional[str] = None
+        self.html_content: Optional[str] = None
+        # True quando o job tem uma linha em lead_profiles
+        self.persisted = False
+        self.created_at = time.time()
+        self.subscribers: List[asyncio.Queue] = []
+
+    def is_finished(self) -> bool:
+        return self.status in TERMINAL_STATUSES
+
+    def snapshot(self) -> Dict[str, Any]:
+        return {
+            "job_id": self.id,
+            "status": self.status,
+            "stages": dict(self.stages),
+            "error": self.error,
+        }
+
+
+class JobManager:
+    """
+    Executa diagnósticos em background e publica o progresso de cada job.
+
+    O id do job é o id da linha em lead_profiles, criada já no envio com
+    status QUEUED; cada mudança de etapa atualiza essa coluna status. Sem
+    banco, o job vive apenas em memória. Até JOBS_MAX_IN_MEMORY jobs ficam
+    em memória para consulta rápida e para o canal SSE; para abrir espaço
+    saem os jobs terminados mais antigos, nunca um job ainda em andamento.
+
+    Acima de JOBS_MAX_QUEUED jobs pendentes (rodando ou aguardando vaga)
+    submit() recusa novos jobs com JobsFull, assim como quando todos os
+    JOBS_MAX_IN_MEMORY lugares estão com jobs em andamento. Jobs cancelados (ex.: no
+    desligamento) terminam como FAILED, e recover_stale() marca como FAILED
+    as linhas que ficaram em um status intermediário por mais de
+    JOBS_STALE_AFTER_SECONDS (processo derrubado no meio de um job).
+    """
+
+    def __init__(self):
+        self.max_concurrency = int(os.environ.get("JOBS_MAX_CONCURRENCY", "8"))
+        self.max_in_memory = int(os.environ.get("JOBS_MAX_IN_MEMORY", "500"))
+        self.drain_timeout_seconds = float(os.environ.get("JOBS_DRAIN_TIMEOUT_SECONDS", "30"))
+        self.max_queued = int(os.environ.get("JOBS_MAX_QUEUED", "200"))
+        self.stale_after_seconds = float(os.environ.get("JOBS_STALE_AFTER_SECONDS", "900"))
+
+        self.pool = None
+        self.jobs: "OrderedDict[str, Job]" = OrderedDict()
+        self.tasks: set = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def start(self, pool=None):
+        self.pool = pool
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    async def recover_stale(self):
+        """
+        Marca como FAILED os jobs interrompidos por um processo que parou no meio.
+        Só linhas antigas: jobs em andamento em outros workers não são afetados.
+        """
+        if self.pool is None:
+            return
+        try:
+            async with self.pool.acquire() as conn:
+                result = await conn.execute(
+                    """
+                    UPDATE lead_profiles SET status = $1
+                    WHERE status = ANY($2::text[]) AND created_at < now() - make_interval(secs => $3)
+                    """,
+                    STATUS_FAILED, list(INTERMEDIATE_STATUSES), self.stale_after_seconds
+                )
+            recovered = int(result.split()[-1])
+            if recovered:
+                logger.warning(f"⚠️  {recovered} jobs interrompidos marcados como {STATUS_FAILED}")
+        except Exception as e:
+            logger.warning(f"⚠️  Erro ao recuperar jobs interrompidos: {e}")
+
+    async def stop(self):
+        """
+        Aguarda os jobs em andamento (até JOBS_DRAIN_TIMEOUT_SECONDS) e cancela o resto
+        """
+        if not self.tasks:
+            return
+        done, pending = await asyncio.wait(self.tasks, timeout=self.drain_timeout_seconds)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if pending:
+            logger.warning(f"⚠️  {len(pending)} jobs cancelados no desligamento")
+
+    async def _create_row(self, form_data: LeadProfileInput) -> str:
+        async with self.pool.acquire() as conn:
+            lead_id = await queries.fetchval(
+                conn, queries.INSERT_QUEUED_LEAD,
+                form_data.p0_email,
+                form_data.p_phone,
+                form_data.name,
+                form_data.p1_sector,
+                form_data.p2_company_size,
+                form_data.p3_role,
+                form_data.p4_main_pain,
+                form_data.p5_critical_area,
+                form_data.p6_pain_quant,
+                form_data.p7_digital_maturity,
+                form_data.p8_investment,
+                form_data.p9_urgency,
+                STATUS_QUEUED
+            )
+        return str(lead_id)
+
+    async def submit(self, form_data: LeadProfileInput, runner: Callable[[Job], Awaitable[None]]) -> Job:
+        """
+        Registra o job (criando a linha em lead_profiles se houver banco) e o
+        executa em background. Retorna imediatamente.
+        Levanta JobsFull se já houver JOBS_MAX_QUEUED jobs pendentes.
+        """
+        if len(self.tasks) >= self.max_queued:
+            raise JobsFull(f"{len(self.tasks)} jobs pendentes")
+        if not self._make_room():
+            raise JobsFull(f"{len(self.jobs)} jobs em andamento em memória")
+        job_id = None
+        if self.pool is not None:
+            try:
+                job_id = await self._create_row(form_data)
+            except Exception as e:
+                logger.warning(f"⚠️  Erro ao criar linha do job no banco: {e}")
+        job = Job(job_id or str(uuid4()), form_data)
+        job.persisted = job_id is not None
+
+        self.jobs[job.id] = job
+
+        task = asyncio.create_task(self._run(job, runner), name=f"job-{job.id}")
+        self.tasks.add(task)
+        task.add_done_callback(self.tasks.discard)
+        logger.info(f"🧾 Job {job.id} enfileirado")
+        return job
+
+    def _make_room(self) -> bool:
+        """
+        Remove os jobs terminados mais antigos até sobrar lugar para mais um.
+        Retorna False se todos os lugares estão com jobs em andamento
+        """
+        excess = len(self.jobs) - self.max_in_memory + 1
+        if excess <= 0:
+            return True
+        finished = [job_id for job_id, job in self.jobs.items() if job.is_finished()][:excess]
+        for job_id in finished:
+            del self.jobs[job_id]
+        return len(finished) == excess
+
+    async def _run(self, job: Job, runner: Callable[[Job], Awaitable[None]]):
+        try:
+            async with self._semaphore:
+                await runner(job)
+                await self.set_status(job, STATUS_COMPLETED)
+        except asyncio.CancelledError:
+            logger.warning(f"⚠️  Job {job.id} cancelado ({job.status})")
+            job.error = "Job cancelado"
+            await self.set_status(job, STATUS_FAILED)
+            raise
+        except Exception as e:
+            logger.error(f"❌ Job {job.id} falhou: {e}")
+            job.error = str(e)
+            await self.set_status(job, STATUS_FAILED)
+
+    async def set_status(self, job: Job, status: str):
+        """
+        Atualiza o status do job em memória, em lead_profiles.status e no canal de progresso
+        """
+        job.status = status
+        if job.persisted:
+            try:
+                async with self.pool.acquire() as conn:
+                    await queries.execute(conn, queries.UPDATE_LEAD_STATUS, job.id, status)
+            except Exception as e:
+                logger.warning(f"⚠️  Erro ao atualizar status do job {job.id}: {e}")
+        self._publish(job, {"type": "status", "status": status})
+
+    def stage_done(self, job: Job, stage: str):
+        job.stages[stage] = "done"
+        self._publish(job, {"type": "stage", "stage": stage, "state": "done"})
+
+    def _publish(self, job: Job, event: Dict[str, Any]):
+        for queue in job.subscribers:
+            queue.put_nowait(event)
+
+    async def subscribe(self, job: Job) -> AsyncIterator[Dict[str, Any]]:
+        """
+        Eventos de progresso do job: um snapshot inicial e depois cada mudança, até o fim
+        """
+        queue: asyncio.Queue = asyncio.Queue()
+        job.subscribers.append(queue)
+        try:
+            yield {"type": "snapshot", **job.snapshot()}
+            while not job.is_finished():
+                event = await queue.get()
+                yield event
+            while not queue.empty():
+                yield queue.get_nowait()
+        finally:
+            job.subscribers.remove(queue)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "pending": len(self.tasks),
+            "max_queued": self.max_queued,
+            "max_concurrency": self.max_concurrency,
+            "in_memory": len(self.jobs),
+        }
+
+    def get(self, job_id: str) -> Optional[Job]:
+        return self.jobs.get(job_id)
+
+    async def get_persisted_status(self, job_id: str) -> Optional[str]:
+        """
+        Status gravado em lead_profiles, para jobs que já saíram da memória
+        """
+        if self.pool is None:
+            return None
+        try:
+            async with self.pool.acquire() as conn:
+                return await queries.fetchval(conn, queries.SELECT_LEAD_STATUS, job_id)
+        except Exception as e:
+            logger.warning(f"⚠️  Erro ao consultar status do job {job_id}: {e}")
+            return None
+
+
+# Instância global
+job_manager = JobManager()
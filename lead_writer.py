@@ -0,0 +1,391 @@
+import asyncio
+import fcntl
+import json
+import os
+import shutil
+import time
+import logging
+from contextlib import contextmanager
+from typing import Any, Callable, Dict, List, Optional, Tuple
+from uuid import UUID, uuid4
+
+import asyncpg
+
+from schemas import LeadProfileInput, FinalReportData
+import queries
+from metrics import LEAD_WRITER_PENDING, STAGE_PERSIST, STAGE_SECONDS
+
+logger = logging.getLogger(__name__)
+
+# Leads que não puderam ser gravados no banco (regravados quando ele volta)
+DEFAULT_SPOOL_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lead_spool.jsonl")
+# Leads recusados pelo banco (erro nos dados): não são regravados automaticamente
+DEFAULT_REJECTED_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "lead_rejected.jsonl")
+# Posição do ai_full_report_json (RawJSON) na linha de lead_profile_row
+REPORT_JSON_POSITION = 15
+
+def lead_profile_row(
+    lead_id: UUID,
+    form_data: LeadProfileInput,
+    report_data: FinalReportData,
+    status: str = 'COMPLETED',
+    llm_usage: Optional[Dict[str, Any]] = None,
+) -> Tuple:
+    """
+    Parâmetros do INSERT em lead_profiles, na ordem de queries.INSERT_LEAD_PROFILE
+    """
+    return (
+        lead_id,
+        form_data.p0_email,
+        form_data.p_phone,
+        form_data.name,
+        form_data.p1_sector,
+        form_data.p2_company_size,
+        form_data.p3_role,
+        form_data.p4_main_pain,
+        form_data.p5_critical_area,
+        form_data.p6_pain_quant,
+        form_data.p7_digital_maturity,
+        form_data.p8_investment,
+        form_data.p9_urgency,
+        status,
+        report_data.score_final,
+        # Serializado uma única vez; ai_scores_json é extraído dele no próprio INSERT
+        queries.RawJSON(report_data.model_dump_json()),
+        llm_usage,
+    )
+
+
+def spool_line(row: Tuple) -> str:
+    return json.dumps([str(row[0]), *row[1:]], ensure_ascii=False) + "\n"
+
+
+def row_from_spool(line: str) -> Tuple:
+    values = json.loads(line)
+    values[0] = UUID(values[0])
+    values[REPORT_JSON_POSITION] = queries.RawJSON(values[REPORT_JSON_POSITION])
+    return tuple(values)
+
+
+def is_data_error(error: Exception) -> bool:
+    """
+    Erro causado pelas linhas (vale regravar uma a uma), e não pela conexão com o banco
+    """
+    return isinstance(error, asyncpg.PostgresError) and not isinstance(error, asyncpg.PostgresConnectionError)
+
+
+class LeadWriter:
+    """
+    Persistência write-behind dos inserts em lead_profiles.
+
+    As linhas entram em uma fila limitada e um flusher em background grava
+    em lotes com executemany (statement preparado) quando o lote atinge LEAD_WRITER_BATCH_SIZE ou
+    quando passa LEAD_WRITER_FLUSH_INTERVAL_SECONDS, o que vier primeiro.
+    No desligamento tudo que está na fila é gravado.
+
+    submit() nunca bloqueia a requisição: com a fila cheia (banco lento ou
+    fora do ar) ou com o writer parado, a linha vai para um spool local em
+    JSONL. Linhas que falham no flush por falta de conexão também vão para o
+    spool. O spool é regravado no start() e depois de um flush bem-sucedido,
+    no máximo a cada LEAD_WRITER_SPOOL_RETRY_SECONDS. O INSERT é idempotente
+    (ON CONFLICT (id) DO NOTHING), então regravar uma linha já gravada não
+    falha; linhas que o banco recusa (erro nos dados) vão para rejected_path,
+    que não é regravado, em vez de voltar para o spool a cada tentativa.
+
+    Com spool_path=None (runner offline) não há spool: submit() espera
+    vaga na fila (backpressure) e as linhas que falham só são contadas.
+
+    on_flush, se informado, recebe as linhas efetivamente gravadas em cada
+    flush (usado pelo runner offline para o checkpoint).
+    """
+
+    def __init__(
+        self,
+        batch_size: Optional[int] = None,
+        on_flush: Optional[Callable[[List[Tuple]], None]] = None,
+        spool_path: Optional[str] = os.environ.get("LEAD_WRITER_SPOOL_PATH", DEFAULT_SPOOL_PATH),
+        rejected_path: Optional[str] = os.environ.get("LEAD_WRITER_REJECTED_PATH", DEFAULT_REJECTED_PATH),
+    ):
+        self.batch_size = batch_size or int(os.environ.get("LEAD_WRITER_BATCH_SIZE", "50"))
+        self.on_flush = on_flush
+        self.flush_interval_seconds = float(os.environ.get("LEAD_WRITER_FLUSH_INTERVAL_SECONDS", "1"))
+        self.max_pending = int(os.environ.get("LEAD_WRITER_MAX_PENDING", "1000"))
+        self.spool_path = spool_path
+        self.rejected_path = rejected_path
+        self.spool_retry_seconds = float(os.environ.get("LEAD_WRITER_SPOOL_RETRY_SECONDS", "30"))
+        self._last_replay = 0.0
+
+        self.pool = None
+        self.queue: Optional[asyncio.Queue] = None
+        self.flusher: Optional[asyncio.Task] = None
+
+        # Métricas de flush
+        self.batches_flushed = 0
+        self.rows_written = 0
+        self.rows_failed = 0
+        self.rows_spooled = 0
+        self.rows_replayed = 0
+        self.rows_rejected = 0
+        self.last_batch_size = 0
+        self.last_flush_seconds = 0.0
+        self.total_flush_seconds = 0.0
+
+    def start(self, pool):
+        self.pool = pool
+        self.queue = asyncio.Queue(maxsize=self.max_pending)
+        self._last_replay = 0.0
+        self.flusher = asyncio.create_task(self._flush_loop(), name="lead-writer")
+        logger.info(f"🗂️  Lead writer iniciado (lote {self.batch_size}, intervalo {self.flush_interval_seconds}s)")
+
+    async def stop(self):
+        """
+        Sinaliza o flusher para gravar o que ainda estiver na fila e aguarda o fim
+        """
+        if self.flusher is None:
+            return
+        await self.queue.put(None)
+        await self.flusher
+        self.flusher = None
+        LEAD_WRITER_PENDING.set(0)
+        logger.info(f"🔒 Lead writer finalizado ({self.rows_written} linhas gravadas)")
+
+    def is_running(self) -> bool:
+        return self.flusher is not None
+
+    async def submit(
+        self,
+        form_data: LeadProfileInput,
+        report_data: FinalReportData,
+        status: str = 'COMPLETED',
+        lead_id: Optional[UUID] = None,
+        llm_usage: Optional[Dict[str, Any]] = None,
+    ) -> UUID:
+        """
+        Enfileira o insert e retorna o id da linha (gerado aqui, sem round-trip)
+        """
+        lead_id = lead_id or uuid4()
+        row = lead_profile_row(lead_id, form_data, report_data, status, llm_usage)
+        if self.spool_path is None:
+            if not self.is_running():
+                raise RuntimeError("LeadWriter parado")
+            await self.queue.put(row)
+            LEAD_WRITER_PENDING.set(self.queue.qsize())
+            return lead_id
+
+        if not self.is_running():
+            await self._spool([row], "writer parado")
+            return lead_id
+        try:
+            self.queue.put_nowait(row)
+        except asyncio.QueueFull:
+            await self._spool([row], "fila cheia")
+        LEAD_WRITER_PENDING.set(self.queue.qsize())
+        return lead_id
+
+    async def _spool(self, rows: List[Tuple], reason: str):
+        """
+        Grava as linhas no spool local, para regravar quando o banco voltar
+        """
+        if self.spool_path is None:
+            self.rows_failed += len(rows)
+            logger.error(f"❌ {len(rows)} leads não foram salvos ({reason})")
+            return
+        try:
+            await asyncio.to_thread(self._append_spool, rows)
+        except Exception as e:
+            self.rows_failed += len(rows)
+            logger.error(f"❌ {len(rows)} leads perdidos: erro ao gravar no spool ({reason}): {e}")
+            return
+        self.rows_spooled += len(rows)
+        logger.error(f"❌ {len(rows)} leads não gravados no banco ({reason}), guardados em {self.spool_path}")
+
+    @contextmanager
+    def _file_lock(self, suffix: str, blocking: bool = True):
+        """
+        flock em <spool_path><suffix>, compartilhado entre os processos (workers do
+        gunicorn) que usam o mesmo spool. Sem bloquear, produz False se outro processo tem o lock
+        """
+        with open(f"{self.spool_path}{suffix}", "a") as lock_file:
+            try:
+                fcntl.flock(lock_file, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                yield False
+                return
+            try:
+                yield True
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    async def _reject(self, rows: List[Tuple]):
+        """
+        Grava as linhas recusadas pelo banco em rejected_path, fora do spool
+        """
+        if self.spool_path is None or self.rejected_path is None:
+            self.rows_failed += len(rows)
+            logger.error(f"❌ {len(rows)} leads recusados pelo banco não foram salvos")
+            return
+        try:
+            await asyncio.to_thread(self._append_lines, self.rejected_path, rows)
+        except Exception as e:
+            self.rows_failed += len(rows)
+            logger.error(f"❌ {len(rows)} leads perdidos: erro ao gravar em {self.rejected_path}: {e}")
+            return
+        self.rows_rejected += len(rows)
+        logger.error(f"❌ {len(rows)} leads recusados pelo banco, guardados em {self.rejected_path}")
+
+    def _append_spool(self, rows: List[Tuple]):
+        self._append_lines(self.spool_path, rows)
+
+    def _append_lines(self, path: str, rows: List[Tuple]):
+        with self._file_lock(".lock"):
+            with open(path, "a", encoding="utf-8") as f:
+                f.writelines(spool_line(row) for row in rows)
+
+    def _take_spool(self) -> List[Tuple]:
+        """
+        Move o spool para o arquivo .replaying e retorna as linhas a regravar.
+        O .replaying só é apagado depois da regravação: se o processo cair no
+        meio, as linhas são regravadas de novo (o INSERT é idempotente)
+        """
+        replaying = f"{self.spool_path}.replaying"
+        with self._file_lock(".lock"):
+            if os.path.exists(self.spool_path):
+                # Acrescenta (em vez de renomear) para não perder um .replaying que sobrou
+                with open(self.spool_path, encoding="utf-8") as src, open(replaying, "a", encoding="utf-8") as dst:
+                    shutil.copyfileobj(src, dst)
+                    dst.flush()
+                    os.fsync(dst.fileno())
+                os.remove(self.spool_path)
+        if not os.path.exists(replaying):
+            return []
+        with open(replaying, encoding="utf-8") as f:
+            return [row_from_spool(line) for line in f if line.strip()]
+
+    async def _replay_spool(self):
+        """
+        Regrava no banco as linhas do spool. Um processo por vez: os outros
+        workers que compartilham o spool pulam a regravação enquanto ela roda
+        """
+        self._last_replay = time.monotonic()
+        replaying = f"{self.spool_path}.replaying"
+        if self.spool_path is None or not (os.path.exists(self.spool_path) or os.path.exists(replaying)):
+            return
+        with self._file_lock(".replay.lock", blocking=False) as locked:
+            if not locked:
+                return
+            try:
+                rows = await asyncio.to_thread(self._take_spool)
+            except Exception as e:
+                logger.error(f"❌ Erro ao ler o spool de leads: {e}")
+                return
+            logger.info(f"📥 Regravando {len(rows)} leads do spool")
+            failed_before = self.rows_failed
+            for i in range(0, len(rows), self.batch_size):
+                # Cada linha termina gravada, de volta no spool ou em rejected_path
+                written = await self._flush(rows[i:i + self.batch_size])
+                self.rows_replayed += written
+            if self.rows_failed == failed_before:
+                os.remove(replaying)
+            else:
+                logger.error(f"❌ Linhas do spool não foram guardadas, {replaying} mantido para a próxima regravação")
+
+    async def _flush_loop(self):
+        await self._replay_spool()
+        stopping = False
+        while not stopping:
+            row = await self.queue.get()
+            if row is None:
+                break
+            batch = [row]
+            deadline = time.monotonic() + self.flush_interval_seconds
+            while len(batch) < self.batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    row = await asyncio.wait_for(self.queue.get(), remaining)
+                except asyncio.TimeoutError:
+                    break
+                if row is None:
+                    # Desligamento: grava o lote atual e encerra
+                    stopping = True
+                    break
+                batch.append(row)
+            LEAD_WRITER_PENDING.set(self.queue.qsize())
+            written = await self._flush(batch)
+            if written == len(batch) and time.monotonic() - self._last_replay >= self.spool_retry_seconds:
+                await self._replay_spool()
+
+    async def _flush(self, batch: List[Tuple]) -> int:
+        """
+        Grava o lote e retorna quantas linhas foram gravadas no banco
+        """
+        if not batch:
+            return 0
+        start = time.perf_counter()
+        written = batch
+        failed: List[Tuple] = []
+        rejected: List[Tuple] = []
+        try:
+            async with self.pool.acquire() as conn:
+                async with conn.transaction():
+                    await queries.executemany(conn, queries.INSERT_LEAD_PROFILE, batch)
+        except Exception as e:
+            logger.error(f"❌ Erro ao gravar lote de {len(batch)} leads: {e}")
+            written = []
+            if is_data_error(e):
+                # Regrava linha a linha para não perder o lote inteiro por uma linha ruim
+                for row in batch:
+                    try:
+                        async with self.pool.acquire() as conn:
+                            await queries.execute(conn, queries.INSERT_LEAD_PROFILE, *row)
+                        written.append(row)
+                    except Exception as row_error:
+                        # Erro nos dados se repetiria a cada regravação: não volta para o spool
+                        (rejected if is_data_error(row_error) else failed).append(row)
+                        logger.error(f"❌ Lead {row[0]} não foi salvo: {row_error}")
+            else:
+                # Banco fora do ar: tentar linha a linha só travaria o flusher
+                failed = batch
+        if failed:
+            await self._spool(failed, "erro no insert")
+        if rejected:
+            await self._reject(rejected)
+        self.rows_written += len(written)
+        if self.on_flush is not None and written:
+            self.on_flush(written)
+
+        elapsed = time.perf_counter() - start
+        self.batches_flushed += 1
+        self.last_batch_size = len(batch)
+        self.last_flush_seconds = elapsed
+        self.total_flush_seconds += elapsed
+        STAGE_SECONDS.labels(STAGE_PERSIST).observe(elapsed)
+        if failed or rejected:
+            logger.warning(
+                f"⚠️  Lote de {len(batch)} leads: {len(written)} gravados, "
+                f"{len(failed) + len(rejected)} com erro ({elapsed * 1000:.1f}ms)"
+            )
+        else:
+            logger.info(f"✅ Lote de {len(batch)} leads gravado em {elapsed * 1000:.1f}ms")
+        return len(written)
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.is_running(),
+            "pending": self.queue.qsize() if self.queue else 0,
+            "max_pending": self.max_pending,
+            "batches_flushed": self.batches_flushed,
+            "rows_written": self.rows_written,
+            "rows_failed": self.rows_failed,
+            "rows_spooled": self.rows_spooled,
+            "rows_replayed": self.rows_replayed,
+            "rows_rejected": self.rows_rejected,
+            "last_batch_size": self.last_batch_size,
+            "last_flush_ms": round(self.last_flush_seconds * 1000, 2),
+            "avg_flush_ms": round(self.total_flush_seconds / self.batches_flushed * 1000, 2) if self.batches_flushed else 0.0,
+        }
+
+
+# Instância global
+lead_writer = LeadWriter()
@@ -0,0 +1,168 @@
+import hashlib
+import json
+import os
+import time
+import logging
+from collections import OrderedDict
+from typing import Any, Dict, Optional
+
+from schemas import LeadProfileInput
+from answer_index import fold
+from scoring import answer_index
+
+logger = logging.getLogger(__name__)
+
+
+def normalize_answer(value: Optional[str]) -> str:
+    """
+    Normaliza uma resposta do formulário para comparação (acentos, caixa e pontuação)
+    """
+    return fold(value)
+
+
+def canonical_answer(question: str, value: Optional[str]) -> str:
+    """
+    Id da resposta canônica no AnswerIndex ou, se não reconhecida, o texto normalizado
+    """
+    return answer_index.answer_id(question, value) or normalize_answer(value)
+
+
+def prompt_inputs(form_data: LeadProfileInput) -> Dict[str, str]:
+    """
+    Os seis campos do perfil que entram nos system prompts dos agentes
+    """
+    return {
+        "sector": canonical_answer("sector", form_data.p1_sector),
+        "company_size": canonical_answer("size", form_data.p2_company_size),
+        "main_pain": canonical_answer("pain", form_data.p4_main_pain),
+        "critical_area": normalize_answer(form_data.p5_critical_area),
+        "digital_maturity": canonical_answer("maturity", form_data.p7_digital_maturity),
+        "investment_capacity": canonical_answer("investment", form_data.p8_investment),
+    }
+
+
+def cache_key(agent_name: str, model: str, prompt_version: int, form_data: LeadProfileInput) -> str:
+    """
+    Chave content-addressed: hash das entradas normalizadas do prompt + agente/modelo/versão do prompt
+    """
+    material = json.dumps(
+        {
+            "agent": agent_name,
+            "model": model,
+            "prompt_version": prompt_version,
+            "inputs": prompt_inputs(form_data),
+        },
+        sort_keys=True,
+        ensure_ascii=False,
+    )
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+class LLMCache:
+    """
+    Cache das respostas dos agentes de LLM.
+
+    Tier 1: LRU em memória (por processo) com TTL.
+    Tier 2 (opcional, LLM_CACHE_POSTGRES=1): tabela llm_cache no Postgres,
+    compartilhada entre os workers do gunicorn. Um hit no Postgres é
+    promovido para a memória. Os valores vão para a coluna JSONB pelo codec
+    registrado no pool (queries.init_connection).
+    """
+
+    def __init__(self):
+        self.enabled = os.environ.get("LLM_CACHE_ENABLED", "1") == "1"
+        self.max_entries = int(os.environ.get("LLM_CACHE_MAX_ENTRIES", "1024"))
+        self.ttl_seconds = float(os.environ.get("LLM_CACHE_TTL_SECONDS", str(7 * 24 * 3600)))
+        self.use_postgres = os.environ.get("LLM_CACHE_POSTGRES", "0") == "1"
+
+        self.pool = None
+        self._entries: "OrderedDict[str, tuple]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    async def setup(self, pool=None):
+        """
+        Habilita o tier Postgres se configurado e se há pool disponível
+        """
+        if not (self.enabled and self.use_postgres and pool is not None):
+            return
+        try:
+            async with pool.acquire() as conn:
+                await conn.execute("""
+                    CREATE TABLE IF NOT EXISTS llm_cache (
+                        key TEXT PRIMARY KEY,
+                        agent TEXT NOT NULL,
+                        value JSONB NOT NULL,
+                        expires_at TIMESTAMPTZ NOT NULL,
+                        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                    );
+                    DELETE FROM llm_cache WHERE expires_at < now();
+                """)
+            self.pool = pool
+            logger.info("✅ Cache de LLM com tier Postgres habilitado")
+        except Exception as e:
+            logger.warning(f"⚠️  Tier Postgres do cache de LLM indisponível: {e}")
+
+    def _get_local(self, key: str) -> Optional[Any]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        expires_at, value = entry
+        if expires_at < time.monotonic():
+            del self._entries[key]
+            return None
+        self._entries.move_to_end(key)
+        return value
+
+    def _set_local(self, key: str, value: Any, ttl_seconds: float):
+        self._entries[key] = (time.monotonic() + ttl_seconds, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    async def get(self, key: str) -> Optional[Any]:
+        if not self.enabled:
+            return None
+
+        value = self._get_local(key)
+        if value is None and self.pool is not None:
+            try:
+                async with self.pool.acquire() as conn:
+                    row = await conn.fetchrow(
+                        "SELECT value, EXTRACT(EPOCH FROM expires_at - now()) AS ttl FROM llm_cache WHERE key = $1 AND expires_at > now()",
+                        key
+                    )
+                if row is not None:
+                    value = row['value']
+                    self._set_local(key, value, float(row['ttl']))
+            except Exception as e:
+                logger.warning(f"⚠️  Erro ao ler cache de LLM no Postgres: {e}")
+
+        if value is None:
+            self.misses += 1
+        else:
+            self.hits += 1
+        return value
+
+    async def set(self, key: str, agent_name: str, value: Any):
+        if not self.enabled:
+            return
+
+        self._set_local(key, value, self.ttl_seconds)
+        if self.pool is not None:
+            try:
+                async with self.pool.acquire() as conn:
+                    await conn.execute(
+                        """
+                        INSERT INTO llm_cache (key, agent, value, expires_at)
+                        VALUES ($1, $2, $3::jsonb, now() + make_interval(secs => $4))
+                        ON CONFLICT (key) DO UPDATE SET value = EXCLUDED.value, expires_at = EXCLUDED.expires_at
+                        """,
+                        key, agent_name, value, self.ttl_seconds
+                    )
+            except Exception as e:
+                logger.warning(f"⚠️  Erro ao gravar cache de LLM no Postgres: {e}")
+
+
+# Instância global
+llm_cache = LLMCache()
@@ -0,0 +1,122 @@
+import json
+import os
+import logging
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Any, Dict, Iterator, List, Optional
+
+from metrics import LLM_CALLS, LLM_COST_USD, LLM_TOKENS
+
+logger = logging.getLogger(__name__)
+
+# Origem da resposta de um agente
+SOURCE_LLM = "llm"
+SOURCE_CACHE = "cache"
+SOURCE_PRECOMPUTED = "precomputed"
+SOURCE_FALLBACK = "fallback"
+
+# Preço em USD por milhão de tokens. Sobrescreva (ou acrescente modelos) com
+# LLM_PRICES_USD_PER_MTOK='{"openai:gpt-4o": {"input": 2.5, "cached_input": 1.25, "output": 10}}'
+MODEL_PRICES_USD_PER_MTOK: Dict[str, Dict[str, float]] = {
+    "openai:gpt-4o": {"input": 2.50, "cached_input": 1.25, "output": 10.00},
+    "openai:gpt-4o-mini": {"input": 0.15, "cached_input": 0.075, "output": 0.60},
+    "openai:gpt-4.1": {"input": 2.00, "cached_input": 0.50, "output": 8.00},
+    "openai:gpt-4.1-mini": {"input": 0.40, "cached_input": 0.10, "output": 1.60},
+}
+MODEL_PRICES_USD_PER_MTOK.update(json.loads(os.environ.get("LLM_PRICES_USD_PER_MTOK", "{}")))
+
+
+def estimate_cost(model: str, input_tokens: int, cached_input_tokens: int, output_tokens: int) -> float:
+    """
+    Custo estimado de uma chamada em USD (0 para modelos sem preço cadastrado).
+    input_tokens inclui os tokens lidos do cache de prompt do provedor.
+    """
+    prices = MODEL_PRICES_USD_PER_MTOK.get(model)
+    if prices is None:
+        return 0.0
+    uncached = max(input_tokens - cached_input_tokens, 0)
+    cost = (
+        uncached * prices["input"]
+        + cached_input_tokens * prices.get("cached_input", prices["input"])
+        + output_tokens * prices["output"]
+    )
+    return cost / 1_000_000
+
+
+class LlmUsage:
+    """
+    Chamadas de agentes (tokens, latência e custo) de um diagnóstico
+    """
+
+    def __init__(self):
+        self.calls: List[Dict[str, Any]] = []
+
+    def summary(self) -> Dict[str, Any]:
+        """
+        Totais e chamadas, no formato gravado em lead_profiles.ai_llm_usage_json
+        """
+        return {
+            "input_tokens": sum(call["input_tokens"] for call in self.calls),
+            "cached_input_tokens": sum(call["cached_input_tokens"] for call in self.calls),
+            "output_tokens": sum(call["output_tokens"] for call in self.calls),
+            "cost_usd": round(sum(call["cost_usd"] for call in self.calls), 6),
+            "calls": self.calls,
+        }
+
+
+_current_usage: ContextVar[Optional[LlmUsage]] = ContextVar("llm_usage", default=None)
+
+
+@contextmanager
+def collect_llm_usage() -> Iterator[LlmUsage]:
+    """
+    Coleta as chamadas feitas no contexto atual. As tasks dos agentes criadas
+    dentro do bloco herdam o contexto e registram no mesmo LlmUsage, mesmo
+    que terminem depois do bloco.
+    """
+    usage = LlmUsage()
+    token = _current_usage.set(usage)
+    try:
+        yield usage
+    finally:
+        _current_usage.reset(token)
+
+
+def record_llm_call(agent_name: str, model: str, source: str, result: Any = None, latency_seconds: float = 0.0):
+    """
+    Registra uma resposta de agente nas métricas e no LlmUsage do contexto.
+    result é o resultado do agent.run() do pydantic-ai (só para source=llm).
+    """
+    usage = getattr(result, "usage", None)
+    # RunUsage é propriedade no pydantic-ai 2.x e método nas versões anteriores
+    if callable(usage):
+        usage = usage()
+    input_tokens = getattr(usage, "input_tokens", 0) or 0
+    cached_input_tokens = getattr(usage, "cache_read_tokens", 0) or 0
+    output_tokens = getattr(usage, "output_tokens", 0) or 0
+    cost = estimate_cost(model, input_tokens, cached_input_tokens, output_tokens)
+
+    LLM_CALLS.labels(agent_name, source).inc()
+    if usage is not None:
+        LLM_TOKENS.labels(agent_name, "input").inc(input_tokens - cached_input_tokens)
+        LLM_TOKENS.labels(agent_name, "cached_input").inc(cached_input_tokens)
+        LLM_TOKENS.labels(agent_name, "output").inc(output_tokens)
+        LLM_COST_USD.labels(agent_name).inc(cost)
+        logger.info(
+            f"🪙 {agent_name}: {input_tokens} tokens de entrada ({cached_input_tokens} em cache), "
+            f"{output_tokens} de saída, US$ {cost:.4f} em {latency_seconds:.1f}s"
+        )
+
+    current = _current_usage.get()
+    if current is not None:
+        current.calls.append({
+            "agent": agent_name,
+            "model": model,
+            "source": source,
+            "requests": getattr(usage, "requests", 0) or 0,
+            "input_tokens": input_tokens,
+            "cached_input_tokens": cached_input_tokens,
+            "output_tokens": output_tokens,
+            "latency_ms": round(latency_seconds * 1000, 1),
+            "cost_usd": round(cost, 6),
+        })
@@ -1,19 +1,51 @@
-from fastapi import FastAPI, HTTPException
-from fastapi.responses import HTMLResponse
+from fastapi import Depends, FastAPI, HTTPException, Request
+from fastapi.responses import HTMLResponse, Response, StreamingResponse
 from fastapi.middleware.cors import CORSMiddleware
-from render_report import renderizar_relatorio
-from schemas import LeadProfileInput, FinalReportData, Opportunity
-from models import calculate_scores, opportunityTracker, researchAgent
+from render_report import (
+    STREAM_CLOSE, renderizar_relatorio, renderizar_secao_streaming,
+    renderizar_shell_streaming, report_cache, report_renderer,
+)
+from schemas import LeadProfileInput, FinalReportData
+from pipeline import (
+    RISCOS_PADRAO, LeadFormInput, build_report_data, build_template_data, load_precomputed_catalog,
+    opportunity_guard, research_guard, run_agents, score_lead, start_agents,
+)
 from database import db_manager, get_db_pool
-from webhook_service import convert_html_to_pdf_and_send_webhook
+from webhook_service import webhook_dispatcher
+from llm_cache import llm_cache
+from lead_writer import lead_writer
+from report_store import accepts_encoding, compress_html, report_store
+from idempotency import IDEMPOTENCY_HEADER, IdempotencyConflict, idempotency_store
+import queries
+from jobs import (
+    STATUS_GENERATING, STATUS_PERSISTING, STATUS_RENDERING, STATUS_SCORING,
+    STATUS_SENDING_WEBHOOK, Job, JobsFull, job_manager,
+)
+from tracing import TRACE_HEADER, is_tracing, trace, trace_requested, tracing
+from llm_usage import collect_llm_usage
+from prometheus_client import CONTENT_TYPE_LATEST
+from metrics import STAGE_PERSIST, render_metrics, set_webhook_backlog, stage_timer
+import datetime
+import hashlib
+import hmac
 import json
+import os
 import logging
 import asyncio
+from typing import Any, Dict, Optional, Set
+from uuid import UUID
 
 # Configurar logging
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Cache HTTP dos relatórios servidos por id (dados pessoais: só no navegador do lead)
+REPORT_CACHE_MAX_AGE_SECONDS = int(os.environ.get("REPORT_CACHE_MAX_AGE_SECONDS", "300"))
+
+# Endpoints administrativos (dead-letters do webhook): desligados sem ADMIN_TOKEN
+ADMIN_TOKEN = os.environ.get("ADMIN_TOKEN")
+ADMIN_TOKEN_HEADER = "X-Admin-Token"
+
 app = FastAPI(
     title="Diagnóstico IA Hunter v2",
     description="API para qualificação e geração de relatórios com base em dados de formulário.",
@@ -29,16 +61,33 @@ app.add_middleware(
     allow_headers=["*"],
 )
 
+# --- Debug tracing por requisição ---
+@app.middleware("http")
+async def debug_trace_middleware(request: Request, call_next):
+    """
+    Liga o trace de diagnóstico para a requisição quando o header X-Debug-Trace traz o DEBUG_TRACE_TOKEN
+    """
+    with tracing(trace_requested(request.headers.get(TRACE_HEADER))):
+        return await call_next(request)
+
 # --- Events ---
 @app.on_event("startup")
 async def startup_event():
     """
-    Inicializa a conexão com o banco de dados
+    Inicializa a conexão com o banco de dados e o envio de webhooks
     """
     logger.info("🚀 Iniciando aplicação...")
     success = await db_manager.initialize()
+    await webhook_dispatcher.start(pool=db_manager.pool)
+    await llm_cache.setup(pool=db_manager.pool)
+    report_renderer.load()
+    await report_store.setup(db_manager.pool, report_renderer.template_version, report_renderer.template_sources())
+    load_precomputed_catalog()
+    job_manager.start(pool=db_manager.pool)
+    await job_manager.recover_stale()
     
     if success:
+        lead_writer.start(db_manager.pool)
         logger.info("✅ Aplicação iniciada com banco de dados conectado")
     else:
         logger.warning("⚠️  Aplicação iniciada SEM banco de dados")
@@ -46,202 +95,420 @@ async def startup_event():
 @app.on_event("shutdown")
 async def shutdown_event():
     """
-    Fecha a conexão com o banco de dados
+    Aguarda os jobs, grava os leads pendentes, para o envio de webhooks e fecha a conexão com o banco de dados
     """
+    await job_manager.stop()
+    if background_tasks:
+        await asyncio.gather(*background_tasks, return_exceptions=True)
+    await lead_writer.stop()
+    await report_store.stop()
+    await webhook_dispatcher.stop()
     await db_manager.close()
     logger.info("🛑 Aplicação finalizada")
 
+# --- Tarefas em background ---
+
+# Finalizações desacopladas das requisições (aguardadas no shutdown)
+background_tasks: Set[asyncio.Task] = set()
+
+def spawn_background(coro) -> asyncio.Task:
+    """Roda a coroutine fora do ciclo da requisição, mantendo a referência da task"""
+    task = asyncio.create_task(coro)
+    background_tasks.add(task)
+    task.add_done_callback(background_tasks.discard)
+    return task
+
+# --- Report helpers ---
+
+async def save_report(
+    form_data: LeadProfileInput, report_data: FinalReportData, llm_usage: Optional[Dict[str, Any]] = None
+) -> Optional[UUID]:
+    """Enfileira a gravação no banco (write-behind) se disponível, sem falhar a API"""
+    if lead_writer.is_running():
+        lead_id = await lead_writer.submit(form_data, report_data, llm_usage=llm_usage)
+        logger.info(f"✅ Dados enfileirados para o banco com ID: {lead_id}")
+        return lead_id
+    logger.warning("⚠️  Executando sem salvar no banco de dados")
+    return None
+
+def store_report(lead_id: Optional[UUID], template_data: Dict[str, Any], gerado_em: datetime.datetime):
+    """Guarda os dados do relatório do lead para refazer o mesmo HTML depois (em background)"""
+    if lead_id is not None:
+        report_store.submit(lead_id, template_data, gerado_em)
+
+async def enqueue_webhook(form_data: LeadProfileInput, html_content: str):
+    """Grava o envio no outbox do webhook (a entrega ocorre em background)"""
+    form_data_dict = form_data.model_dump(by_alias=True)
+    logger.info("🔄 Enfileirando dados para o webhook...")
+    await webhook_dispatcher.enqueue(form_data_dict, html_content)
+
 # --- API Endpoints ---
 
+async def run_diagnostic(form_data: LeadProfileInput) -> str:
+    """
+    Pipeline completo de um lead: scores, agentes, gravação, HTML e webhook.
+    Retorna o HTML do relatório.
+    """
+    logger.info(f"📝 Processando dados para: {form_data.name}")
+    # 1. Run AI analysis and scoring (independente do DB)
+    radar_scores, final_score = score_lead(form_data)
+
+    # 2-3. Generate opportunities and introduction (agentes em paralelo)
+    with collect_llm_usage() as llm_usage:
+        opportunities, introduction_output = await run_agents(form_data)
+    if is_tracing():
+        trace("agents", oportunidades=len(opportunities), introduction=introduction_output[:100])
+
+    # 4. Consolidate data for the report
+    report_data = build_report_data(form_data, radar_scores, final_score, opportunities, introduction_output)
+
+    # 5. Save to database (se disponível)
+    lead_id = await save_report(form_data, report_data, llm_usage.summary())
+
+    # 6. Render HTML report
+    template_data = build_template_data(form_data, report_data, introduction_output)
+    html_content = renderizar_relatorio(template_data, gerado_em=report_data.gerado_em)
+    logger.info("✅ Relatório HTML gerado com sucesso")
+    store_report(lead_id, template_data, report_data.gerado_em)
+
+    # 7-8. Webhook em background
+    await enqueue_webhook(form_data, html_content)
+    return html_content
+
 @app.post("/api/v2/diagnostico", response_class=HTMLResponse)
-async def run_full_diagnostic_flow(form_data: LeadProfileInput):
+async def run_full_diagnostic_flow(form_data: LeadFormInput, request: Request):
     """
     Receives form data, saves it, runs analysis, updates the record,
     and returns a fully rendered HTML report.
+
+    Reenvios do mesmo formulário (ou com a mesma Idempotency-Key) enquanto
+    o primeiro roda, ou logo depois, recebem o mesmo relatório sem rodar
+    o pipeline de novo.
     """
     
     try:
-        logger.info(f"📝 Processando dados para: {form_data.name}")
-        forms = form_data.dict()
-        # 1. Run AI analysis and scoring (independente do DB)
-        radar_scores, final_score = calculate_scores(forms)
-        logger.info(f"📊 Scores calculados - Final: {final_score}")
-        logger.info(f"📊 Scores radar: {radar_scores.dict()}")
-        
-        # 2. Generate opportunities
-        try:
-            logger.info("💡 Gerando oportunidades...")
-            opportunities_result = await opportunityTracker.run(deps=form_data)
-            if not opportunities_result or not opportunities_result.output:
-                raise Exception("OpportunityTracker retornou resultado vazio")
-            
-            opportunities = opportunities_result.output.opportunities
-            logger.info(f"💡 Geradas {len(opportunities)} oportunidades")
-        except Exception as opp_error:
-            logger.error(f"❌ Erro ao gerar oportunidades: {opp_error}")
-            # Fallback com oportunidades padrão
-            from schemas import Opportunity
-            opportunities = [
-                Opportunity(
-                    titulo="Automação de Processos Básicos",
-                    descricao=f"Implementar soluções de automação para reduzir tarefas manuais na área de {form_data.p5_critical_area}",
-                    roi_estimado="150-200%",
-                    timeline="3-6 meses",
-                    investimento="R$ 25.000 - R$ 50.000"
-                ),
-                Opportunity(
-                    titulo="Análise de Dados Inteligente",
-                    descricao="Desenvolver dashboards e relatórios automatizados para melhorar a tomada de decisão",
-                    roi_estimado="120-180%",
-                    timeline="2-4 meses", 
-                    investimento="R$ 15.000 - R$ 35.000"
-                ),
-                Opportunity(
-                    titulo="Chatbot de Atendimento",
-                    descricao="Implementar assistente virtual para automatizar o atendimento inicial aos clientes",
-                    roi_estimado="100-150%",
-                    timeline="1-3 meses",
-                    investimento="R$ 10.000 - R$ 25.000"
-                )
-            ]
-        
-        # 3. Generate introduction - CORRIGIDO
-        try:
-            logger.info("🔍 Gerando introdução de pesquisa de mercado...")
-            introduction_result = await researchAgent.run("Faça uma introdução para o relatorio com um panorama da IA para empresas como essa", deps=form_data)
-            introduction_output = introduction_result.output if introduction_result and introduction_result.output else None
-            
-            if not introduction_output:
-                raise Exception("ResearchAgent retornou resultado vazio")
-                
-            logger.info("✅ Introdução gerada com sucesso")
-            logger.info(f"Introdução (primeiros 100 chars): {introduction_output[:100]}...")
-        except Exception as intro_error:
-            logger.error(f"❌ Erro ao gerar introdução: {intro_error}")
-            # Fallback com introdução personalizada
-            introduction_output = f"O setor de {form_data.p1_sector} está passando por uma transformação digital acelerada, especialmente para empresas de {form_data.p2_company_size}. A implementação de inteligência artificial neste segmento apresenta oportunidades significativas de otimização, redução de custos e crescimento sustentável. Com o gargalo atual em {form_data.p4_main_pain}, há potencial imediato para soluções que automatizem processos e melhorem a eficiência operacional."
-        
-        # 4. Consolidate data for the report - ESTRUTURA CORRIGIDA
-        report_data = FinalReportData(
-            empresa={"nome": form_data.name or "Sua Empresa"},
-            scores_radar=radar_scores,
-            score_final=final_score,
-            introduction=introduction_output,
-            relatorio_oportunidades=opportunities,
-            relatorio_riscos=[ 
-                {"titulo": "Segurança de Dados", "descricao": "A implementação de IA exige atenção redobrada à segurança dos dados e conformidade com a LGPD."},
-                {"titulo": "Gestão da Mudança", "descricao": "A adoção de novas tecnologias requer uma comunicação clara e treinamento para garantir a adesão da equipe."}
-            ]
+        html_content, replayed = await idempotency_store.run(
+            "diagnostico", form_data, lambda: run_diagnostic(form_data),
+            idempotency_key=request.headers.get(IDEMPOTENCY_HEADER),
         )
 
-        # 5. Save to database (se disponível)
-        if db_manager.is_connected():
-            try:
-                await save_to_database(form_data, report_data)
-                logger.info("✅ Dados salvos no banco com sucesso")
-            except Exception as db_error:
-                logger.warning(f"⚠️  Erro ao salvar no banco: {db_error}")
-                # Não falha a API se não conseguir salvar
-        else:
-            logger.warning("⚠️  Executando sem salvar no banco de dados")
-
-        # 6. Render HTML report - DADOS CORRETOS PARA O TEMPLATE - CORRIGIDO
-        try:
-            template_data = report_data.dict()
-            logger.info(f"🔍 DEBUG - Keys disponíveis em template_data: {list(template_data.keys())}")
-            logger.info(f"🔍 DEBUG - template_data completo: {template_data}")
-        except Exception as dict_error:
-            logger.error(f"❌ Erro ao converter report_data para dict: {dict_error}")
-            # Fallback manual
-            template_data = {}
-        
-        # Garantir que os dados estão na estrutura correta para o template - PROTEÇÃO CONTRA KeyError
-        template_data_fixed = {
-            "empresa": template_data.get("empresa", {"nome": form_data.name or "Sua Empresa"}),
-            "introduction": template_data.get("introduction", introduction_output),  # USAR A VARIÁVEL DIRETA
-            "scores_radar": template_data.get("scores_radar", radar_scores.dict()),  # USAR A VARIÁVEL DIRETA
-            "score_final": template_data.get("score_final", final_score),  # USAR A VARIÁVEL DIRETA
-            "relatorio_oportunidades": template_data.get("relatorio_oportunidades", []),
-            "relatorio_riscos": template_data.get("relatorio_riscos", []),
-            "data_geracao": None,  # Será preenchido pelo render_report
-            "ano_atual": None      # Será preenchido pelo render_report
-        }
-        
-        logger.info(f"📊 Dados finais para template:")
-        logger.info(f"   - score_final: {template_data_fixed['score_final']}")
-        logger.info(f"   - introduction (100 chars): {str(template_data_fixed['introduction'])[:100]}...")
-        logger.info(f"   - scores_radar keys: {list(template_data_fixed['scores_radar'].keys()) if isinstance(template_data_fixed['scores_radar'], dict) else 'NOT_DICT'}")
-        logger.info(f"   - oportunidades count: {len(template_data_fixed['relatorio_oportunidades'])}")
-        
-        html_content = renderizar_relatorio(template_data_fixed)
-        logger.info("✅ Relatório HTML gerado com sucesso")
-        
-        # 7. Convert form_data to dict for webhook
-        form_data_dict = form_data.model_dump(by_alias=True)
-        
-        # 8. Send to webhook in background (não bloqueia a resposta)
-        logger.info("🔄 Enviando dados para webhook em background...")
-        
-        # Usar try/except para não quebrar a API se o webhook falhar
-        try:
-            asyncio.create_task(
-                convert_html_to_pdf_and_send_webhook(form_data_dict, html_content)
-            )
-        except Exception as webhook_error:
-            logger.warning(f"⚠️  Erro ao iniciar task do webhook: {webhook_error}")
-
         # 9. Return HTML immediately
-        return HTMLResponse(content=html_content, status_code=200)
+        return HTMLResponse(
+            content=html_content,
+            status_code=200,
+            headers={"Idempotent-Replayed": "true" if replayed else "false"},
+        )
     
-
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
     except Exception as e:
         logger.error(f"❌ Erro no processamento: {str(e)}")
         import traceback
         traceback.print_exc()
         raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
 
-async def save_to_database(form_data: LeadProfileInput, report_data: FinalReportData):
-    """Helper function to save data to database"""
+async def finalize_streamed_report(
+    form_data: LeadProfileInput, radar_scores, final_score,
+    opportunities_future: "asyncio.Future", introduction_future: "asyncio.Future", llm_usage,
+    gerado_em: datetime.datetime,
+):
+    """Grava o lead, guarda o HTML e enfileira o webhook de um relatório em streaming"""
+    try:
+        opportunities, introduction_output = await asyncio.gather(opportunities_future, introduction_future)
+        # Mesma data do shell já enviado ao cliente
+        report_data = build_report_data(
+            form_data, radar_scores, final_score, opportunities, introduction_output, gerado_em=gerado_em
+        )
+        lead_id = await save_report(form_data, report_data, llm_usage.summary())
+        template_data = build_template_data(form_data, report_data, introduction_output)
+        html_content = renderizar_relatorio(template_data, gerado_em=gerado_em)
+        store_report(lead_id, template_data, gerado_em)
+        await enqueue_webhook(form_data, html_content)
+    except Exception as e:
+        logger.error(f"❌ Erro ao finalizar relatório em streaming: {e}")
+
+@app.post("/api/v2/diagnostico/stream", response_class=HTMLResponse)
+async def stream_diagnostic_flow(form_data: LeadFormInput):
+    """
+    Mesma análise de /api/v2/diagnostico, mas em streaming: o shell do
+    relatório (capa, score final, radar, riscos e CTA) é enviado assim que
+    os scores ficam prontos, e a introdução e as oportunidades são enviadas
+    conforme cada agente termina. Persistência e webhook rodam em background
+    quando os dois agentes terminam, mesmo que o cliente desconecte.
+    """
+    try:
+        logger.info(f"📝 Processando dados (streaming) para: {form_data.name}")
+        radar_scores, final_score = score_lead(form_data)
+        gerado_em = datetime.datetime.now()
+        shell_html = renderizar_shell_streaming({
+            "empresa": {"nome": form_data.name or "Sua Empresa"},
+            "scores_radar": radar_scores.dict(),
+            "score_final": final_score,
+            "relatorio_riscos": RISCOS_PADRAO,
+        }, gerado_em=gerado_em)
+    except Exception as e:
+        logger.error(f"❌ Erro no processamento: {str(e)}")
+        raise HTTPException(status_code=500, detail=f"An unexpected error occurred: {str(e)}")
+
+    with collect_llm_usage() as llm_usage:
+        opportunities_future, introduction_future = start_agents(form_data)
+    # A finalização não depende da conexão: se o cliente desconectar, o lead
+    # ainda é gravado e o webhook enviado quando os agentes terminarem
+    spawn_background(finalize_streamed_report(
+        form_data, radar_scores, final_score, opportunities_future, introduction_future, llm_usage, gerado_em
+    ))
+
+    async def report_stream():
+        sections = {opportunities_future: "oportunidades", introduction_future: "introducao"}
+        try:
+            yield shell_html
+
+            pending = set(sections)
+            while pending:
+                done, pending = await asyncio.wait(pending, return_when=asyncio.FIRST_COMPLETED)
+                for future in done:
+                    if sections[future] == "oportunidades":
+                        dados_secao = {"relatorio_oportunidades": [o.dict() for o in future.result()]}
+                    else:
+                        dados_secao = {"introduction": future.result()}
+                    yield renderizar_secao_streaming(sections[future], dados_secao)
+
+            yield STREAM_CLOSE
+        except (asyncio.CancelledError, GeneratorExit):
+            logger.warning(f"⚠️  Cliente desconectou do streaming de {form_data.name}; o relatório será finalizado em background")
+            raise
+
+    return StreamingResponse(
+        report_stream(),
+        media_type="text/html; charset=utf-8",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-store"},
+    )
+
+# --- Jobs assíncronos ---
+
+async def run_diagnostic_job(job: Job):
+    """
+    Executa o pipeline completo de um job, publicando o progresso de cada etapa
+    """
+    form_data = job.form_data
+
+    await job_manager.set_status(job, STATUS_SCORING)
+    radar_scores, final_score = score_lead(form_data)
+    job_manager.stage_done(job, "scoring")
+
+    await job_manager.set_status(job, STATUS_GENERATING)
+    with collect_llm_usage() as llm_usage:
+        opportunities_future, introduction_future = start_agents(form_data)
+    opportunities_future.add_done_callback(lambda _: job_manager.stage_done(job, "opportunities"))
+    introduction_future.add_done_callback(lambda _: job_manager.stage_done(job, "introduction"))
+    opportunities, introduction_output = await asyncio.gather(opportunities_future, introduction_future)
+    report_data = build_report_data(form_data, radar_scores, final_score, opportunities, introduction_output)
+
+    await job_manager.set_status(job, STATUS_RENDERING)
+    template_data = build_template_data(form_data, report_data, introduction_output)
+    job.html_content = renderizar_relatorio(template_data, gerado_em=report_data.gerado_em)
+    job_manager.stage_done(job, "render")
+
+    await job_manager.set_status(job, STATUS_PERSISTING)
+    if job.persisted:
+        await update_lead_report(job.id, report_data, llm_usage.summary())
+        store_report(UUID(str(job.id)), template_data, report_data.gerado_em)
+    job_manager.stage_done(job, "persist")
+
+    await job_manager.set_status(job, STATUS_SENDING_WEBHOOK)
+    await enqueue_webhook(form_data, job.html_content)
+    job_manager.stage_done(job, "webhook")
+
+@app.post("/api/v2/diagnostico/jobs", status_code=202)
+async def submit_diagnostic_job(form_data: LeadFormInput, request: Request):
+    """
+    Enfileira um diagnóstico e retorna o id do job imediatamente.
+    Reenvios idempotentes recebem o mesmo job.
+    """
+    async def submit():
+        job = await job_manager.submit(form_data, run_diagnostic_job)
+        base_url = f"/api/v2/diagnostico/jobs/{job.id}"
+        return {
+            "job_id": job.id,
+            "status": job.status,
+            "status_url": base_url,
+            "events_url": f"{base_url}/events",
+            "report_url": f"{base_url}/report",
+        }
+
+    try:
+        submitted, replayed = await idempotency_store.run(
+            "jobs", form_data, submit, idempotency_key=request.headers.get(IDEMPOTENCY_HEADER)
+        )
+    except IdempotencyConflict as e:
+        raise HTTPException(status_code=422, detail=str(e))
+    except JobsFull as e:
+        logger.warning(f"⚠️  Job recusado, fila cheia: {e}")
+        raise HTTPException(status_code=503, detail="Fila de diagnósticos cheia, tente novamente", headers={"Retry-After": "30"})
+
+    job = job_manager.get(submitted["job_id"])
+    return {**submitted, "status": job.status if job else submitted["status"], "replayed": replayed}
+
+@app.get("/api/v2/diagnostico/jobs/{job_id}")
+async def get_diagnostic_job(job_id: str):
+    """Status e etapas concluídas de um job"""
+    job = job_manager.get(job_id)
+    if job is not None:
+        return job.snapshot()
+
+    status = await job_manager.get_persisted_status(job_id)
+    if status is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    return {"job_id": job_id, "status": status}
+
+@app.get("/api/v2/diagnostico/jobs/{job_id}/events")
+async def stream_diagnostic_job_events(job_id: str):
+    """Canal SSE com o progresso do job, até COMPLETED ou FAILED"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+
+    async def event_stream():
+        async for event in job_manager.subscribe(job):
+            yield f"event: {event['type']}\ndata: {json.dumps(event, ensure_ascii=False)}\n\n"
+
+    return StreamingResponse(
+        event_stream(),
+        media_type="text/event-stream",
+        headers={"X-Accel-Buffering": "no", "Cache-Control": "no-store"},
+    )
+
+@app.get("/api/v2/diagnostico/jobs/{job_id}/report", response_class=HTMLResponse)
+async def get_diagnostic_job_report(job_id: str):
+    """Relatório HTML de um job concluído"""
+    job = job_manager.get(job_id)
+    if job is None:
+        raise HTTPException(status_code=404, detail="Job não encontrado")
+    if job.html_content is None:
+        raise HTTPException(status_code=409, detail=f"Relatório ainda não disponível (status: {job.status})")
+    return HTMLResponse(content=job.html_content, status_code=200)
+
+async def update_lead_report(lead_id: str, report_data: FinalReportData, llm_usage: Optional[Dict[str, Any]] = None):
+    """Grava o resultado da análise na linha criada no envio do job"""
     pool = await get_db_pool()
     if not pool:
         raise Exception("Database pool not available")
-    
+
+    with stage_timer(STAGE_PERSIST):
+        async with pool.acquire() as conn:
+            await queries.execute(
+                conn, queries.UPDATE_LEAD_REPORT,
+                lead_id,
+                report_data.score_final,
+                queries.RawJSON(report_data.model_dump_json()),
+                llm_usage,
+            )
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Compara o If-None-Match (lista de ETags ou *) com o ETag atual"""
+    if not if_none_match:
+        return False
+    candidates = {candidate.strip().removeprefix("W/") for candidate in if_none_match.split(",")}
+    return "*" in candidates or etag in candidates
+
+def report_generated_at(report: Dict[str, Any], created_at: Optional[datetime.datetime]) -> datetime.datetime:
+    """
+    Horário local da renderização original: o gravado no relatório, ou (relatórios
+    antigos) o created_at da linha convertido do UTC para o fuso do servidor
+    """
+    if report.get("gerado_em"):
+        return datetime.datetime.fromisoformat(report["gerado_em"])
+    if created_at is None:
+        return datetime.datetime.now()
+    return created_at.astimezone() if created_at.tzinfo else created_at
+
+def report_etag(report_hash: str, gerado_em: datetime.datetime) -> str:
+    """ETag forte de um relatório: o HTML só muda com os dados, o template ou a data de geração"""
+    material = f"{report_renderer.template_version}:{report_hash}:{gerado_em:%Y-%m-%d}"
+    return f'"{hashlib.sha256(material.encode()).hexdigest()[:32]}"'
+
+@app.get("/api/v2/reports/{lead_id}", response_class=HTMLResponse)
+async def get_report(lead_id: UUID, request: Request):
+    """
+    Relatório já gerado de um lead, renderizado a partir de
+    ai_full_report_json (sem rodar os agentes de novo). Responde 304 para
+    If-None-Match com o ETag atual e guarda os HTMLs mais pedidos em um LRU.
+    """
+    pool = await get_db_pool()
+    if not pool:
+        raise HTTPException(status_code=503, detail="Banco de dados indisponível")
+
     async with pool.acquire() as conn:
-        try:
-            async with conn.transaction():
-                # Ajustado para corresponder exatamente ao schema
-                lead_id = await conn.fetchval(
-                    """
-                    INSERT INTO lead_profiles (
-                        lead_email, lead_phone, name, 
-                        raw_p1_sector, raw_p2_company_size, raw_p3_role, 
-                        raw_p4_main_pain, raw_p5_critical_area, raw_p6_pain_quant,
-                        raw_p7_digital_maturity, raw_p8_investment, raw_p9_urgency, 
-                        status, ai_score_final, ai_scores_json, ai_full_report_json
-                    ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, $16)
-                    RETURNING id
-                    """,
-                    form_data.p0_email, 
-                    form_data.p_phone, 
-                    form_data.name,
-                    form_data.p1_sector, 
-                    form_data.p2_company_size, 
-                    form_data.p3_role,
-                    form_data.p4_main_pain, 
-                    form_data.p5_critical_area, 
-                    form_data.p6_pain_quant,
-                    form_data.p7_digital_maturity, 
-                    form_data.p8_investment, 
-                    form_data.p9_urgency,
-                    'COMPLETED',  # status
-                    report_data.score_final,
-                    json.dumps(report_data.scores_radar.dict()),
-                    json.dumps(report_data.dict())
-                )
-                logger.info(f"✅ Dados salvos no banco com ID: {lead_id}")
-        except Exception as e:
-            logger.error(f"❌ Erro ao salvar no banco: {e}")
-            raise
+        row = await queries.fetchrow(conn, queries.SELECT_LEAD_REPORT, lead_id)
+    if row is None:
+        raise HTTPException(status_code=404, detail="Relatório não encontrado")
+    report = row["ai_full_report_json"]
+    if report is None:
+        raise HTTPException(status_code=409, detail="Relatório ainda não disponível")
+
+    gerado_em = report_generated_at(report, row["created_at"])
+    etag = report_etag(row["report_hash"], gerado_em)
+    headers = {"ETag": etag, "Cache-Control": f"private, max-age={REPORT_CACHE_MAX_AGE_SECONDS}"}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    html_content = report_cache.get(etag)
+    if html_content is None:
+        # Relatórios gravados antes da introdução fazer parte do JSON ficam sem ela
+        html_content = renderizar_relatorio({**report, "introduction": report.get("introduction") or ""}, gerado_em=gerado_em)
+        report_cache.set(etag, html_content)
+    return HTMLResponse(content=html_content, headers=headers)
+
+@app.get("/api/v2/reports/{lead_id}/html", response_class=HTMLResponse)
+async def get_stored_report_html(lead_id: UUID, request: Request):
+    """
+    HTML guardado de um lead, refeito com o template da versão em que foi
+    gerado. O ETag é o hash dos dados, da versão e da data de geração, com
+    o sufixo -gzip na versão comprimida; o HTML fica no LRU pelo ETag.
+    """
+    try:
+        report = await report_store.get(lead_id)
+    except Exception as e:
+        logger.error(f"❌ Erro ao buscar relatório {lead_id}: {e}")
+        raise HTTPException(status_code=503, detail="Armazenamento de relatórios indisponível")
+    if report is None:
+        raise HTTPException(status_code=404, detail="Relatório não encontrado")
+
+    use_gzip = accepts_encoding(request.headers.get("accept-encoding"), "gzip")
+    etag = report.gzip_etag if use_gzip else report.etag
+    headers = {"ETag": etag, "Vary": "Accept-Encoding", "X-Template-Version": report.template_version or ""}
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(status_code=304, headers=headers)
+
+    html_content = report_cache.get(report.etag)
+    if html_content is None:
+        html_content = await report_store.render(report)
+        report_cache.set(report.etag, html_content)
+    if use_gzip:
+        body = compress_html(html_content, report_store.compression_level)
+        return Response(body, media_type="text/html; charset=utf-8", headers={**headers, "Content-Encoding": "gzip"})
+    return HTMLResponse(content=html_content, headers=headers)
+
+def require_admin(request: Request):
+    """Exige o header X-Admin-Token igual a ADMIN_TOKEN; sem ADMIN_TOKEN a rota não existe"""
+    if not ADMIN_TOKEN:
+        raise HTTPException(status_code=404, detail="Not Found")
+    token = request.headers.get(ADMIN_TOKEN_HEADER) or ""
+    if not hmac.compare_digest(token.encode(), ADMIN_TOKEN.encode()):
+        raise HTTPException(status_code=401, detail="Token de administração inválido")
+
+@app.get("/api/v2/webhooks/dead-letters", dependencies=[Depends(require_admin)])
+async def list_webhook_dead_letters(limit: int = 50):
+    """Lista as entregas de webhook que esgotaram as tentativas"""
+    return {"items": await webhook_dispatcher.list_dead_letters(limit)}
+
+@app.post("/api/v2/webhooks/dead-letters/{dead_letter_id}/replay", dependencies=[Depends(require_admin)])
+async def replay_webhook_dead_letter(dead_letter_id: int):
+    """Reenvia uma entrega da dead-letter, devolvendo-a ao outbox"""
+    item_id = await webhook_dispatcher.replay_dead_letter(dead_letter_id)
+    if item_id is None:
+        raise HTTPException(status_code=404, detail="Dead-letter não encontrado")
+    return {"status": "requeued", "outbox_id": item_id}
 
 @app.get("/")
 def read_root():
@@ -268,11 +535,57 @@ async def test_database():
     try:
         pool = await get_db_pool()
         async with pool.acquire() as conn:
-            result = await conn.fetchval('SELECT NOW()')
+            result = await queries.fetchval(conn, queries.SELECT_NOW)
             return {"status": "success", "timestamp": str(result)}
     except Exception as e:
         return {"status": "error", "message": str(e)}
 
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Métricas no formato do Prometheus (latência por etapa, fallbacks, pool e backlog)"""
+    try:
+        webhook_backlog = await webhook_dispatcher.backlog()
+    except Exception as e:
+        logger.warning(f"⚠️  Backlog do webhook indisponível para /metrics: {e}")
+        webhook_backlog = 0
+    set_webhook_backlog(webhook_backlog)
+    return Response(render_metrics(), media_type=CONTENT_TYPE_LATEST)
+
+@app.get("/db-pool-info")
+async def database_pool_info():
+    """Métricas do pool de conexões (em uso, fila de espera, tempo de acquire)"""
+    return db_manager.pool_stats()
+
+@app.get("/jobs-info")
+async def jobs_info():
+    """Jobs pendentes e limites da fila"""
+    return job_manager.stats()
+
+@app.get("/lead-writer-info")
+async def lead_writer_info():
+    """Métricas da gravação em lote de lead_profiles"""
+    return lead_writer.stats()
+
+@app.get("/report-store-info")
+async def report_store_info():
+    """Métricas do armazenamento dos relatórios"""
+    return report_store.stats()
+
+@app.get("/idempotency-info")
+async def idempotency_info():
+    """Submissões executadas, coalescidas e reaproveitadas"""
+    return idempotency_store.stats()
+
+@app.get("/agent-resilience-info")
+async def agent_resilience_info():
+    """Circuit breaker e hedging de cada agente"""
+    return {"opportunityTracker": opportunity_guard.stats(), "researchAgent": research_guard.stats()}
+
+@app.get("/report-cache-info")
+async def report_cache_info():
+    """Métricas do LRU de relatórios renderizados (GET /api/v2/reports/{id})"""
+    return report_cache.stats()
+
 @app.get("/db-info")
 async def database_info():
     """Endpoint para obter informações sobre o banco"""
@@ -282,26 +595,15 @@ async def database_info():
     try:
         pool = await get_db_pool()
         async with pool.acquire() as conn:
-            # Informações básicas
-            version = await conn.fetchval('SELECT version()')
-            current_db = await conn.fetchval('SELECT current_database()')
-            user = await conn.fetchval('SELECT current_user')
-            
-            # Verificar se a tabela existe
-            table_exists = await conn.fetchval("""
-                SELECT EXISTS (
-                    SELECT FROM information_schema.tables 
-                    WHERE table_schema = 'public' 
-                    AND table_name = 'lead_profiles'
-                )
-            """)
+            # Versão, banco, usuário e existência da tabela em um único round-trip
+            info = await queries.fetchrow(conn, queries.SELECT_DB_INFO)
             
             return {
                 "status": "connected",
-                "database": current_db,
-                "user": user,
-                "version": version.split()[0:2],  # Mostra só PostgreSQL X.X
-                "table_lead_profiles_exists": table_exists
+                "database": info["database"],
+                "user": info["user"],
+                "version": info["version"].split()[0:2],  # Mostra só PostgreSQL X.X
+                "table_lead_profiles_exists": info["table_lead_profiles_exists"]
             }
     except Exception as e:
         return {"status": "error", "message": str(e)}
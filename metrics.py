@@ -0,0 +1,128 @@
+import os
+import time
+from contextlib import contextmanager
+from typing import Any, Dict, Iterator
+
+from prometheus_client import REGISTRY, CollectorRegistry, Counter, Gauge, Histogram, generate_latest
+
+# Com gunicorn (vários workers) defina PROMETHEUS_MULTIPROC_DIR: cada processo
+# grava suas métricas em arquivos nesse diretório e o /metrics agrega todos
+MULTIPROC_DIR = os.environ.get("PROMETHEUS_MULTIPROC_DIR")
+
+# Da validação (~ms) até os agentes de LLM (dezenas de segundos)
+STAGE_BUCKETS = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 20, 30, 45, 60, 90)
+
+# Etapas medidas em diagnostico_stage_duration_seconds
+STAGE_VALIDATION = "validation"
+STAGE_SCORING = "scoring"
+STAGE_OPPORTUNITY_AGENT = "opportunity_agent"
+STAGE_RESEARCH_AGENT = "research_agent"
+STAGE_RENDER = "render"
+STAGE_PERSIST = "persist"
+STAGE_WEBHOOK_DELIVERY = "webhook_delivery"
+
+STAGE_SECONDS = Histogram(
+    "diagnostico_stage_duration_seconds",
+    "Duração de cada etapa do pipeline de diagnóstico",
+    ["stage"],
+    buckets=STAGE_BUCKETS,
+)
+AGENT_FALLBACKS = Counter(
+    "diagnostico_agent_fallbacks_total",
+    "Respostas padrão usadas no lugar da saída do agente",
+    ["agent", "reason"],
+)
+AGENT_HEDGES = Counter(
+    "diagnostico_agent_hedges_total",
+    "Segundas chamadas (hedge) disparadas e vencedoras",
+    ["agent", "outcome"],
+)
+# 0 fechado, 1 meio-aberto, 2 aberto
+AGENT_CIRCUIT_STATE = Gauge(
+    "diagnostico_agent_circuit_state",
+    "Estado do circuit breaker de cada agente",
+    ["agent"],
+    multiprocess_mode="max",
+)
+LLM_CALLS = Counter(
+    "llm_calls_total",
+    "Respostas dos agentes por origem (llm, cache, precomputed, fallback)",
+    ["agent", "source"],
+)
+LLM_TOKENS = Counter(
+    "llm_tokens_total",
+    "Tokens consumidos nas chamadas aos agentes (input, cached_input, output)",
+    ["agent", "type"],
+)
+LLM_COST_USD = Counter(
+    "llm_cost_usd_total",
+    "Custo estimado das chamadas aos agentes, em USD",
+    ["agent"],
+)
+# Gauges de estado por processo: cada worker os atualiza quando o estado muda
+# (acquire/release do pool, put/get da fila do writer) e o livesum soma os
+# valores atuais dos workers vivos, não só os de quem atende o scrape
+DB_POOL_CONNECTIONS = Gauge(
+    "db_pool_connections",
+    "Conexões do pool do Postgres por estado",
+    ["state"],
+    multiprocess_mode="livesum",
+)
+DB_POOL_WAITING = Gauge(
+    "db_pool_waiting",
+    "Coroutines esperando uma conexão do pool",
+    multiprocess_mode="livesum",
+)
+LEAD_WRITER_PENDING = Gauge(
+    "lead_writer_pending",
+    "Linhas de lead_profiles na fila do write-behind",
+    multiprocess_mode="livesum",
+)
+# O outbox é compartilhado entre os workers: todos enxergam o mesmo backlog
+WEBHOOK_BACKLOG = Gauge(
+    "webhook_outbox_backlog",
+    "Entregas pendentes no outbox do webhook",
+    multiprocess_mode="max",
+)
+
+
+@contextmanager
+def stage_timer(stage: str) -> Iterator[None]:
+    """
+    Mede a duração do bloco no histograma da etapa (inclusive quando ele falha)
+    """
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        STAGE_SECONDS.labels(stage).observe(time.perf_counter() - start)
+
+
+def set_pool_gauges(pool_stats: Dict[str, Any]):
+    """
+    Atualiza os gauges do pool deste processo (chamado no acquire/release)
+    """
+    for state in ("size", "in_use", "idle", "max_size"):
+        DB_POOL_CONNECTIONS.labels(state).set(pool_stats.get(state, 0))
+    DB_POOL_WAITING.set(pool_stats.get("waiting", 0))
+
+
+def set_webhook_backlog(webhook_backlog: int):
+    """
+    Atualiza o backlog do outbox, lido sob demanda (chamado a cada scrape do /metrics)
+    """
+    WEBHOOK_BACKLOG.set(webhook_backlog)
+
+
+def render_metrics() -> bytes:
+    """
+    Métricas no formato de texto do Prometheus
+    """
+    if MULTIPROC_DIR:
+        from prometheus_client import multiprocess
+
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+        return generate_latest(registry)
+    return generate_latest(REGISTRY)
+
@@ -0,0 +1,64 @@
+#!/usr/bin/env python3
+"""
+Migrações do schema de lead_profiles
+
+A API não altera o schema ao iniciar: ela só confere se as colunas abaixo
+existem e, se faltar alguma, grava os leads sem elas. Rode este script no
+deploy, com um usuário que tenha permissão de ALTER TABLE, e reinicie os
+workers para que voltem a usar as colunas novas.
+
+Uso:
+    python migrations.py            (aplica as migrações)
+    python migrations.py --check    (falha se alguma coluna estiver faltando)
+"""
+
+import argparse
+import asyncio
+import logging
+
+from database import db_manager
+from queries import LLM_USAGE_COLUMN, column_exists
+
+logger = logging.getLogger(__name__)
+
+# (coluna, DDL idempotente) das colunas adicionadas depois da criação de lead_profiles
+MIGRATIONS = [
+    # Tokens, latência e custo das chamadas aos agentes (llm_usage.LlmUsage.summary)
+    (LLM_USAGE_COLUMN, f"ALTER TABLE lead_profiles ADD COLUMN IF NOT EXISTS {LLM_USAGE_COLUMN} JSONB"),
+]
+
+
+async def run(check: bool) -> int:
+    if not await db_manager.initialize():
+        raise SystemExit("❌ Banco de dados indisponível")
+    missing = []
+    try:
+        async with db_manager.pool.acquire() as conn:
+            for column, sql in MIGRATIONS:
+                if await column_exists(conn, "lead_profiles", column):
+                    continue
+                if check:
+                    missing.append(column)
+                    continue
+                await conn.execute(sql)
+                logger.info(f"✅ Coluna {column} criada")
+    finally:
+        await db_manager.close()
+
+    if missing:
+        logger.error(f"❌ Colunas faltando em lead_profiles: {', '.join(missing)}")
+        return 1
+    logger.info("✅ Schema de lead_profiles atualizado")
+    return 0
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--check", action="store_true", help="só verifica, sem alterar o schema")
+    args = parser.parse_args()
+    raise SystemExit(asyncio.run(run(args.check)))
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    main()
@@ -1,5 +1,8 @@
 from pydantic_ai import Agent
 from schemas import LeadProfileInput, OpportunitiesOutput, Scores
+from scoring import ALL_QUESTIONS_DATA, score_lead
+from solution_catalog import solution_catalog
+from typing import Tuple
 from dotenv import load_dotenv
 import json
 import logging
@@ -7,129 +10,14 @@ load_dotenv()
 
 logging.basicConfig
 logger=logging.getLogger(__name__)
-# This would typically be in a separate file, but including here for simplicity
-# In a real app, load this from a JSON or config file.
-ALL_QUESTIONS_DATA = {
-    "sector": {
-        "Indústria/Manufatura": 1, "Varejo/E-commerce": 1, "Serviços Profissionais": 1,
-        "Saúde/Medicina": 1, "Educação": 1, "Financeiro/Fintech": 1,
-        "Logística/Supply Chain": 1, "Construção/Imobiliário": 1, "Tecnologia/Software": 1,
-        "Alimentação/Restaurantes": 1, "Marketing/Agências": 1, "Recursos Humanos": 1,
-        "Consultoria Empresarial": 1, "Agronegócios": 1, "Manutenção/Serviços Técnicos": 1,
-        "Outros": 1
-    },
-    "size": {
-        "1-10 funcionários": 1, "11-50 funcionários": 2, "51-250 funcionários": 3,
-        "251-500 funcionários": 4, "+500 funcionários": 5
-    },
-    "role": {
-        "Sócio(a)/CEO/Fundador(a)": 3, "Diretor(a)/C-Level": 2.5, "Gerente/Coordenador(a)": 2,
-        "Analista/Especialista": 1, "Estagiário/Trainee": 0.5, "Consultor/Freelancer": 1.5
-    },
-    "pain": {
-        "Processos manuais e repetitivos": 2, "Perda de oportunidades de venda": 2,
-        "Custos operacionais muito altos": 2, "Dificuldade em entender clientes": 2,
-        "Tomada de decisão lenta ou baseada em 'achismo'": 2, "Atendimento ao cliente demorado/ineficiente": 2,
-        "Dificuldade em contratar ou reter bons talentos": 1, "Problemas de compliance/regulamentação": 1,
-        "Não temos grandes gargalos no momento": 0
-    },
-    "quantifyPain": {
-        "Sim, é um custo significativo (>R$ 10k/mês)": 3, "Sim, é um custo moderado (<R$ 10k/mês)": 2.5,
-        "Temos uma estimativa do tempo perdido": 2.5, "Não consigo medir, mas o impacto é alto": 2
-    },
-    "maturity": {
-        "Principalmente na intuição": 0, "Usamos relatórios básicos e planilhas": 0.5,
-        "Temos sistemas centralizados (CRM/ERP)": 1, "Temos cultura de dados, com dashboards e BI": 1.5,
-        "Já usamos alguns insights automatizados/IA": 2
-    },
-    "investment": {
-        "Estamos em fase de estudo, sem orçamento": 0.5, "Até R$ 30.000": 1,
-        "Entre R$ 30.000 e R$ 100.000": 2, "Entre R$ 100.000 e R$ 300.000": 2.5,
-        "Acima de R$ 300.000": 3, "Dependeria do ROI demonstrado": 1.5
-    },
-    "urgency": {
-        "Crítica! Para ontem": 2, "Alta - Próximos 3 meses": 1.5,
-        "Média - Próximos 6-12 meses": 1, "Baixa - Apenas pesquisando": 0.5,
-        "Vai depender da proposta": 1
-    }
-}
 
-def calculate_scores(form_data: dict) -> dict:
+
+def calculate_scores(form_data: LeadProfileInput) -> Tuple[Scores, float]:
     """
-    Calcula scores baseado nos dados do formulário usando mapeamento direto
+    Calcula os scores do radar e o score final a partir dos mapas de ALL_QUESTIONS_DATA
+    (tabelas compiladas em scoring.py; para muitos leads use scoring.score_batch)
     """
-    scores = {
-        'automation_readiness': 0,
-        'digital_maturity': 0,
-        'investment_capacity': 0,
-        'urgency_level': 0,
-        'pain_intensity': 0
-    }
-    
-    # Score para Digital Maturity
-    digital_maturity_map = {
-        "Apenas ferramentas básicas (e-mail, planilhas)": 20,
-        "Usamos ferramentas básicas de produtividade (CRM simples, e-mail)": 40,
-        "Temos algumas soluções digitais integradas": 60,
-        "Somos uma empresa digitalmente madura": 80,
-        "Somos líderes em transformação digital": 100
-    }
-    scores['digital_maturity'] = digital_maturity_map.get(form_data.get('digital_maturity', ''), 40)
-    
-    # Score para Investment Capacity
-    investment_map = {
-        "Até R$ 10.000 (investimento pontual)": 20,
-        "R$ 10.001 - R$ 30.000 (projeto piloto)": 40,
-        "R$ 30.001 - R$ 100.000 (investimento estruturado)": 60,
-        "R$ 100.001 - R$ 500.000 (transformação significativa)": 80,
-        "Acima de R$ 500.000 (transformação completa)": 100
-    }
-    scores['investment_capacity'] = investment_map.get(form_data.get('investment_capacity', ''), 40)
-    
-    # Score para Urgency Level
-    urgency_map = {
-        "Baixa - É algo para considerar no futuro": 20,
-        "Média - Gostaríamos de implementar nos próximos 6 meses": 60,
-        "Alta - Precisamos de uma solução nos próximos 3 meses": 80,
-        "Crítica - Precisamos resolver isso imediatamente": 100
-    }
-    scores['urgency_level'] = urgency_map.get(form_data.get('urgency', ''), 60)
-    
-    # Score para Pain Intensity baseado na quantificação
-    pain_text = form_data.get('pain_quantification', '').lower()
-    if 'critico' in pain_text or 'urgente' in pain_text or 'prejuizo' in pain_text:
-        scores['pain_intensity'] = 100
-    elif 'importante' in pain_text or 'significativo' in pain_text or 'horas' in pain_text:
-        scores['pain_intensity'] = 80
-    elif 'medio' in pain_text or 'moderado' in pain_text:
-        scores['pain_intensity'] = 60
-    elif 'baixo' in pain_text or 'pequeno' in pain_text:
-        scores['pain_intensity'] = 40
-    else:
-        scores['pain_intensity'] = 70  # valor padrão
-    
-    # Score para Automation Readiness baseado na área crítica e setor
-    automation_base = 50
-    
-    # Ajuste por setor
-    sector = form_data.get('sector', '')
-    if 'tecnologia' in sector.lower():
-        automation_base += 30
-    elif 'financeiro' in sector.lower() or 'consultoria' in sector.lower():
-        automation_base += 20
-    elif 'varejo' in sector.lower() or 'servicos' in sector.lower():
-        automation_base += 10
-    
-    # Ajuste por área crítica
-    critical_area = form_data.get('critical_area', '')
-    if 'vendas' in critical_area.lower() or 'marketing' in critical_area.lower():
-        automation_base += 20
-    elif 'operacoes' in critical_area.lower() or 'atendimento' in critical_area.lower():
-        automation_base += 15
-    
-    scores['automation_readiness'] = min(100, automation_base)
-    
-    return scores
+    return score_lead(form_data)
 
 
 # Função de teste para debug
@@ -164,8 +52,14 @@ def test_calculate_scores():
 
 
 
+LLM_MODEL = 'openai:gpt-4o'
+
+# Incrementar ao alterar o prompt de um agente: invalida as respostas em cache (llm_cache)
+RESEARCH_PROMPT_VERSION = 1
+OPPORTUNITY_PROMPT_VERSION = 2
+
 researchAgent = Agent(
-    'openai:gpt-4o',
+    LLM_MODEL,
     deps_type=LeadProfileInput,
     output_type=str,
     system_prompt=("Você é um agente de Pesquisas de Mercado Especializado em Inteligência Artificial." \
@@ -194,7 +88,7 @@ async def add_forms_response(ctx):
 
 
 opportunityTracker = Agent(
-    'openai:gpt-4o',
+    LLM_MODEL,
     deps_type=LeadProfileInput,
     output_type=OpportunitiesOutput,
     system_prompt=(
@@ -208,229 +102,8 @@ Você deve reformular as oportunidades encontradas como mais promissoras para pa
 # INSTRUÇOES:
 Você deve fornecer oportunidades personalizadas para o setor da empresa, tamanho, dores e contexto.
 O perfil da empresa do cliente deve aparecer em cada texto, de modo a gerar percepção alta de valor.
-# BASE DE CONHECIMENTO (Seu Catálogo de Soluções)
-Use este catálogo como sua principal fonte de inspiração e conhecimento para basear suas recomendações. Adapte a descrição para o contexto do cliente.
-IMPORTANTE: VOCÊ DEVE COMUNICAR ESSAS SOLUÇÕES TÉCNICAS PARA UM GESTOR. PORTANTO, USE UMA LINGUAGEM CLARA, FOCADA EM BENEFÍCIOS E RESULTADOS, SEM JARGÕES TÉCNICOS DESNECESSÁRIOS.
-[
-  {
-    "nome": "Agente de Qualificação de Vendas com IA",
-    "descricao": "Um sistema que automatiza a qualificação de leads, fazendo perguntas, entendendo as respostas e direcionando apenas os mais preparados para o time de vendas.",
-    "ideal_para_dores": ["Perda de oportunidades de venda", "Dificuldade em converter leads"],
-    "complexidade_investimento": "Médio"
-  },
-  {
-    "nome": "RPA com IA para Automação de Processos",
-    "descricao": "Usa robôs de software para automatizar tarefas repetitivas de back-office, como preenchimento de planilhas, emissão de notas ou cadastro de clientes.",
-    "ideal_para_dores": ["Processos manuais e repetitivos"],
-    "complexidade_investimento": "Médio a Alto"
-  },
-  {
-    "nome": "Chatbot de Atendimento Nível 1",
-    "descricao": "Um chatbot inteligente que responde às perguntas mais frequentes dos clientes 24/7, aliviando a carga da equipe de suporte e melhorando a satisfação.",
-    "ideal_para_dores": ["Atendimento ao cliente demorado/ineficiente"],
-    "complexidade_investimento": "Baixo a Médio"
-  },
-  {
-    "nome": "Plataforma de Análise Preditiva (BI com IA)",
-    "descricao": "Analisa seus dados históricos para prever tendências futuras, como previsão de vendas, risco de churn de clientes ou demanda de estoque.",
-    "ideal_para_dores": ["Tomada de decisão lenta ou baseada em 'achismo'"],
-    "complexidade_investimento": "Alto"
-  },
-  {
-    "nome": "Otimização de Rotas e Logística com IA",
-    "descricao": "Calcula as rotas de entrega mais eficientes em tempo real, considerando tráfego e outras variáveis, para reduzir custos com combustível e tempo.",
-    "ideal_para_dores": ["Custos operacionais muito altos em Logística/Entrega"],
-    "complexidade_investimento": "Médio a Alto"
-  },
-  {
-    "nome": "Sistema de Recrutamento Inteligente (HR Tech)",
-    "descricao": "Automatiza a triagem de currículos, identifica os candidatos com maior fit para a vaga e pode até conduzir as primeiras entrevistas de forma autônoma.",
-    "ideal_para_dores": ["Dificuldade em contratar ou reter bons talentos"],
-    "complexidade_investimento": "Médio"
-  }
-]
-CASES: [
-  {
-    "nome": "Base39 - Análise de Crédito Acelerada",
-    "industria": "Financeiro/Fintech",
-    "fonte": "https://tiinside.com.br/07/05/2024/fintech-base39-reduz-em-96-os-custos-de-analise-de-emprestimos-com-ia-generativa-da-aws/",
-    "descricao": "Implementou uma solução de IA Generativa (com Amazon Bedrock e Claude 3) para automatizar a análise de documentos e dados para a concessão de empréstimos, um processo antes manual e lento.",
-    "ideal_para_dores": ["Custos operacionais muito altos", "Processos manuais e repetitivos que consomem muito tempo da equipe", "Tomada de decisão lenta ou baseada em 'achismo'"],
-    "complexidade_investimento": "Médio",
-    "resultados": "Redução de 96% no custo de análise de empréstimos e 84% em infraestrutura. Tempo de decisão reduzido de 3 dias para menos de 1 hora."
-  },
-  {
-    "nome": "Smartcoop & Infomach - Assistente Virtual do Agronegócio",
-    "industria": "Agronegócios",
-    "fonte": "https://aws.amazon.com/pt/partners/success/smartcoop-infomach/",
-    "descricao": "Desenvolveu 'ANA', uma assistente de IA generativa para mais de 170.000 produtores rurais. A IA fornece acesso instantâneo a dados cruciais sobre cotações, clima e saúde da lavoura, que antes exigiam contato com um call center.",
-    "ideal_para_dores": ["Atendimento ao cliente demorado/ineficiente", "Tomada de decisão lenta ou baseada em 'achismo' por falta de dados", "Processos manuais e repetitivos"],
-    "complexidade_investimento": "Alto",
-    "resultados": "Economia estimada de 20.000 horas de trabalho por ano, eliminando a necessidade de consultas manuais e melhorando drasticamente o acesso à informação."
-  },
-  {
-    "nome": "CarMax - Geração de Conteúdo Automotivo",
-    "industria": "Varejo/E-commerce",
-    "fonte": "https://customers.microsoft.com/en-us/story/1683232185127022204-carmax-retail-azure-openai-service",
-    "descricao": "Utilizou o Azure OpenAI Service para analisar milhares de reviews de clientes e gerar resumos de veículos únicos e otimizados para SEO em escala, alimentando as páginas de seus produtos.",
-    "ideal_para_dores": ["Processos manuais e repetitivos que consomem muito tempo da equipe", "Perda de oportunidades de venda ou dificuldade em converter leads", "Dificuldade em entender clientes e personalizar experiências"],
-    "complexidade_investimento": "Alto",
-    "resultados": "Aceleração massiva na criação de conteúdo de alta qualidade e exclusivo, melhorando o engajamento do cliente e o posicionamento em buscas orgânicas."
-  },
-  {
-    "nome": "Grupo Exame - Produtividade Editorial",
-    "industria": "Tecnologia/Software",
-    "fonte": "https://www.caristecnologia.com.br/cases",
-    "descricao": "Implementou pipelines automatizados com IA para analisar grandes volumes de texto, identificar temas relevantes e sugerir pautas e roteiros para a equipe editorial.",
-    "ideal_para_dores": ["Processos manuais e repetitivos que consomem muito tempo da equipe", "Tomada de decisão lenta ou baseada em 'achismo'"],
-    "complexidade_investimento": "Médio",
-    "resultados": "Aumento de 40% na produtividade da equipe editorial."
-  },
-  {
-    "nome": "Colégio Porto Seguro - Personalização da Educação",
-    "industria": "Educação",
-    "fonte": "https://www.caristecnologia.com.br/cases",
-    "descricao": "Utilizou IA para analisar dados de pesquisas com professores, mapear o uso de tecnologias em sala e gerar insights para personalizar o currículo e as práticas pedagógicas.",
-    "ideal_para_dores": ["Dificuldade em entender clientes e personalizar experiências", "Tomada de decisão lenta ou baseada em 'achismo' por falta de dados"],
-    "complexidade_investimento": "Médio",
-    "resultados": "Melhora de 15% no engajamento dos alunos após a implementação das ações baseadas nos insights da IA."
-  },
-  {
-    "nome": "Loggi - Automação do Atendimento ao Cliente",
-    "industria": "Logística/Supply Chain",
-    "fonte": "https://lincros.com/blog/ia-na-logistica/",
-    "descricao": "Implementou um chatbot com IA (batizado de LIA) para lidar com as solicitações dos entregadores e clientes, automatizando a resolução de dúvidas comuns.",
-    "ideal_para_dores": ["Atendimento ao cliente demorado/ineficiente", "Custos operacionais muito altos em uma área específica"],
-    "complexidade_investimento": "Médio",
-    "resultados": "O chatbot resolve 80% das solicitações sem a necessidade de intervenção humana."
-  },
-  {
-    "nome": "Stitch Fix - Hiper-personalização de Estilo",
-    "industria": "Varejo/E-commerce",
-    "fonte": "https://news.mit.edu/2023/how-generative-ai-changing-business-0517",
-    "descricao": "Adotou IA generativa para criar perfis de estilo detalhados e personalizados para seus clientes, indo além dos dados tradicionais para capturar nuances de preferência e gerar recomendações de produtos mais precisas.",
-    "ideal_para_dores": ["Dificuldade em entender clientes e personalizar experiências", "Perda de oportunidades de venda ou dificuldade em converter leads"],
-    "complexidade_investimento": "Alto",
-    "resultados": "Criação de uma experiência de compra altamente personalizada, que é o cerne do modelo de negócios, aumentando a retenção e satisfação do cliente."
-  },
-  {
-    "nome": "Gupy - Otimização de Recrutamento e Seleção",
-    "industria": "Recursos Humanos",
-    "fonte": "https://www.gupy.io/cases-de-sucesso",
-    "descricao": "Plataforma de RH que utiliza IA para automatizar a triagem de currículos, fazer o ranking de candidatos com maior fit para a vaga e otimizar todo o processo de recrutamento para as empresas clientes.",
-    "ideal_para_dores": ["Dificuldade em contratar ou reter bons talentos", "Processos manuais e repetitivos que consomem muito tempo da equipe"],
-    "complexidade_investimento": "Médio",
-    "resultados": "Clientes reportam redução de até 80% no tempo de fechamento de vagas e triagem de candidatos 10x mais rápida."
-  },
-  {
-    "nome": "BRIA Tech (Cliente Indústria) - Governança de IA",
-    "industria": "Indústria/Manufatura",
-    "fonte": "https://www.briatech.ai/cases",
-    "descricao": "Consultoria para uma indústria que enfrentava o uso descontrolado de IAs. A solução envolveu a criação de um comitê, treinamento e um piloto de IA para análise de dados, estabelecendo um uso seguro e produtivo.",
-    "ideal_para_dores": ["Problemas de compliance/regulamentação", "Tomada de decisão lenta ou baseada em 'achismo'"],
-    "complexidade_investimento": "Baixo",
-    "resultados": "Criação de diretrizes claras para o uso de IA, mitigação de riscos e implementação de um projeto piloto focado em análise de dados estratégicos."
-  },
-  {
-    "nome": "NIB Health Funds - Assistente de Atendimento",
-    "industria": "Saúde/Medicina",
-    "fonte": "https://sloanreview.mit.edu/article/how-companies-are-getting-started-with-generative-ai/",
-    "descricao": "Implementou uma assistente de IA generativa para lidar com a maior parte das dúvidas rotineiras dos clientes, liberando a equipe humana para casos mais complexos.",
-    "ideal_para_dores": ["Custos operacionais muito altos em uma área específica", "Atendimento ao cliente demorado/ineficiente"],
-    "complexidade_investimento": "Alto",
-    "resultados": "Economia de $22 milhões de dólares e capacidade de lidar com 60% de todas as solicitações de clientes."
-  },
-  {
-    "nome": "BRIA Tech (Cliente Gestão) - Planejamento Estratégico",
-    "industria": "Consultoria Empresarial",
-    "fonte": "https://www.briatech.ai/cases",
-    "descricao": "Treinamento e criação de um assistente de IA personalizado para um gestor de negócios, automatizando a criação de conteúdo, planejamento de marketing e análise de concorrentes.",
-    "ideal_para_dores": ["Processos manuais e repetitivos que consomem muito tempo da equipe", "Tomada de decisão lenta ou baseada em 'achismo'"],
-    "complexidade_investimento": "Baixo",
-    "resultados": "O gestor se tornou autossuficiente na criação de conteúdo estratégico, planos de marketing e análises complexas, antes realizadas manualmente."
-  },
-  {
-    "nome": "Sainsbury's - Otimização de Gôndolas",
-    "industria": "Varejo/E-commerce",
-    "fonte": "https://www.reuters.com/technology/how-sainsburys-is-using-ai-make-sure-shelves-are-stocked-2023-07-26/",
-    "descricao": "Utiliza câmeras com IA nas gôndolas para monitorar a disponibilidade de produtos em tempo real e alertar a equipe sobre a necessidade de reposição, otimizando o estoque e a experiência do cliente.",
-    "ideal_para_dores": ["Custos operacionais muito altos em uma área específica", "Processos manuais e repetitivos que consomem muito tempo da equipe"],
-    "complexidade_investimento": "Alto",
-    "resultados": "Melhora significativa na eficiência da reposição de estoque e na disponibilidade de produtos para os clientes, reduzindo perdas e aumentando vendas."
-  },
-  {
-    "nome": "BRIA Tech (Cliente Educação) - Automação de Plano de Aula",
-    "industria": "Educação",
-    "fonte": "https://www.briatech.ai/cases",
-    "descricao": "Criação de um assistente de IA customizado que gera planos de aula, atividades e conteúdo a partir de materiais de base (vídeos, textos), para uma professora com pouco tempo.",
-    "ideal_para_dores": ["Processos manuais e repetitivos que consomem muito tempo da equipe"],
-    "complexidade_investimento": "Baixo",
-    "resultados": "Capacidade de planejar semanas de aulas em questão de minutos, um trabalho que antes levava horas."
-  },
-  {
-    "nome": "Alcoa Brasil - Inspeção Industrial com Drones",
-    "industria": "Indústria/Manufatura",
-    "fonte": "https://www.caristecnologia.com.br/cases",
-    "descricao": "Implementou drones equipados com IA para realizar inspeções em áreas de risco e de difícil acesso, como telhados e tubulações, de forma mais rápida e segura.",
-    "ideal_para_dores": ["Custos operacionais muito altos em uma área específica", "Processos manuais e repetitivos que consomem muito tempo da equipe", "Problemas de compliance/regulamentação"],
-    "complexidade_investimento": "Alto",
-    "resultados": "Inspeções realizadas de forma mais rápida, com maior frequência e segurança, gerando dados mais precisos para a tomada de decisão sobre manutenção."
-  },
-  {
-    "nome": "Venda-GPT (Automação de Vendas)",
-    "industria": "Varejo/E-commerce",
-    "fonte": "https://forbes.com.br/forbes-tech/2024/02/como-a-ia-generativa-esta-transformando-as-operacoes-de-vendas/",
-    "descricao": "Solução de IA que se conecta ao CRM e automatiza a geração de e-mails de follow-up, a transcrição de chamadas e o resumo de interações com clientes para a equipe de vendas.",
-    "ideal_para_dores": ["Processos manuais e repetitivos que consomem muito tempo da equipe", "Perda de oportunidades de venda ou dificuldade em converter leads"],
-    "complexidade_investimento": "Médio",
-    "resultados": "Libera em média 30% do tempo dos vendedores, que antes era gasto em tarefas administrativas, permitindo maior foco no fechamento de negócios."
-  },
-  {
-    "nome": "Klarna - Agente de Atendimento ao Cliente",
-    "industria": "Financeiro/Fintech",
-    "fonte": "https://www.klarna.com/international/press/klarna-ai-assistant-handles-two-thirds-of-customer-service-chats-in-its-first-month/",
-    "descricao": "Implementou um assistente de IA com a OpenAI que lida com uma vasta gama de dúvidas dos clientes, desde reembolsos a pagamentos, em múltiplos idiomas.",
-    "ideal_para_dores": ["Atendimento ao cliente demorado/ineficiente", "Custos operacionais muito altos em uma área específica"],
-    "complexidade_investimento": "Alto",
-    "resultados": "O assistente de IA realizou o trabalho de 700 agentes em tempo integral, resolveu 2/3 dos chats de atendimento e projeta um aumento de lucro de US$ 40 milhões."
-  },
-  {
-    "nome": "Wayfair - Criação de Anúncios Personalizados",
-    "industria": "Varejo/E-commerce",
-    "fonte": "https://cloud.google.com/blog/products/ai-machine-learning/how-wayfair-is-using-generative-ai-for-search-and-personalization/",
-    "descricao": "Utiliza IA generativa para criar campanhas de marketing e anúncios altamente personalizados, adaptando criativos e mensagens para diferentes segmentos de público de forma automática.",
-    "ideal_para_dores": ["Dificuldade em entender clientes e personalizar experiências", "Perda de oportunidades de venda ou dificuldade em converter leads"],
-    "complexidade_investimento": "Médio",
-    "resultados": "Aumento significativo nas taxas de clique (CTR) e no retorno sobre o investimento em publicidade (ROAS) através da hiper-personalização."
-  },
-  {
-    "nome": "Zendesk para Vendas - Qualificação de Leads",
-    "industria": "Tecnologia/Software",
-    "fonte": "https://www.zendesk.com.br/blog/ia-generativa-nas-vendas/",
-    "descricao": "Plataforma que usa IA para analisar o comportamento dos leads, pontuá-los com base na probabilidade de compra e direcioná-los para os vendedores certos, além de gerar resumos inteligentes de oportunidades.",
-    "ideal_para_dores": ["Perda de oportunidades de venda ou dificuldade em converter leads", "Processos manuais e repetitivos que consomem muito tempo da equipe"],
-    "complexidade_investimento": "Médio",
-    "resultados": "Priorização eficiente de leads, garantindo que os vendedores foquem nos negócios com maior potencial e aumentando a taxa de conversão."
-  },
-  {
-    "nome": "Automação de Relatórios Financeiros",
-    "industria": "Serviços Profissionais (Consultoria, Advocacia, etc.)",
-    "fonte": "https://www.itshow.com/wp-content/uploads/2023/07/Report-BR-Space-IA-Generativa-Final.pdf",
-    "descricao": "Implementação de IA para extrair dados de diferentes sistemas (ERP, planilhas), consolidá-los e gerar relatórios financeiros (DRE, Fluxo de Caixa) automaticamente, com análises e insights preliminares.",
-    "ideal_para_dores": ["Processos manuais e repetitivos que consomem muito tempo da equipe", "Tomada de decisão lenta ou baseada em 'achismo' por falta de dados"],
-    "complexidade_investimento": "Médio",
-    "resultados": "Redução drástica do tempo de fechamento mensal. Libera a equipe financeira para análises mais estratégicas em vez de tarefas operacionais."
-  },
-  {
-    "nome": "Análise de Contratos e Compliance",
-    "industria": "Serviços Profissionais (Consultoria, Advocacia, etc.)",
-    "fonte": "https://www.itshow.com/wp-content/uploads/2023/07/Report-BR-Space-IA-Generativa-Final.pdf",
-    "descricao": "Solução de IA que analisa documentos legais e contratos em busca de cláusulas de risco, inconsistências ou não conformidade com regulamentações, gerando alertas e resumos para a equipe jurídica.",
-    "ideal_para_dores": ["Problemas de compliance/regulamentação", "Processos manuais e repetitivos que consomem muito tempo da equipe"],
-    "complexidade_investimento": "Médio",
-    "resultados": "Acelera a revisão de contratos em mais de 70% e reduz significativamente o risco de erro humano e problemas de compliance."
-  }
-]
+# BASE DE CONHECIMENTO
+O catálogo de soluções e cases relevantes para o perfil do cliente vem logo após estas regras.
 
 # TAREFAS E REGRAS
 1.  **Prioridade Máxima:** A **Oportunidade #1** DEVE ser a solução mais direta para o `[GARGALO_PRINCIPAL]` e `[AREA_DOR_ESPECIFICA]` informados. Use a base de conhecimento para encontrar o melhor match.
@@ -443,6 +116,11 @@ CASES: [
     ),
 )
 
+@opportunityTracker.system_prompt
+async def add_solution_catalog(ctx):
+       form: LeadProfileInput = ctx.deps
+       return solution_catalog.prompt_section(form.p1_sector, form.p4_main_pain)
+
 @opportunityTracker.system_prompt
 async def add_forms_response(ctx):
        form: LeadProfileInput = ctx.deps
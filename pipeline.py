@@ -0,0 +1,300 @@
+import asyncio
+import datetime
+import os
+import time
+import logging
+from typing import List, Optional, Tuple
+
+from pydantic import model_validator
+
+from schemas import FinalReportData, LeadProfileInput, Opportunity, OpportunitiesOutput
+from models import (
+    LLM_MODEL, calculate_scores, OPPORTUNITY_PROMPT_VERSION, RESEARCH_PROMPT_VERSION,
+    opportunityTracker, researchAgent,
+)
+from llm_cache import cache_key, llm_cache
+from precomputed_catalog import DEFAULT_CATALOG_PATH, PrecomputedIndex
+from metrics import (
+    AGENT_FALLBACKS, STAGE_OPPORTUNITY_AGENT, STAGE_RESEARCH_AGENT, STAGE_SCORING, STAGE_VALIDATION, stage_timer,
+)
+from agent_resilience import AgentGuard, CircuitOpenError
+from tracing import is_tracing, trace
+from llm_usage import SOURCE_CACHE, SOURCE_FALLBACK, SOURCE_LLM, SOURCE_PRECOMPUTED, record_llm_call
+
+logger = logging.getLogger(__name__)
+
+# Timeouts por agente (segundos) - configuráveis via variáveis de ambiente
+OPPORTUNITY_TIMEOUT_SECONDS = float(os.environ.get("OPPORTUNITY_TIMEOUT_SECONDS", "60"))
+INTRODUCTION_TIMEOUT_SECONDS = float(os.environ.get("INTRODUCTION_TIMEOUT_SECONDS", "45"))
+
+# Deadline, hedging e circuit breaker das chamadas a cada agente
+opportunity_guard = AgentGuard("opportunityTracker", STAGE_OPPORTUNITY_AGENT)
+research_guard = AgentGuard("researchAgent", STAGE_RESEARCH_AGENT)
+
+PRECOMPUTED_CATALOG_PATH = os.environ.get("PRECOMPUTED_CATALOG_PATH", DEFAULT_CATALOG_PATH)
+
+
+class LeadFormInput(LeadProfileInput):
+    """
+    Formulário recebido pelos endpoints da API: o mesmo LeadProfileInput,
+    com o tempo da validação no histograma de etapas
+    """
+
+    @model_validator(mode="wrap")
+    @classmethod
+    def _timed_validation(cls, data, handler):
+        with stage_timer(STAGE_VALIDATION):
+            return handler(data)
+
+# Índice do catálogo pré-computado (vazio até load_precomputed_catalog)
+precomputed_index = PrecomputedIndex()
+
+INTRODUCTION_PROMPT = "Faça uma introdução para o relatorio com um panorama da IA para empresas como essa"
+
+
+def fallback_opportunities(form_data: LeadProfileInput) -> List[Opportunity]:
+    """
+    Oportunidades padrão usadas quando o OpportunityTracker falha ou estoura o timeout
+    """
+    return [
+        Opportunity(
+            titulo="Automação de Processos Básicos",
+            description=f"Implementar soluções de automação para reduzir tarefas manuais na área de {form_data.p5_critical_area}",
+            roi="150-200% em 3-6 meses (investimento estimado: R$ 25.000 - R$ 50.000)",
+            priority="alta",
+            case="Empresas que automatizaram tarefas repetitivas de back-office liberaram em média 30% do tempo da equipe."
+        ),
+        Opportunity(
+            titulo="Análise de Dados Inteligente",
+            description="Desenvolver dashboards e relatórios automatizados para melhorar a tomada de decisão",
+            roi="120-180% em 2-4 meses (investimento estimado: R$ 15.000 - R$ 35.000)",
+            priority="media",
+            case="A automação de relatórios financeiros reduziu drasticamente o tempo de fechamento mensal em empresas de serviços."
+        ),
+        Opportunity(
+            titulo="Chatbot de Atendimento",
+            description="Implementar assistente virtual para automatizar o atendimento inicial aos clientes",
+            roi="100-150% em 1-3 meses (investimento estimado: R$ 10.000 - R$ 25.000)",
+            priority="baixa",
+            case="A Loggi implementou um chatbot que resolve 80% das solicitações sem intervenção humana."
+        )
+    ]
+
+
+def fallback_introduction(form_data: LeadProfileInput) -> str:
+    """
+    Introdução padrão usada quando o ResearchAgent falha ou estoura o timeout
+    """
+    return f"O setor de {form_data.p1_sector} está passando por uma transformação digital acelerada, especialmente para empresas de {form_data.p2_company_size}. A implementação de inteligência artificial neste segmento apresenta oportunidades significativas de otimização, redução de custos e crescimento sustentável. Com o gargalo atual em {form_data.p4_main_pain}, há potencial imediato para soluções que automatizem processos e melhorem a eficiência operacional."
+
+
+async def generate_opportunities(
+    form_data: LeadProfileInput,
+    agent=opportunityTracker,
+    timeout: Optional[float] = OPPORTUNITY_TIMEOUT_SECONDS,
+) -> List[Opportunity]:
+    """
+    Executa o OpportunityTracker com timeout (hedging e circuit breaker via AgentGuard),
+    aplicando o fallback em caso de erro ou com o circuito aberto.
+    Respostas em cache para o mesmo perfil não chamam o LLM.
+    """
+    key = cache_key("opportunityTracker", LLM_MODEL, OPPORTUNITY_PROMPT_VERSION, form_data)
+    cached = await llm_cache.get(key)
+    if cached is not None:
+        logger.info("💡 Oportunidades servidas do cache")
+        record_llm_call("opportunityTracker", LLM_MODEL, SOURCE_CACHE)
+        return OpportunitiesOutput.model_validate(cached).opportunities
+
+    try:
+        logger.info("💡 Gerando oportunidades...")
+        start = time.perf_counter()
+        opportunities_result = await opportunity_guard.run(lambda: agent.run(deps=form_data), timeout)
+        if not opportunities_result or not opportunities_result.output:
+            raise Exception("OpportunityTracker retornou resultado vazio")
+        record_llm_call("opportunityTracker", LLM_MODEL, SOURCE_LLM, opportunities_result, time.perf_counter() - start)
+
+        opportunities = opportunities_result.output.opportunities
+        logger.info(f"💡 Geradas {len(opportunities)} oportunidades")
+        await llm_cache.set(key, "opportunityTracker", opportunities_result.output.model_dump())
+        return opportunities
+    except CircuitOpenError:
+        logger.warning("🔌 Circuito do OpportunityTracker aberto, usando oportunidades padrão")
+        AGENT_FALLBACKS.labels("opportunityTracker", "circuit_open").inc()
+    except asyncio.TimeoutError:
+        logger.error(f"⏱️  OpportunityTracker excedeu o timeout de {timeout}s")
+        AGENT_FALLBACKS.labels("opportunityTracker", "timeout").inc()
+    except Exception as opp_error:
+        logger.error(f"❌ Erro ao gerar oportunidades: {opp_error}")
+        AGENT_FALLBACKS.labels("opportunityTracker", "error").inc()
+    record_llm_call("opportunityTracker", LLM_MODEL, SOURCE_FALLBACK)
+    return fallback_opportunities(form_data)
+
+
+async def generate_introduction(
+    form_data: LeadProfileInput,
+    agent=researchAgent,
+    timeout: Optional[float] = INTRODUCTION_TIMEOUT_SECONDS,
+) -> str:
+    """
+    Executa o ResearchAgent com timeout (hedging e circuit breaker via AgentGuard),
+    aplicando o fallback em caso de erro ou com o circuito aberto.
+    Respostas em cache para o mesmo perfil não chamam o LLM.
+    """
+    key = cache_key("researchAgent", LLM_MODEL, RESEARCH_PROMPT_VERSION, form_data)
+    cached = await llm_cache.get(key)
+    if cached is not None:
+        logger.info("🔍 Introdução servida do cache")
+        record_llm_call("researchAgent", LLM_MODEL, SOURCE_CACHE)
+        return cached
+
+    try:
+        logger.info("🔍 Gerando introdução de pesquisa de mercado...")
+        start = time.perf_counter()
+        introduction_result = await research_guard.run(lambda: agent.run(INTRODUCTION_PROMPT, deps=form_data), timeout)
+        introduction_output = introduction_result.output if introduction_result and introduction_result.output else None
+
+        if not introduction_output:
+            raise Exception("ResearchAgent retornou resultado vazio")
+        record_llm_call("researchAgent", LLM_MODEL, SOURCE_LLM, introduction_result, time.perf_counter() - start)
+
+        logger.info("✅ Introdução gerada com sucesso")
+        await llm_cache.set(key, "researchAgent", introduction_output)
+        return introduction_output
+    except CircuitOpenError:
+        logger.warning("🔌 Circuito do ResearchAgent aberto, usando introdução padrão")
+        AGENT_FALLBACKS.labels("researchAgent", "circuit_open").inc()
+    except asyncio.TimeoutError:
+        logger.error(f"⏱️  ResearchAgent excedeu o timeout de {timeout}s")
+        AGENT_FALLBACKS.labels("researchAgent", "timeout").inc()
+    except Exception as intro_error:
+        logger.error(f"❌ Erro ao gerar introdução: {intro_error}")
+        AGENT_FALLBACKS.labels("researchAgent", "error").inc()
+    record_llm_call("researchAgent", LLM_MODEL, SOURCE_FALLBACK)
+    return fallback_introduction(form_data)
+
+
+def load_precomputed_catalog(path: str = PRECOMPUTED_CATALOG_PATH):
+    """
+    Carrega o catálogo gerado por precomputed_catalog.py (chamado na inicialização da API)
+    """
+    global precomputed_index
+    precomputed_index = PrecomputedIndex.load(
+        path,
+        model=LLM_MODEL,
+        prompt_versions={
+            "opportunityTracker": OPPORTUNITY_PROMPT_VERSION,
+            "researchAgent": RESEARCH_PROMPT_VERSION,
+        },
+    )
+
+
+def start_agents(
+    form_data: LeadProfileInput,
+    opportunity_agent=opportunityTracker,
+    research_agent=researchAgent,
+) -> Tuple["asyncio.Future[List[Opportunity]]", "asyncio.Future[str]"]:
+    """
+    Dispara OpportunityTracker e ResearchAgent em paralelo e devolve um
+    future para cada um, para quem precisa consumir cada resultado assim que
+    ele fica pronto (ex.: o modo streaming). Perfis presentes no catálogo
+    pré-computado devolvem futures já resolvidos, sem chamar os agentes.
+    """
+    precomputed = precomputed_index.lookup(form_data)
+    if precomputed is not None:
+        logger.info("📚 Oportunidades e introdução servidas do catálogo pré-computado")
+        record_llm_call("opportunityTracker", LLM_MODEL, SOURCE_PRECOMPUTED)
+        record_llm_call("researchAgent", LLM_MODEL, SOURCE_PRECOMPUTED)
+        loop = asyncio.get_running_loop()
+        opportunities_future, introduction_future = loop.create_future(), loop.create_future()
+        opportunities_future.set_result(precomputed[0])
+        introduction_future.set_result(precomputed[1])
+        return opportunities_future, introduction_future
+
+    return (
+        asyncio.ensure_future(generate_opportunities(form_data, agent=opportunity_agent)),
+        asyncio.ensure_future(generate_introduction(form_data, agent=research_agent)),
+    )
+
+
+async def run_agents(
+    form_data: LeadProfileInput,
+    opportunity_agent=opportunityTracker,
+    research_agent=researchAgent,
+) -> Tuple[List[Opportunity], str]:
+    """
+    Executa OpportunityTracker e ResearchAgent em paralelo.
+
+    Os dois agentes dependem apenas de form_data, então a latência da etapa
+    passa a ser a do agente mais lento, e não a soma das duas. Cada agente
+    tem seu próprio timeout e fallback: a falha de um não afeta o outro.
+    """
+    opportunities, introduction = await asyncio.gather(
+        *start_agents(form_data, opportunity_agent=opportunity_agent, research_agent=research_agent)
+    )
+    return opportunities, introduction
+
+
+# --- Dados do relatório (compartilhados pela API e pelo runner offline) ---
+
+RISCOS_PADRAO = [
+    {"titulo": "Segurança de Dados", "descricao": "A implementação de IA exige atenção redobrada à segurança dos dados e conformidade com a LGPD."},
+    {"titulo": "Gestão da Mudança", "descricao": "A adoção de novas tecnologias requer uma comunicação clara e treinamento para garantir a adesão da equipe."}
+]
+
+
+def build_report_data(
+    form_data: LeadProfileInput, radar_scores, final_score, opportunities, introduction_output,
+    gerado_em: Optional[datetime.datetime] = None,
+) -> FinalReportData:
+    """Consolida os dados do relatório (gerado_em: data exibida no relatório, padrão agora)"""
+    return FinalReportData(
+        empresa={"nome": form_data.name or "Sua Empresa"},
+        scores_radar=radar_scores,
+        score_final=final_score,
+        introduction=introduction_output,
+        relatorio_oportunidades=opportunities,
+        relatorio_riscos=RISCOS_PADRAO,
+        gerado_em=gerado_em or datetime.datetime.now(),
+    )
+
+
+def build_template_data(form_data: LeadProfileInput, report_data: FinalReportData, introduction_output: str) -> dict:
+    """Monta os dados na estrutura esperada pelo template"""
+    try:
+        template_data = report_data.model_dump()
+    except Exception as dict_error:
+        logger.error(f"❌ Erro ao converter report_data para dict: {dict_error}")
+        # Fallback manual
+        template_data = {}
+
+    # Garantir que os dados estão na estrutura correta para o template - PROTEÇÃO CONTRA KeyError
+    template_data_fixed = {
+        "empresa": template_data.get("empresa", {"nome": form_data.name or "Sua Empresa"}),
+        "introduction": template_data.get("introduction", introduction_output),  # USAR A VARIÁVEL DIRETA
+        "scores_radar": template_data.get("scores_radar", report_data.scores_radar.dict()),  # USAR A VARIÁVEL DIRETA
+        "score_final": template_data.get("score_final", report_data.score_final),  # USAR A VARIÁVEL DIRETA
+        "relatorio_oportunidades": template_data.get("relatorio_oportunidades", []),
+        "relatorio_riscos": template_data.get("relatorio_riscos", []),
+        "data_geracao": None,  # Será preenchido pelo render_report
+        "ano_atual": None      # Será preenchido pelo render_report
+    }
+
+    if is_tracing():
+        trace(
+            "report.template_data",
+            score_final=template_data_fixed['score_final'],
+            scores_radar=template_data_fixed['scores_radar'],
+            oportunidades=len(template_data_fixed['relatorio_oportunidades']),
+            introduction=str(template_data_fixed['introduction'])[:100],
+        )
+    return template_data_fixed
+
+
+def score_lead(form_data: LeadProfileInput):
+    """Calcula os scores (independente do DB e dos agentes)"""
+    with stage_timer(STAGE_SCORING):
+        radar_scores, final_score = calculate_scores(form_data)
+    logger.info(f"📊 Scores calculados - Final: {final_score}")
+    if is_tracing():
+        trace("scores", score_final=final_score, scores_radar=radar_scores.dict())
+    return radar_scores, final_score
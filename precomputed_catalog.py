@@ -0,0 +1,264 @@
+#!/usr/bin/env python3
+"""
+Catálogo pré-computado de oportunidades e introduções
+
+As respostas categóricas do formulário formam um espaço finito de perfis.
+Este job offline conta as combinações mais comuns (a partir da tabela
+lead_profiles ou de um arquivo JSONL com registros LeadProfileInput), roda
+os agentes uma vez para cada uma e grava um artefato JSON indexado pelo
+hash das entradas do prompt. Em runtime o pipeline consulta esse índice
+antes de chamar qualquer LLM.
+
+Uso:
+    python precomputed_catalog.py --from-db [--top 200] [--concurrency 4]
+    python precomputed_catalog.py --from-jsonl leads.jsonl [--top 200]
+"""
+
+import argparse
+import asyncio
+import hashlib
+import json
+import os
+import logging
+from collections import Counter
+from datetime import datetime
+from typing import Any, Dict, Iterable, Iterator, List, Optional, Tuple
+
+from schemas import LeadProfileInput, Opportunity, OpportunitiesOutput
+from llm_cache import prompt_inputs
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_CATALOG_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "precomputed_catalog.json")
+# Incrementar quando profile_key mudar (ex.: normalização das respostas)
+CATALOG_FORMAT_VERSION = 2
+
+
+def profile_key(form_data: LeadProfileInput) -> str:
+    """
+    Hash das entradas normalizadas do prompt (independe de agente e modelo)
+    """
+    material = json.dumps(prompt_inputs(form_data), sort_keys=True, ensure_ascii=False)
+    return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+
+def personalize_introduction(introduction: str, form_data: LeadProfileInput) -> str:
+    """
+    Complementa uma introdução pré-computada com os campos do lead que não
+    fazem parte da chave do catálogo (quantificação da dor e urgência)
+    """
+    details = []
+    if form_data.p6_pain_quant:
+        details.append(f"o impacto relatado ({form_data.p6_pain_quant.rstrip('.')})")
+    if form_data.p9_urgency:
+        details.append(f"a urgência indicada ({form_data.p9_urgency})")
+    if not details:
+        return introduction
+    return f"{introduction} Considerando {' e '.join(details)}, as oportunidades a seguir foram priorizadas para {form_data.name or 'a sua empresa'}."
+
+
+class PrecomputedIndex:
+    """
+    Índice em memória do artefato gerado por este job
+    """
+
+    def __init__(self, entries: Optional[Dict[str, Dict[str, Any]]] = None):
+        self.entries = entries or {}
+
+    @classmethod
+    def load(cls, path: str, model: str, prompt_versions: Dict[str, int]) -> "PrecomputedIndex":
+        """
+        Carrega o artefato. Um catálogo gerado com outro modelo ou outra
+        versão de prompt é ignorado, para não servir respostas obsoletas.
+        """
+        if not os.path.exists(path):
+            logger.info(f"ℹ️  Catálogo pré-computado não encontrado em {path}")
+            return cls()
+        try:
+            with open(path, encoding="utf-8") as f:
+                artifact = json.load(f)
+        except Exception as e:
+            logger.error(f"❌ Erro ao ler catálogo pré-computado: {e}")
+            return cls()
+
+        if artifact.get("format_version") != CATALOG_FORMAT_VERSION:
+            logger.warning("⚠️  Catálogo pré-computado em formato antigo, gere novamente")
+            return cls()
+        if artifact.get("model") != model or artifact.get("prompt_versions") != prompt_versions:
+            logger.warning("⚠️  Catálogo pré-computado gerado com outro modelo/prompt, ignorando")
+            return cls()
+
+        logger.info(f"✅ Catálogo pré-computado carregado: {len(artifact['entries'])} perfis")
+        return cls(artifact["entries"])
+
+    def __len__(self):
+        return len(self.entries)
+
+    def lookup(self, form_data: LeadProfileInput) -> Optional[Tuple[List[Opportunity], str]]:
+        entry = self.entries.get(profile_key(form_data))
+        if entry is None:
+            return None
+        opportunities = OpportunitiesOutput.model_validate(entry["opportunities"]).opportunities
+        return opportunities, personalize_introduction(entry["introduction"], form_data)
+
+
+def catalog_profile(inputs: Dict[str, Optional[str]]) -> LeadProfileInput:
+    """
+    Monta um LeadProfileInput só com os campos usados pelos prompts
+    """
+    return LeadProfileInput.model_construct(
+        name="",
+        p0_email="catalogo@example.com",
+        p_phone=None,
+        p1_sector=inputs["p1_sector"],
+        p2_company_size=inputs["p2_company_size"],
+        p3_role="",
+        p4_main_pain=inputs["p4_main_pain"],
+        p5_critical_area=inputs["p5_critical_area"],
+        p6_pain_quant=None,
+        p7_digital_maturity=inputs["p7_digital_maturity"],
+        p8_investment=inputs["p8_investment"],
+        p9_urgency="",
+    )
+
+
+PROMPT_FIELDS = ("p1_sector", "p2_company_size", "p4_main_pain", "p5_critical_area", "p7_digital_maturity", "p8_investment")
+
+
+def iter_jsonl_profiles(path: str) -> Iterator[Dict[str, Optional[str]]]:
+    """
+    Lê registros LeadProfileInput (com os aliases do formulário) linha a linha
+    """
+    with open(path, encoding="utf-8") as f:
+        for line_number, line in enumerate(f, start=1):
+            if not line.strip():
+                continue
+            try:
+                form_data = LeadProfileInput.model_validate(json.loads(line))
+            except Exception as e:
+                logger.warning(f"⚠️  Linha {line_number} ignorada: {e}")
+                continue
+            yield {field: getattr(form_data, field) for field in PROMPT_FIELDS}
+
+
+def top_profiles(counted: Iterable[Tuple[Dict[str, Optional[str]], int]], top: int) -> List[Tuple[Dict[str, Optional[str]], int]]:
+    """
+    Soma as contagens por profile_key, para que variações da mesma resposta
+    (acentos, caixa, detalhe depois da resposta) contem como um só perfil
+    """
+    counts: Counter = Counter()
+    representatives: Dict[str, Dict[str, Optional[str]]] = {}
+    for inputs, total in counted:
+        key = profile_key(catalog_profile(inputs))
+        counts[key] += total
+        representatives.setdefault(key, inputs)
+    return [(representatives[key], total) for key, total in counts.most_common(top)]
+
+
+async def count_db_profiles(top: int) -> List[Tuple[Dict[str, Optional[str]], int]]:
+    from database import db_manager
+
+    if not await db_manager.initialize():
+        raise SystemExit("❌ Banco de dados indisponível")
+    # O GROUP BY só junta textos idênticos; a normalização é feita em top_profiles,
+    # então não dá para cortar no LIMIT antes dela
+    counted = []
+    try:
+        async with db_manager.pool.acquire() as conn:
+            async with conn.transaction():
+                async for row in conn.cursor(
+                    """
+                    SELECT raw_p1_sector, raw_p2_company_size, raw_p4_main_pain,
+                           raw_p5_critical_area, raw_p7_digital_maturity, raw_p8_investment,
+                           count(*) AS total
+                    FROM lead_profiles
+                    GROUP BY 1, 2, 3, 4, 5, 6
+                    """
+                ):
+                    counted.append(({field: row[f"raw_{field}"] for field in PROMPT_FIELDS}, row["total"]))
+    finally:
+        await db_manager.close()
+    return top_profiles(counted, top)
+
+
+def count_jsonl_profiles(path: str, top: int) -> List[Tuple[Dict[str, Optional[str]], int]]:
+    return top_profiles(((inputs, 1) for inputs in iter_jsonl_profiles(path)), top)
+
+
+async def generate_entry(inputs: Dict[str, Optional[str]], total: int, timeout: float) -> Optional[Tuple[str, Dict[str, Any]]]:
+    from models import opportunityTracker, researchAgent
+    from pipeline import INTRODUCTION_PROMPT
+
+    form_data = catalog_profile(inputs)
+    try:
+        opportunities_result, introduction_result = await asyncio.gather(
+            asyncio.wait_for(opportunityTracker.run(deps=form_data), timeout),
+            asyncio.wait_for(researchAgent.run(INTRODUCTION_PROMPT, deps=form_data), timeout),
+        )
+    except Exception as e:
+        logger.error(f"❌ Falha ao gerar perfil {inputs}: {e}")
+        return None
+    if not opportunities_result.output or not introduction_result.output:
+        logger.error(f"❌ Resposta vazia para o perfil {inputs}")
+        return None
+
+    return profile_key(form_data), {
+        "inputs": inputs,
+        "count": total,
+        "opportunities": opportunities_result.output.model_dump(),
+        "introduction": introduction_result.output,
+    }
+
+
+async def build_catalog(args):
+    from models import LLM_MODEL, OPPORTUNITY_PROMPT_VERSION, RESEARCH_PROMPT_VERSION
+
+    if args.from_jsonl:
+        profiles = count_jsonl_profiles(args.from_jsonl, args.top)
+    else:
+        profiles = await count_db_profiles(args.top)
+    logger.info(f"📊 {len(profiles)} combinações selecionadas")
+
+    semaphore = asyncio.Semaphore(args.concurrency)
+
+    async def bounded(inputs, total):
+        async with semaphore:
+            return await generate_entry(inputs, total, args.timeout)
+
+    results = await asyncio.gather(*(bounded(inputs, total) for inputs, total in profiles))
+    entries = dict(result for result in results if result is not None)
+
+    artifact = {
+        "format_version": CATALOG_FORMAT_VERSION,
+        "generated_at": datetime.now().isoformat(),
+        "model": LLM_MODEL,
+        "prompt_versions": {
+            "opportunityTracker": OPPORTUNITY_PROMPT_VERSION,
+            "researchAgent": RESEARCH_PROMPT_VERSION,
+        },
+        "entries": entries,
+    }
+    tmp_path = f"{args.output}.tmp"
+    with open(tmp_path, "w", encoding="utf-8") as f:
+        json.dump(artifact, f, ensure_ascii=False)
+    os.replace(tmp_path, args.output)
+    logger.info(f"✅ Catálogo gravado em {args.output}: {len(entries)}/{len(profiles)} perfis")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    source = parser.add_mutually_exclusive_group(required=True)
+    source.add_argument("--from-db", action="store_true", help="conta as combinações na tabela lead_profiles")
+    source.add_argument("--from-jsonl", help="arquivo JSONL com registros LeadProfileInput")
+    parser.add_argument("--top", type=int, default=200, help="quantidade de combinações mais comuns")
+    parser.add_argument("--concurrency", type=int, default=4, help="perfis gerados em paralelo")
+    parser.add_argument("--timeout", type=float, default=120, help="timeout por chamada de agente (s)")
+    parser.add_argument("--output", default=os.environ.get("PRECOMPUTED_CATALOG_PATH", DEFAULT_CATALOG_PATH))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(build_catalog(args))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import os
+import logging
+from typing import Any, Dict, Iterable, Optional, Sequence, Tuple
+
+import asyncpg
+import orjson
+from asyncpg.prepared_stmt import PreparedStatement
+
+logger = logging.getLogger(__name__)
+
+# Desligue (DB_PREPARE_STATEMENTS=0) atrás do pgbouncer em modo transaction,
+# onde prepared statements nomeados não sobrevivem entre transações
+PREPARE_STATEMENTS = os.environ.get("DB_PREPARE_STATEMENTS", "1") == "1"
+
+INSERT_LEAD_PROFILE = "insert_lead_profile"
+INSERT_QUEUED_LEAD = "insert_queued_lead"
+UPDATE_LEAD_STATUS = "update_lead_status"
+UPDATE_LEAD_REPORT = "update_lead_report"
+UPDATE_LEAD_SCORES = "update_lead_scores"
+SELECT_LEAD_STATUS = "select_lead_status"
+SELECT_LEAD_REPORT = "select_lead_report"
+SELECT_NOW = "select_now"
+SELECT_DB_INFO = "select_db_info"
+
+# Statements do caminho quente, preparados uma vez por conexão do pool.
+# O INSERT em lead_profiles é idempotente (o id vem do LeadWriter): regravar
+# uma linha do spool que já tinha sido gravada não é erro
+STATEMENTS: Dict[str, str] = {
+    INSERT_LEAD_PROFILE: """
+        INSERT INTO lead_profiles (
+            id, lead_email, lead_phone, name,
+            raw_p1_sector, raw_p2_company_size, raw_p3_role,
+            raw_p4_main_pain, raw_p5_critical_area, raw_p6_pain_quant,
+            raw_p7_digital_maturity, raw_p8_investment, raw_p9_urgency,
+            status, ai_score_final, ai_scores_json, ai_full_report_json, ai_llm_usage_json
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, ($16::jsonb) -> 'scores_radar', $16, $17)
+        ON CONFLICT (id) DO NOTHING
+    """,
+    INSERT_QUEUED_LEAD: """
+        INSERT INTO lead_profiles (
+            lead_email, lead_phone, name,
+            raw_p1_sector, raw_p2_company_size, raw_p3_role,
+            raw_p4_main_pain, raw_p5_critical_area, raw_p6_pain_quant,
+            raw_p7_digital_maturity, raw_p8_investment, raw_p9_urgency,
+            status
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13)
+        RETURNING id
+    """,
+    UPDATE_LEAD_STATUS: "UPDATE lead_profiles SET status = $2 WHERE id = $1",
+    UPDATE_LEAD_REPORT: """
+        UPDATE lead_profiles
+        SET ai_score_final = $2, ai_scores_json = ($3::jsonb) -> 'scores_radar', ai_full_report_json = $3,
+            ai_llm_usage_json = $4
+        WHERE id = $1
+    """,
+    # Recalculo dos scores (scoring.py --rescore): colunas e cópia dentro do relatório
+    UPDATE_LEAD_SCORES: """
+        UPDATE lead_profiles
+        SET ai_score_final = $2::float8,
+            ai_scores_json = $3::jsonb,
+            ai_full_report_json = jsonb_set(
+                jsonb_set(ai_full_report_json, '{score_final}', to_jsonb($2::float8)),
+                '{scores_radar}', $3::jsonb
+            )
+        WHERE id = $1
+    """,
+    SELECT_LEAD_STATUS: "SELECT status FROM lead_profiles WHERE id = $1",
+    # GET /api/v2/reports/{id}: o hash do JSON vem do banco, sem reserializar no Python
+    SELECT_LEAD_REPORT: """
+        SELECT ai_full_report_json, md5(ai_full_report_json::text) AS report_hash, created_at
+        FROM lead_profiles
+        WHERE id = $1
+    """,
+    SELECT_NOW: "SELECT NOW()",
+    # As quatro consultas de diagnóstico do /db-info em um único round-trip
+    SELECT_DB_INFO: """
+        SELECT
+            version() AS version,
+            current_database() AS database,
+            current_user AS "user",
+            EXISTS (
+                SELECT FROM information_schema.tables
+                WHERE table_schema = 'public'
+                AND table_name = 'lead_profiles'
+            ) AS table_lead_profiles_exists
+    """,
+}
+
+
+# Coluna criada por migrations.py. Enquanto o schema não é migrado, a API usa
+# as variantes abaixo, sem a coluna, com o número de parâmetros indicado
+# (os parâmetros excedentes são descartados em execute/executemany)
+LLM_USAGE_COLUMN = "ai_llm_usage_json"
+STATEMENTS_WITHOUT_LLM_USAGE: Dict[str, Tuple[str, int]] = {
+    INSERT_LEAD_PROFILE: ("""
+        INSERT INTO lead_profiles (
+            id, lead_email, lead_phone, name,
+            raw_p1_sector, raw_p2_company_size, raw_p3_role,
+            raw_p4_main_pain, raw_p5_critical_area, raw_p6_pain_quant,
+            raw_p7_digital_maturity, raw_p8_investment, raw_p9_urgency,
+            status, ai_score_final, ai_scores_json, ai_full_report_json
+        ) VALUES ($1, $2, $3, $4, $5, $6, $7, $8, $9, $10, $11, $12, $13, $14, $15, ($16::jsonb) -> 'scores_radar', $16)
+        ON CONFLICT (id) DO NOTHING
+    """, 16),
+    UPDATE_LEAD_REPORT: ("""
+        UPDATE lead_profiles
+        SET ai_score_final = $2, ai_scores_json = ($3::jsonb) -> 'scores_radar', ai_full_report_json = $3
+        WHERE id = $1
+    """, 3),
+}
+
+# Statement -> nº de parâmetros aceitos, quando a variante sem a coluna está em uso
+_param_limits: Dict[str, int] = {}
+
+
+class RawJSON(str):
+    """
+    JSON já serializado (ex.: saída de model_dump_json), enviado ao
+    Postgres sem passar de novo pelo serializador
+    """
+
+
+def encode_json(value: Any) -> str:
+    if isinstance(value, RawJSON):
+        return value
+    return orjson.dumps(value).decode()
+
+
+def decode_json(value: str) -> Any:
+    return orjson.loads(value)
+
+
+class AppConnection(asyncpg.Connection):
+    """
+    Conexão do pool que guarda os prepared statements criados no init
+    """
+
+    def __init__(self, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.prepared: Dict[str, PreparedStatement] = {}
+
+
+async def init_connection(conn: AppConnection):
+    """
+    Hook init do pool, executado em cada conexão nova: registra o codec
+    JSON/JSONB (orjson) e prepara os statements quentes. Um statement que
+    falha (ex.: tabela ainda não criada) fica de fora e passa a ser enviado
+    como texto.
+    """
+    for type_name in ("json", "jsonb"):
+        await conn.set_type_codec(
+            type_name,
+            encoder=encode_json,
+            decoder=decode_json,
+            schema="pg_catalog",
+        )
+
+    if not PREPARE_STATEMENTS:
+        return
+    for name, sql in STATEMENTS.items():
+        try:
+            conn.prepared[name] = await conn.prepare(sql)
+        except Exception as e:
+            logger.warning(f"⚠️  Statement {name} não foi preparado: {e}")
+
+
+async def column_exists(conn, table: str, column: str) -> bool:
+    return await conn.fetchval(
+        """
+        SELECT EXISTS (
+            SELECT FROM information_schema.columns
+            WHERE table_schema = 'public' AND table_name = $1 AND column_name = $2
+        )
+        """,
+        table, column
+    )
+
+
+async def configure_optional_columns(pool: asyncpg.Pool) -> bool:
+    """
+    Confere se o schema já tem as colunas de migrations.py. Se não tiver,
+    troca os statements pelas variantes sem elas (e recicla as conexões,
+    preparadas com a versão anterior) em vez de falhar cada insert.
+    """
+    async with pool.acquire() as conn:
+        if await column_exists(conn, "lead_profiles", LLM_USAGE_COLUMN):
+            return True
+    for name, (sql, params) in STATEMENTS_WITHOUT_LLM_USAGE.items():
+        STATEMENTS[name] = sql
+        _param_limits[name] = params
+    await pool.expire_connections()
+    logger.warning(f"⚠️  lead_profiles sem a coluna {LLM_USAGE_COLUMN}: uso de LLM não será gravado (rode migrations.py)")
+    return False
+
+
+def _params(name: str, args: Sequence) -> Sequence:
+    limit = _param_limits.get(name)
+    return args if limit is None else args[:limit]
+
+
+def _prepared(conn, name: str):
+    prepared = getattr(conn, "prepared", None)
+    return prepared.get(name) if prepared else None
+
+
+async def fetchval(conn, name: str, *args) -> Any:
+    statement = _prepared(conn, name)
+    if statement is None:
+        return await conn.fetchval(STATEMENTS[name], *args)
+    return await statement.fetchval(*args)
+
+
+async def fetchrow(conn, name: str, *args) -> Optional[asyncpg.Record]:
+    statement = _prepared(conn, name)
+    if statement is None:
+        return await conn.fetchrow(STATEMENTS[name], *args)
+    return await statement.fetchrow(*args)
+
+
+async def execute(conn, name: str, *args):
+    args = _params(name, args)
+    statement = _prepared(conn, name)
+    if statement is None:
+        await conn.execute(STATEMENTS[name], *args)
+    else:
+        await statement.fetch(*args)
+
+
+async def executemany(conn, name: str, args: Iterable[Sequence]):
+    if name in _param_limits:
+        args = [_params(name, row) for row in args]
+    statement = _prepared(conn, name)
+    if statement is None:
+        await conn.executemany(STATEMENTS[name], args)
+    else:
+        await statement.executemany(args)
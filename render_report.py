@@ -1,81 +1,244 @@
 import os
-import json
 import datetime
+import hashlib
+import json
 import jinja2
 import logging
+from collections import OrderedDict
+from typing import Dict, Mapping, Optional
+
+from markupsafe import Markup
+
+from tracing import is_tracing, trace
+from report_assets import load_css_bundle, radar_svg
+from metrics import STAGE_RENDER, stage_timer
 
 logger = logging.getLogger(__name__)
 
-def renderizar_relatorio(dados_diagnostico: dict) -> str:
+TEMPLATE_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATE_NAME = 'relatorio_template.html'
+
+# Seções do relatório que chegam depois do shell no modo streaming
+STREAM_SECTIONS = {
+    'introducao': 'relatorio_introducao.html',
+    'oportunidades': 'relatorio_oportunidades.html',
+}
+STREAM_CLOSE = "\n</body>\n</html>\n"
+
+# Cada seção é enviada dentro de um <template> e trocada pelo placeholder
+# correspondente (slot-<secao>) assim que o navegador recebe o chunk
+STREAM_CHUNK = """
+<template id="chunk-{secao}">{html}</template>
+<script>(function(){{var t=document.getElementById('chunk-{secao}');document.getElementById('slot-{secao}').replaceWith(t.content);t.remove();}})();</script>
+"""
+
+
+def register_report_globals(env: jinja2.Environment, template_dir: str = TEMPLATE_DIR, rebuild: bool = False):
+    """
+    Globais usados pelos templates do relatório (bundle CSS e radar SVG)
+    """
+    env.globals.update(
+        css_bundle=load_css_bundle(template_dir, rebuild=rebuild),
+        radar_svg=radar_svg,
+    )
+
+
+class ReportRenderer:
+    """
+    Mantém um único Environment do Jinja2 e o template compilado em memória.
+
+    Em produção o template é compilado uma vez (com bytecode cache em disco,
+    reaproveitado entre processos) e auto_reload fica desligado, então não há
+    stat() nem recompilação por requisição. Com REPORT_TEMPLATE_HOT_RELOAD=1
+    o Jinja volta a checar o arquivo a cada render, para desenvolvimento.
+
+    O bundle CSS e o radar SVG (report_assets) ficam disponíveis para os
+    templates como css_bundle e radar_svg(), sem nenhum asset externo.
+    """
+
+    def __init__(self, template_dir: str = TEMPLATE_DIR, template_name: str = TEMPLATE_NAME, hot_reload: Optional[bool] = None):
+        if hot_reload is None:
+            hot_reload = os.environ.get("REPORT_TEMPLATE_HOT_RELOAD", "0") == "1"
+        self.template_name = template_name
+        self.hot_reload = hot_reload
+
+        bytecode_cache = None
+        if not hot_reload:
+            cache_dir = os.environ.get("REPORT_BYTECODE_CACHE_DIR")
+            if cache_dir:
+                os.makedirs(cache_dir, exist_ok=True)
+            bytecode_cache = jinja2.FileSystemBytecodeCache(directory=cache_dir)
+
+        self.env = jinja2.Environment(
+            loader=jinja2.FileSystemLoader(searchpath=template_dir),
+            auto_reload=hot_reload,
+            bytecode_cache=bytecode_cache,
+        )
+        register_report_globals(self.env, template_dir, rebuild=hot_reload)
+        self._templates: Dict[str, jinja2.Template] = {}
+        self.template_version = self.compute_template_version()
+
+    def get_template(self, template_name: Optional[str] = None) -> jinja2.Template:
+        """
+        Retorna o template compilado (recompila só em modo hot-reload)
+        """
+        template_name = template_name or self.template_name
+        if self.hot_reload or template_name not in self._templates:
+            self._templates[template_name] = self.env.get_template(template_name)
+        return self._templates[template_name]
+
+    def template_sources(self) -> Dict[str, str]:
+        """
+        Fontes dos templates e o bundle CSS, tudo que define o HTML gerado além dos dados
+        """
+        sources = {
+            name: self.env.loader.get_source(self.env, name)[0]
+            for name in (self.template_name, *STREAM_SECTIONS.values())
+        }
+        sources['css_bundle'] = str(self.env.globals['css_bundle'])
+        return sources
+
+    def compute_template_version(self) -> str:
+        """
+        Id estável da versão do template (hash das fontes)
+        """
+        material = json.dumps(self.template_sources(), sort_keys=True, ensure_ascii=False)
+        return hashlib.sha256(material.encode('utf-8')).hexdigest()[:16]
+
+    def load(self):
+        """
+        Compila os templates antecipadamente (chamado na inicialização da API)
+        """
+        for template_name in (self.template_name, *STREAM_SECTIONS.values()):
+            self.get_template(template_name)
+        logger.info(f"✅ Template {self.template_name} compilado (versão {self.template_version}, hot-reload: {self.hot_reload})")
+
+
+# Instância global
+report_renderer = ReportRenderer()
+
+
+def template_from_sources(sources: Mapping[str, str], template_name: str = TEMPLATE_NAME) -> jinja2.Template:
+    """
+    Template de uma versão antiga, montado a partir das fontes guardadas
+    (ReportRenderer.template_sources), com o bundle CSS daquela versão
+    """
+    env = jinja2.Environment(
+        loader=jinja2.DictLoader({name: source for name, source in sources.items() if name != 'css_bundle'}),
+    )
+    env.globals.update(css_bundle=Markup(sources.get('css_bundle', '')), radar_svg=radar_svg)
+    return env.get_template(template_name)
+
+
+class RenderedReportCache:
+    """
+    LRU em memória dos relatórios já renderizados, indexado pelo ETag
+    (que muda junto com os dados, a versão do template ou a data de geração)
+    """
+
+    def __init__(self, max_entries: Optional[int] = None):
+        self.max_entries = max_entries or int(os.environ.get("REPORT_CACHE_MAX_ENTRIES", "256"))
+        self._entries: "OrderedDict[str, str]" = OrderedDict()
+        self.hits = 0
+        self.misses = 0
+
+    def get(self, etag: str) -> Optional[str]:
+        html_content = self._entries.get(etag)
+        if html_content is None:
+            self.misses += 1
+            return None
+        self._entries.move_to_end(etag)
+        self.hits += 1
+        return html_content
+
+    def set(self, etag: str, html_content: str):
+        self._entries[etag] = html_content
+        self._entries.move_to_end(etag)
+        while len(self._entries) > self.max_entries:
+            self._entries.popitem(last=False)
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "entries": len(self._entries),
+            "max_entries": self.max_entries,
+            "hits": self.hits,
+            "misses": self.misses,
+        }
+
+
+# Instância global
+report_cache = RenderedReportCache()
+
+
+def com_datas_de_geracao(dados_diagnostico: dict, gerado_em: Optional[datetime.datetime] = None) -> dict:
+    """
+    Adiciona a data de geração e o ano aos dados do template (agora, ou a
+    data original ao renderizar de novo um relatório já gravado)
+    """
+    gerado_em = gerado_em or datetime.datetime.now()
+    dados_completos = dados_diagnostico.copy()
+    dados_completos['data_geracao'] = gerado_em.strftime("%d/%m/%Y")
+    dados_completos['ano_atual'] = gerado_em.year
+    return dados_completos
+
+
+def renderizar_shell_streaming(dados_diagnostico: dict, gerado_em: Optional[datetime.datetime] = None) -> str:
+    """
+    Renderiza o relatório sem a introdução e as oportunidades (que viram
+    placeholders) e sem fechar o documento. Só precisa dos scores.
+    """
+    template = report_renderer.get_template()
+    return template.render(com_datas_de_geracao(dados_diagnostico, gerado_em), streaming=True)
+
+
+def renderizar_secao_streaming(secao: str, dados_secao: dict) -> str:
+    """
+    Renderiza uma seção (introducao ou oportunidades) como chunk de streaming
+    """
+    template = report_renderer.get_template(STREAM_SECTIONS[secao])
+    return STREAM_CHUNK.format(secao=secao, html=template.render(dados_secao))
+
+
+def renderizar_relatorio(
+    dados_diagnostico: dict,
+    gerado_em: Optional[datetime.datetime] = None,
+    template: Optional[jinja2.Template] = None,
+) -> str:
     """
     Renderiza o template HTML do relatório com os dados fornecidos.
 
     Args:
         dados_diagnostico: Um dicionário contendo todos os dados para o template.
+        gerado_em: Data de geração exibida no relatório (padrão: agora).
+        template: Template de outra versão (padrão: o template atual).
 
     Returns:
         O conteúdo HTML do relatório renderizado como uma string.
     """
     
-    logger.info("🎨 INICIANDO RENDERIZAÇÃO DO RELATÓRIO")
-    logger.info(f"📋 Dados recebidos: {json.dumps(dados_diagnostico, indent=2, ensure_ascii=False)}")
+    if is_tracing():
+        trace("render.input", dados=dados_diagnostico)
     
     try:
-        # O searchpath agora aponta para o diretório onde o script está localizado.
-        script_dir = os.path.dirname(os.path.abspath(__file__))
-        template_loader = jinja2.FileSystemLoader(searchpath=script_dir)
-        template_env = jinja2.Environment(loader=template_loader)
-        
-        logger.info(f"📂 Procurando template em: {script_dir}")
-        
-        # Verificar se o template existe
-        template_path = os.path.join(script_dir, 'relatorio_template.html')
-        if not os.path.exists(template_path):
-            logger.error(f"❌ Template não encontrado: {template_path}")
-            raise FileNotFoundError(f"Template não encontrado: {template_path}")
-        
-        template = template_env.get_template('relatorio_template.html')
-        logger.info("✅ Template carregado com sucesso")
+        template = template or report_renderer.get_template()
 
-        # Adiciona a data de geração e o ano atual aos dados do template
-        dados_completos = dados_diagnostico.copy()
-        dados_completos['data_geracao'] = datetime.datetime.now().strftime("%d/%m/%Y")
-        dados_completos['ano_atual'] = datetime.datetime.now().year
+        dados_completos = com_datas_de_geracao(dados_diagnostico, gerado_em)
 
-        # Log dos dados que serão enviados para o template
-        logger.info("📊 DADOS PARA O TEMPLATE:")
-        logger.info(f"  📈 Score Final: {dados_completos.get('score_final', 'MISSING')}")
-        
-        scores_radar = dados_completos.get('scores_radar', {})
-        if scores_radar:
-            logger.info("  📊 Scores Radar:")
-            for key, value in scores_radar.items():
-                logger.info(f"    {key}: {value}")
-        else:
+        if not dados_completos.get('scores_radar'):
             logger.error("❌ scores_radar está vazio ou ausente!")
         
-        empresa = dados_completos.get('empresa', {})
-        logger.info(f"  🏢 Empresa: {empresa}")
-        
-        oportunidades = dados_completos.get('relatorio_oportunidades', [])
-        logger.info(f"  💡 Oportunidades: {len(oportunidades)} encontradas")
-        
-        # Renderiza o template com os dados
-        logger.info("🔄 Renderizando template...")
-        html_content = template.render(dados_completos)
+        with stage_timer(STAGE_RENDER):
+            html_content = template.render(dados_completos)
+        logger.info(f"✅ Relatório renderizado ({len(html_content)} caracteres)")
         
-        logger.info(f"✅ Template renderizado com sucesso! Tamanho: {len(html_content)} caracteres")
-        
-        # Verificar se os scores aparecem no HTML gerado
-        if f"score_final" in html_content:
-            logger.info("✅ score_final encontrado no HTML gerado")
-        else:
-            logger.warning("⚠️ score_final NÃO encontrado no HTML gerado")
-            
-        if "scores_radar.poder_de_decisao" in html_content:
-            logger.info("✅ scores_radar encontrado no HTML gerado")
-        else:
-            logger.warning("⚠️ scores_radar NÃO encontrado no HTML gerado")
+        if is_tracing():
+            trace(
+                "render.output",
+                tamanho=len(html_content),
+                score_final=dados_completos.get('score_final'),
+                oportunidades=len(dados_completos.get('relatorio_oportunidades', [])),
+                score_final_no_html=str(dados_completos.get('score_final')) in html_content,
+            )
         
         return html_content
         
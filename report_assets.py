@@ -0,0 +1,390 @@
+#!/usr/bin/env python3
+"""
+Assets do relatório embutidos no HTML (sem CDN)
+
+O relatório não carrega mais o Tailwind nem o Chart.js de CDNs: o CSS é um
+bundle minificado só com as classes usadas nos templates, gerado aqui e
+embutido em um <style>, e o radar é um SVG estático montado em Python a
+partir de scores_radar. O HTML renderizado é autocontido, então o PDF não
+faz nenhum acesso à rede.
+
+Uso (rodar sempre que os templates ganharem classes novas):
+    python report_assets.py build    (gera relatorio.min.css)
+    python report_assets.py check    (falha se o bundle estiver desatualizado)
+"""
+
+import argparse
+import math
+import os
+import re
+import logging
+from typing import Dict, Iterable, List, Mapping, Optional, Set, Tuple
+
+from markupsafe import Markup, escape
+
+logger = logging.getLogger(__name__)
+
+ASSETS_DIR = os.path.dirname(os.path.abspath(__file__))
+TEMPLATES = ('relatorio_template.html', 'relatorio_introducao.html', 'relatorio_oportunidades.html')
+CSS_BUNDLE_NAME = 'relatorio.min.css'
+CSS_BUNDLE_HEADER = "/* gerado por report_assets.py build - não edite */\n"
+
+# --- Paleta: cores do Tailwind usadas nos templates + tokens do tema ---
+
+COLORS = {
+    "white": "#ffffff",
+    "gray-50": "#f9fafb", "gray-100": "#f3f4f6", "gray-600": "#4b5563",
+    "gray-800": "#1f2937", "gray-900": "#111827",
+    "red-500": "#ef4444",
+    "yellow-500": "#eab308", "yellow-600": "#ca8a04",
+    "green-500": "#22c55e", "green-600": "#16a34a",
+    "blue-50": "#eff6ff", "blue-400": "#60a5fa", "blue-700": "#1d4ed8", "blue-800": "#1e40af",
+    # Tema (antes nas variáveis :root do template)
+    "background": "#ffffff", "foreground": "#111827",
+    "card": "#ffffff", "card-foreground": "#111827",
+    "primary": "#3b82f6", "primary-foreground": "#ffffff",
+    "secondary": "#6b7280", "secondary-foreground": "#ffffff",
+    "muted": "#f3f4f6", "muted-foreground": "#6b7280",
+    "destructive": "#ef4444", "destructive-foreground": "#ffffff",
+    "border": "#e5e7eb",
+}
+
+# Preflight reduzido do Tailwind + estilos próprios do relatório
+BASE_CSS = """
+*, ::before, ::after {
+    box-sizing: border-box;
+    border: 0 solid #e5e7eb;
+}
+html {
+    line-height: 1.5;
+    -webkit-text-size-adjust: 100%;
+}
+body {
+    margin: 0;
+    font-family: 'Source Serif Pro', Georgia, 'Times New Roman', serif;
+    background-color: #ffffff;
+    color: #111827;
+}
+h1, h2, h3, h4, h5, h6 {
+    font-size: inherit;
+    font-weight: inherit;
+}
+h1, h2, h3, h4, h5, h6, p {
+    margin: 0;
+}
+a {
+    color: inherit;
+    text-decoration: inherit;
+}
+svg {
+    display: block;
+    vertical-align: middle;
+}
+.page-break {
+    page-break-after: always;
+}
+@media print {
+    body {
+        -webkit-print-color-adjust: exact;
+        print-color-adjust: exact;
+    }
+    .no-print {
+        display: none;
+    }
+}
+"""
+
+SCREENS = {"sm": "640px", "md": "768px"}
+
+SPACING = {
+    "0": "0px", "1": ".25rem", "2": ".5rem", "3": ".75rem", "4": "1rem", "6": "1.5rem",
+    "8": "2rem", "12": "3rem", "16": "4rem", "32": "8rem", "48": "12rem",
+}
+
+SPACING_PROPERTIES = {
+    "p": ("padding",), "px": ("padding-left", "padding-right"), "py": ("padding-top", "padding-bottom"),
+    "pt": ("padding-top",), "pb": ("padding-bottom",),
+    "m": ("margin",), "mx": ("margin-left", "margin-right"), "my": ("margin-top", "margin-bottom"),
+    "mt": ("margin-top",), "mb": ("margin-bottom",),
+    "w": ("width",), "h": ("height",), "gap": ("gap",),
+}
+
+COLOR_PROPERTIES = {"bg": "background-color", "text": "color", "border": "border-color"}
+
+_SHADOW = "0 0 #0000"
+
+STATIC_UTILITIES = {
+    # Layout
+    "container": "width:100%",
+    "flex": "display:flex", "grid": "display:grid", "inline-block": "display:inline-block",
+    "flex-col": "flex-direction:column",
+    "grid-cols-1": "grid-template-columns:repeat(1,minmax(0,1fr))",
+    "grid-cols-2": "grid-template-columns:repeat(2,minmax(0,1fr))",
+    "items-center": "align-items:center", "items-start": "align-items:flex-start",
+    "justify-center": "justify-content:center", "justify-between": "justify-content:space-between",
+    "relative": "position:relative", "absolute": "position:absolute", "inset-0": "inset:0px",
+    "overflow-hidden": "overflow:hidden",
+    "mx-auto": "margin-left:auto;margin-right:auto",
+    "w-full": "width:100%", "h-full": "height:100%", "h-screen": "height:100vh",
+    "max-w-2xl": "max-width:42rem", "max-w-3xl": "max-width:48rem", "max-w-4xl": "max-width:56rem",
+    # Tipografia
+    "text-xs": "font-size:.75rem;line-height:1rem",
+    "text-sm": "font-size:.875rem;line-height:1.25rem",
+    "text-lg": "font-size:1.125rem;line-height:1.75rem",
+    "text-xl": "font-size:1.25rem;line-height:1.75rem",
+    "text-2xl": "font-size:1.5rem;line-height:2rem",
+    "text-3xl": "font-size:1.875rem;line-height:2.25rem",
+    "text-4xl": "font-size:2.25rem;line-height:2.5rem",
+    "text-5xl": "font-size:3rem;line-height:1",
+    "text-center": "text-align:center", "text-left": "text-align:left",
+    "font-light": "font-weight:300", "font-semibold": "font-weight:600",
+    "font-bold": "font-weight:700", "font-extrabold": "font-weight:800",
+    "italic": "font-style:italic", "uppercase": "text-transform:uppercase",
+    "leading-relaxed": "line-height:1.625",
+    # Bordas e sombras
+    "border": "border-width:1px", "border-b-2": "border-bottom-width:2px", "border-l-4": "border-left-width:4px",
+    "rounded-md": "border-radius:.375rem", "rounded-lg": "border-radius:.5rem", "rounded-full": "border-radius:9999px",
+    "rounded-t-lg": "border-top-left-radius:.5rem;border-top-right-radius:.5rem",
+    "rounded-b-lg": "border-bottom-left-radius:.5rem;border-bottom-right-radius:.5rem",
+    "rounded-r-lg": "border-top-right-radius:.5rem;border-bottom-right-radius:.5rem",
+    "shadow-md": "box-shadow:0 4px 6px -1px rgba(0,0,0,.1),0 2px 4px -2px rgba(0,0,0,.1)",
+    "shadow-lg": "box-shadow:0 10px 15px -3px rgba(0,0,0,.1),0 4px 6px -4px rgba(0,0,0,.1)",
+    "shadow-2xl": "box-shadow:0 25px 50px -12px rgba(0,0,0,.25)",
+    "transition-colors": (
+        "transition-property:color,background-color,border-color,text-decoration-color,fill,stroke;"
+        "transition-timing-function:cubic-bezier(.4,0,.2,1);transition-duration:150ms"
+    ),
+}
+
+_SPACING_RE = re.compile(r"^(%s)-(\w+)$" % "|".join(sorted(SPACING_PROPERTIES, key=len, reverse=True)))
+_SPACE_Y_RE = re.compile(r"^space-y-(\w+)$")
+_COLOR_RE = re.compile(r"^(bg|text|border)-([a-z]+(?:-[a-z]+)*(?:-\d+)?)(?:/(\d+))?$")
+_CLASS_ATTR_RE = re.compile(r'class="([^"]*)"')
+_JINJA_RE = re.compile(r"{%.*?%}|{{.*?}}", re.S)
+_BASE_CLASS_RE = re.compile(r"\.([\w-]+)")
+
+
+def rgba(hex_color: str, alpha: float) -> str:
+    r, g, b = (int(hex_color[i:i + 2], 16) for i in (1, 3, 5))
+    return f"rgba({r},{g},{b},{alpha:g})"
+
+
+def utility_rule(utility: str) -> Optional[Tuple[str, str]]:
+    """
+    Regra de uma classe utilitária sem variante: (sufixo do seletor, declarações),
+    ou None se a classe não é conhecida
+    """
+    if utility in STATIC_UTILITIES:
+        return "", STATIC_UTILITIES[utility]
+
+    match = _SPACE_Y_RE.match(utility)
+    if match and match.group(1) in SPACING:
+        return ">*+*", f"margin-top:{SPACING[match.group(1)]}"
+
+    match = _SPACING_RE.match(utility)
+    if match and match.group(2) in SPACING:
+        return "", ";".join(f"{prop}:{SPACING[match.group(2)]}" for prop in SPACING_PROPERTIES[match.group(1)])
+
+    match = _COLOR_RE.match(utility)
+    if match and match.group(2) in COLORS:
+        color = COLORS[match.group(2)]
+        if match.group(3):
+            color = rgba(color, int(match.group(3)) / 100)
+        return "", f"{COLOR_PROPERTIES[match.group(1)]}:{color}"
+
+    return None
+
+
+def escape_class(name: str) -> str:
+    return re.sub(r"([:/.])", r"\\\1", name)
+
+
+def template_classes(template_dir: str = ASSETS_DIR, templates: Iterable[str] = TEMPLATES) -> Set[str]:
+    """
+    Classes usadas nos atributos class dos templates (trechos Jinja ignorados)
+    """
+    classes: Set[str] = set()
+    for name in templates:
+        with open(os.path.join(template_dir, name), encoding="utf-8") as f:
+            for value in _CLASS_ATTR_RE.findall(f.read()):
+                classes.update(_JINJA_RE.sub(" ", value).split())
+    return classes
+
+
+def minify_css(css: str) -> str:
+    css = re.sub(r"/\*.*?\*/", "", css, flags=re.S)
+    css = re.sub(r"\s+", " ", css)
+    css = re.sub(r"\s*([{};:,>+~])\s*", r"\1", css)
+    return css.replace(";}", "}").strip()
+
+
+def build_css(classes: Iterable[str]) -> Tuple[str, List[str]]:
+    """
+    Monta o bundle minificado para as classes informadas.
+    Retorna (css, classes desconhecidas).
+    """
+    base_classes = set(_BASE_CLASS_RE.findall(BASE_CSS))
+    base_rules: List[str] = []
+    screen_rules: Dict[str, List[str]] = {screen: [] for screen in SCREENS}
+    unknown: List[str] = []
+
+    for name in sorted(classes):
+        if name in base_classes:
+            continue
+        *variants, utility = name.split(":")
+        rule = utility_rule(utility)
+        if rule is None or any(v not in SCREENS and v != "hover" for v in variants):
+            unknown.append(name)
+            continue
+        suffix, declarations = rule
+        selector = "." + escape_class(name) + (":hover" if "hover" in variants else "") + suffix
+        screens = [v for v in variants if v in SCREENS]
+        (screen_rules[screens[0]] if screens else base_rules).append(f"{selector}{{{declarations}}}")
+
+    # .container segue os breakpoints, como no Tailwind (antes dos utilitários)
+    css = [minify_css(BASE_CSS)]
+    if "container" in classes:
+        css.extend(f"@media (min-width:{width}){{.container{{max-width:{width}}}}}" for width in SCREENS.values())
+    css.extend(base_rules)
+    for screen, rules in screen_rules.items():
+        if rules:
+            css.append(f"@media (min-width:{SCREENS[screen]}){{{''.join(rules)}}}")
+    return "".join(css), unknown
+
+
+def build_css_bundle(template_dir: str = ASSETS_DIR) -> Tuple[str, List[str]]:
+    return build_css(template_classes(template_dir))
+
+
+def load_css_bundle(template_dir: str = ASSETS_DIR, rebuild: bool = False) -> Markup:
+    """
+    Lê o bundle gerado pelo build; se ele não existir (ou com rebuild=True,
+    no modo hot-reload) monta em memória a partir dos templates
+    """
+    path = os.path.join(template_dir, CSS_BUNDLE_NAME)
+    if not rebuild and os.path.exists(path):
+        with open(path, encoding="utf-8") as f:
+            return Markup(f.read().removeprefix(CSS_BUNDLE_HEADER))
+
+    css, unknown = build_css_bundle(template_dir)
+    if unknown:
+        logger.warning(f"⚠️  Classes sem regra no bundle CSS: {', '.join(unknown)}")
+    if not rebuild:
+        logger.warning(f"⚠️  {CSS_BUNDLE_NAME} não encontrado, bundle montado em memória (rode report_assets.py build)")
+    return Markup(css)
+
+
+# --- Radar (SVG estático) ---
+
+# Mesma ordem e rótulos do gráfico que o Chart.js desenhava
+RADAR_AXES = (
+    ("poder_de_decisao", "Poder de Decisão"),
+    ("cultura_e_talentos", "Maturidade Digital"),
+    ("processos_e_automacao", "Dor"),
+    ("inovacao_de_produtos", "Poder de Investimento"),
+    ("inteligencia_de_mercado", "Urgência"),
+)
+RADAR_WIDTH = 520
+RADAR_HEIGHT = 320
+RADAR_RADIUS = 115
+RADAR_MAX = 10.0
+RADAR_LEVELS = 5
+
+
+def _radar_point(index: int, value: float, count: int = len(RADAR_AXES)) -> Tuple[float, float]:
+    angle = -math.pi / 2 + 2 * math.pi * index / count
+    radius = RADAR_RADIUS * value / RADAR_MAX
+    return RADAR_WIDTH / 2 + radius * math.cos(angle), RADAR_HEIGHT / 2 + radius * math.sin(angle)
+
+
+def _points(points: Iterable[Tuple[float, float]]) -> str:
+    return " ".join(f"{x:.1f},{y:.1f}" for x, y in points)
+
+
+def radar_svg(scores: Mapping[str, float]) -> Markup:
+    """
+    Gráfico de radar do scores_radar (escala 0-10) como SVG inline
+    """
+    primary = COLORS["primary"]
+    count = len(RADAR_AXES)
+    parts = [
+        f'<svg viewBox="0 0 {RADAR_WIDTH} {RADAR_HEIGHT}" width="100%" role="img" '
+        f'xmlns="http://www.w3.org/2000/svg" font-family="inherit">',
+        "<title>Análise por Pilar Estratégico</title>",
+    ]
+
+    # Grade: um pentágono por nível, com a escala no eixo vertical
+    for level in range(1, RADAR_LEVELS + 1):
+        value = RADAR_MAX * level / RADAR_LEVELS
+        grid = _points(_radar_point(i, value) for i in range(count))
+        parts.append(f'<polygon points="{grid}" fill="none" stroke="{COLORS["border"]}" stroke-width="1"/>')
+        x, y = _radar_point(0, value)
+        parts.append(
+            f'<text x="{x + 4:.1f}" y="{y + 4:.1f}" font-size="10" fill="{COLORS["muted-foreground"]}">{value:g}</text>'
+        )
+
+    values = [min(max(float(scores.get(key) or 0), 0.0), RADAR_MAX) for key, _ in RADAR_AXES]
+    points = [_radar_point(i, value) for i, value in enumerate(values)]
+    parts.append(
+        f'<polygon points="{_points(points)}" fill="{rgba(primary, 0.2)}" stroke="{primary}" '
+        f'stroke-width="3" stroke-linejoin="round"/>'
+    )
+    parts.extend(
+        f'<circle cx="{x:.1f}" cy="{y:.1f}" r="3.5" fill="{primary}" stroke="#ffffff" stroke-width="1"/>'
+        for x, y in points
+    )
+
+    # Rótulos logo fora do último nível, alinhados conforme o lado do eixo
+    for i, (_, label) in enumerate(RADAR_AXES):
+        x, y = _radar_point(i, RADAR_MAX * 1.12)
+        dx = x - RADAR_WIDTH / 2
+        anchor = "middle" if abs(dx) < 1 else ("start" if dx > 0 else "end")
+        parts.append(
+            f'<text x="{x:.1f}" y="{y + 4:.1f}" text-anchor="{anchor}" font-size="12" font-weight="bold" '
+            f'fill="{COLORS["foreground"]}">{escape(label)}</text>'
+        )
+
+    parts.append("</svg>")
+    return Markup("".join(parts))
+
+
+# --- PDF sem rede ---
+
+def offline_url_fetcher(url: str, *args, **kwargs):
+    """
+    url_fetcher do WeasyPrint que recusa recursos remotos: o relatório é
+    autocontido e uma referência externa esquecida não pode travar a conversão
+    """
+    if url.startswith(("http://", "https://")):
+        raise ValueError(f"Recurso externo bloqueado na conversão do PDF: {url}")
+    from weasyprint import default_url_fetcher
+
+    return default_url_fetcher(url, *args, **kwargs)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("build", "check"))
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    css, unknown = build_css_bundle()
+    if unknown:
+        raise SystemExit(f"❌ Classes sem regra em report_assets.py: {', '.join(unknown)}")
+
+    path = os.path.join(ASSETS_DIR, CSS_BUNDLE_NAME)
+    bundle = CSS_BUNDLE_HEADER + css + "\n"
+    if args.command == "check":
+        current = open(path, encoding="utf-8").read() if os.path.exists(path) else ""
+        if current != bundle:
+            raise SystemExit(f"❌ {CSS_BUNDLE_NAME} desatualizado, rode: python report_assets.py build")
+        logger.info(f"✅ {CSS_BUNDLE_NAME} em dia ({len(css)} bytes)")
+        return
+
+    with open(path, "w", encoding="utf-8") as f:
+        f.write(bundle)
+    logger.info(f"✅ {CSS_BUNDLE_NAME} gerado ({len(css)} bytes)")
+
+
+if __name__ == "__main__":
+    main()
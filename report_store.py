@@ -0,0 +1,253 @@
+import asyncio
+import datetime
+import gzip
+import hashlib
+import json
+import os
+import logging
+from typing import Any, Dict, Mapping, Optional, Set
+from uuid import UUID
+
+import jinja2
+
+from render_report import renderizar_relatorio, template_from_sources
+
+logger = logging.getLogger(__name__)
+
+
+class StoredReport:
+    """
+    Relatório guardado de um lead: só os dados do template, a versão do
+    template e a data da renderização original. O HTML é refeito a partir
+    deles (o template de cada versão fica uma única vez em report_templates).
+    """
+
+    def __init__(self, template_version: str, data: Dict[str, Any], gerado_em: datetime.datetime):
+        self.template_version = template_version
+        self.data = data
+        self.gerado_em = gerado_em
+
+    @property
+    def content_hash(self) -> str:
+        # Mesmos dados, template e data de geração: mesmo HTML
+        material = json.dumps(
+            [self.template_version, self.data, self.gerado_em.isoformat()],
+            sort_keys=True, ensure_ascii=False, separators=(",", ":"), default=str,
+        )
+        return hashlib.sha256(material.encode("utf-8")).hexdigest()
+
+    @property
+    def stored_size(self) -> int:
+        return len(json.dumps(self.data, ensure_ascii=False, default=str).encode("utf-8"))
+
+    @property
+    def etag(self) -> str:
+        return f'"{self.content_hash}"'
+
+    @property
+    def gzip_etag(self) -> str:
+        # ETag forte muda com a codificação: o corpo em gzip não é o mesmo do HTML
+        return f'"{self.content_hash}-gzip"'
+
+
+def accepts_encoding(accept_encoding: Optional[str], coding: str) -> bool:
+    """
+    True se o header Accept-Encoding aceita a codificação: a entrada dela,
+    ou senão a de "*", com q > 0 ("gzip;q=0" recusa o gzip)
+    """
+    qualities: Dict[str, float] = {}
+    for entry in (accept_encoding or "").split(","):
+        name, _, params = entry.partition(";")
+        name = name.strip().lower()
+        if not name:
+            continue
+        quality = 1.0
+        for param in params.split(";"):
+            key, _, value = param.partition("=")
+            if key.strip().lower() == "q":
+                try:
+                    quality = float(value)
+                except ValueError:
+                    quality = 0.0
+        qualities[name] = quality
+    return qualities.get(coding.lower(), qualities.get("*", 0.0)) > 0
+
+
+def compress_html(html_content: str, level: int = 6) -> bytes:
+    # mtime=0: o mesmo HTML gera sempre os mesmos bytes
+    return gzip.compress(html_content.encode("utf-8"), compresslevel=level, mtime=0)
+
+
+class ReportStore:
+    """
+    Guarda o relatório de cada lead sem repetir o que é igual para todos.
+
+    report_templates guarda uma única vez as fontes de cada versão do
+    template (incluindo o bundle CSS), e report_documents guarda por lead só
+    o que muda: os dados do template, a versão usada e a data da renderização
+    original. get() devolve esses dados e render() refaz o HTML com o
+    template da versão gravada (o atual, ou o de report_templates para
+    versões antigas), idêntico ao entregue na hora.
+
+    A gravação roda em background (submit não espera o banco), com no
+    máximo REPORT_STORE_MAX_CONCURRENCY gravações ao mesmo tempo. Acima de
+    REPORT_STORE_MAX_PENDING gravações pendentes o relatório não é guardado
+    (o lead já recebeu o HTML na resposta). stop() aguarda as pendentes por
+    até REPORT_STORE_DRAIN_TIMEOUT_SECONDS e cancela o resto. Desligue com
+    REPORT_STORE_ENABLED=0.
+    """
+
+    def __init__(self):
+        self.enabled = os.environ.get("REPORT_STORE_ENABLED", "1") == "1"
+        self.compression_level = int(os.environ.get("REPORT_STORE_GZIP_LEVEL", "6"))
+        self.max_concurrency = int(os.environ.get("REPORT_STORE_MAX_CONCURRENCY", "4"))
+        self.max_pending = int(os.environ.get("REPORT_STORE_MAX_PENDING", "500"))
+        self.drain_timeout_seconds = float(os.environ.get("REPORT_STORE_DRAIN_TIMEOUT_SECONDS", "10"))
+
+        self.pool = None
+        self.template_version: Optional[str] = None
+        self._pending: Set[asyncio.Task] = set()
+        self._semaphore: Optional[asyncio.Semaphore] = None
+        self._stopping = False
+        # Templates de versões antigas, montados a partir de report_templates
+        self._old_templates: Dict[str, jinja2.Template] = {}
+
+        self.reports_saved = 0
+        self.reports_failed = 0
+        self.reports_dropped = 0
+        self.stored_bytes = 0
+
+    async def setup(self, pool, template_version: str, template_sources: Mapping[str, str]):
+        """
+        Cria as tabelas e registra a versão atual do template
+        """
+        if not (self.enabled and pool is not None):
+            return
+        try:
+            async with pool.acquire() as conn:
+                await conn.execute("""
+                    CREATE TABLE IF NOT EXISTS report_templates (
+                        version TEXT PRIMARY KEY,
+                        sources JSONB NOT NULL,
+                        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                    );
+                    CREATE TABLE IF NOT EXISTS report_documents (
+                        lead_id UUID PRIMARY KEY,
+                        template_version TEXT NOT NULL REFERENCES report_templates (version),
+                        data JSONB NOT NULL,
+                        -- Horário local da renderização original (data exibida no relatório)
+                        gerado_em TIMESTAMP NOT NULL,
+                        created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                    );
+                """)
+                await conn.execute(
+                    "INSERT INTO report_templates (version, sources) VALUES ($1, $2) ON CONFLICT (version) DO NOTHING",
+                    template_version, dict(template_sources)
+                )
+            self.pool = pool
+            self.template_version = template_version
+            self._semaphore = asyncio.Semaphore(self.max_concurrency)
+            logger.info(f"✅ Armazenamento de relatórios habilitado (template {template_version})")
+        except Exception as e:
+            logger.warning(f"⚠️  Armazenamento de relatórios indisponível: {e}")
+
+    def is_running(self) -> bool:
+        return self.pool is not None
+
+    def submit(self, lead_id: UUID, template_data: Dict[str, Any], gerado_em: datetime.datetime):
+        """
+        Agenda a gravação do relatório do lead, sem bloquear a requisição
+        """
+        if not self.is_running() or self._stopping:
+            return
+        if len(self._pending) >= self.max_pending:
+            self.reports_dropped += 1
+            logger.warning(f"⚠️  {len(self._pending)} gravações de relatório pendentes, relatório do lead {lead_id} não guardado")
+            return
+        report = StoredReport(self.template_version, template_data, gerado_em)
+        task = asyncio.create_task(self._save_limited(lead_id, report))
+        self._pending.add(task)
+        task.add_done_callback(self._pending.discard)
+
+    async def _save_limited(self, lead_id: UUID, report: StoredReport):
+        async with self._semaphore:
+            await self.save(lead_id, report)
+
+    async def save(self, lead_id: UUID, report: StoredReport):
+        try:
+            async with self.pool.acquire() as conn:
+                await conn.execute(
+                    """
+                    INSERT INTO report_documents (lead_id, template_version, data, gerado_em)
+                    VALUES ($1, $2, $3, $4)
+                    ON CONFLICT (lead_id) DO UPDATE
+                    SET template_version = EXCLUDED.template_version, data = EXCLUDED.data,
+                        gerado_em = EXCLUDED.gerado_em, created_at = now()
+                    """,
+                    lead_id, report.template_version, report.data, report.gerado_em
+                )
+            self.reports_saved += 1
+            self.stored_bytes += report.stored_size
+        except Exception as e:
+            self.reports_failed += 1
+            logger.error(f"❌ Erro ao gravar relatório do lead {lead_id}: {e}")
+
+    async def get(self, lead_id: UUID) -> Optional[StoredReport]:
+        if not self.is_running():
+            return None
+        async with self.pool.acquire() as conn:
+            row = await conn.fetchrow(
+                "SELECT template_version, data, gerado_em FROM report_documents WHERE lead_id = $1",
+                lead_id
+            )
+        if row is None:
+            return None
+        return StoredReport(row["template_version"], row["data"], row["gerado_em"])
+
+    async def render(self, report: StoredReport) -> str:
+        """
+        Refaz o HTML do relatório com o template da versão em que foi gerado
+        """
+        template = None
+        if report.template_version != self.template_version:
+            template = await self._old_template(report.template_version)
+        return renderizar_relatorio(report.data, gerado_em=report.gerado_em, template=template)
+
+    async def _old_template(self, version: str) -> jinja2.Template:
+        template = self._old_templates.get(version)
+        if template is None:
+            async with self.pool.acquire() as conn:
+                sources = await conn.fetchval("SELECT sources FROM report_templates WHERE version = $1", version)
+            template = template_from_sources(sources)
+            self._old_templates[version] = template
+        return template
+
+    async def stop(self):
+        """
+        Aguarda as gravações ainda em andamento (até REPORT_STORE_DRAIN_TIMEOUT_SECONDS) e cancela o resto
+        """
+        self._stopping = True
+        if not self._pending:
+            return
+        done, pending = await asyncio.wait(self._pending, timeout=self.drain_timeout_seconds)
+        for task in pending:
+            task.cancel()
+        await asyncio.gather(*pending, return_exceptions=True)
+        if pending:
+            logger.warning(f"⚠️  {len(pending)} gravações de relatório canceladas no desligamento")
+
+    def stats(self) -> Dict[str, Any]:
+        return {
+            "running": self.is_running(),
+            "template_version": self.template_version,
+            "pending": len(self._pending),
+            "reports_saved": self.reports_saved,
+            "reports_failed": self.reports_failed,
+            "reports_dropped": self.reports_dropped,
+            "old_templates_loaded": len(self._old_templates),
+            "avg_stored_bytes": round(self.stored_bytes / self.reports_saved) if self.reports_saved else 0,
+        }
+
+
+# Instância global
+report_store = ReportStore()
@@ -56,8 +56,11 @@ class FinalReportData(BaseModel):
     empresa: Dict[str, Any]
     scores_radar: Scores
     score_final: float
+    introduction: Optional[str] = None
     relatorio_oportunidades: List[Opportunity]
     relatorio_riscos: List[Dict[str, str]]
+    # Horário local da renderização: a data exibida no relatório, refeita igual depois
+    gerado_em: Optional[datetime] = None
 
 
 # --- Database Model Schema ---
@@ -0,0 +1,279 @@
+#!/usr/bin/env python3
+"""
+Scoring dos leads a partir dos mapas de ALL_QUESTIONS_DATA
+
+Cada mapa categórico vira uma tabela de pontos normalizados (0-1) indexada
+por um código inteiro por resposta (o AnswerIndex resolve o texto do
+formulário para esse código); respostas desconhecidas caem em um código
+extra com o valor neutro. As cinco dimensões do radar são médias
+ponderadas dessas pontuações (matriz DIMENSION_WEIGHTS) em escala 0-10 e o
+score_final é a média ponderada das dimensões.
+
+score_batch pontua N leads de uma vez com NumPy; score_lead é o caminho
+rápido para um lead só, em Python puro, sobre as mesmas tabelas.
+
+Uso (recalcular a tabela lead_profiles após mudar os pesos):
+    python scoring.py --rescore [--chunk-size 1000]
+"""
+
+import argparse
+import asyncio
+import math
+import time
+import logging
+from typing import Dict, List, Mapping, Optional, Sequence, Tuple
+
+import numpy as np
+
+from schemas import LeadProfileInput, Scores
+from answer_index import AnswerIndex
+
+logger = logging.getLogger(__name__)
+
+# This would typically be in a separate file, but including here for simplicity
+# In a real app, load this from a JSON or config file.
+ALL_QUESTIONS_DATA = {
+    "sector": {
+        "Indústria/Manufatura": 1, "Varejo/E-commerce": 1, "Serviços Profissionais": 1,
+        "Saúde/Medicina": 1, "Educação": 1, "Financeiro/Fintech": 1,
+        "Logística/Supply Chain": 1, "Construção/Imobiliário": 1, "Tecnologia/Software": 1,
+        "Alimentação/Restaurantes": 1, "Marketing/Agências": 1, "Recursos Humanos": 1,
+        "Consultoria Empresarial": 1, "Agronegócios": 1, "Manutenção/Serviços Técnicos": 1,
+        "Outros": 1
+    },
+    "size": {
+        "1-10 funcionários": 1, "11-50 funcionários": 2, "51-250 funcionários": 3,
+        "251-500 funcionários": 4, "+500 funcionários": 5
+    },
+    "role": {
+        "Sócio(a)/CEO/Fundador(a)": 3, "Diretor(a)/C-Level": 2.5, "Gerente/Coordenador(a)": 2,
+        "Analista/Especialista": 1, "Estagiário/Trainee": 0.5, "Consultor/Freelancer": 1.5
+    },
+    "pain": {
+        "Processos manuais e repetitivos": 2, "Perda de oportunidades de venda": 2,
+        "Custos operacionais muito altos": 2, "Dificuldade em entender clientes": 2,
+        "Tomada de decisão lenta ou baseada em 'achismo'": 2, "Atendimento ao cliente demorado/ineficiente": 2,
+        "Dificuldade em contratar ou reter bons talentos": 1, "Problemas de compliance/regulamentação": 1,
+        "Não temos grandes gargalos no momento": 0
+    },
+    "quantifyPain": {
+        "Sim, é um custo significativo (>R$ 10k/mês)": 3, "Sim, é um custo moderado (<R$ 10k/mês)": 2.5,
+        "Temos uma estimativa do tempo perdido": 2.5, "Não consigo medir, mas o impacto é alto": 2
+    },
+    "maturity": {
+        "Principalmente na intuição": 0, "Usamos relatórios básicos e planilhas": 0.5,
+        "Temos sistemas centralizados (CRM/ERP)": 1, "Temos cultura de dados, com dashboards e BI": 1.5,
+        "Já usamos alguns insights automatizados/IA": 2
+    },
+    "investment": {
+        "Estamos em fase de estudo, sem orçamento": 0.5, "Até R$ 30.000": 1,
+        "Entre R$ 30.000 e R$ 100.000": 2, "Entre R$ 100.000 e R$ 300.000": 2.5,
+        "Acima de R$ 300.000": 3, "Dependeria do ROI demonstrado": 1.5
+    },
+    "urgency": {
+        "Crítica! Para ontem": 2, "Alta - Próximos 3 meses": 1.5,
+        "Média - Próximos 6-12 meses": 1, "Baixa - Apenas pesquisando": 0.5,
+        "Vai depender da proposta": 1
+    }
+}
+
+# Pergunta -> campo de LeadProfileInput. A área crítica (p5_critical_area) é
+# texto livre e não entra no score: o calculate_scores original a somava em
+# automation_readiness, que não é uma dimensão do radar. Ela só alimenta os
+# prompts dos agentes e a seleção do catálogo
+QUESTION_FIELDS = {
+    "sector": "p1_sector",
+    "size": "p2_company_size",
+    "role": "p3_role",
+    "pain": "p4_main_pain",
+    "quantifyPain": "p6_pain_quant",
+    "maturity": "p7_digital_maturity",
+    "investment": "p8_investment",
+    "urgency": "p9_urgency",
+}
+
+# Valor normalizado (0-1) usado para respostas fora dos mapas
+UNKNOWN_ANSWER_VALUE = 0.5
+
+# Peso de cada pergunta em cada dimensão do radar (cada dimensão soma 1)
+DIMENSION_WEIGHTS = {
+    "poder_de_decisao": {"role": 0.6, "investment": 0.4},
+    "cultura_e_talentos": {"maturity": 0.5, "size": 0.3, "role": 0.2},
+    "processos_e_automacao": {"pain": 0.5, "quantifyPain": 0.3, "urgency": 0.2},
+    "inovacao_de_produtos": {"maturity": 0.5, "investment": 0.3, "sector": 0.2},
+    "inteligencia_de_mercado": {"maturity": 0.4, "urgency": 0.3, "pain": 0.3},
+}
+
+# Peso de cada dimensão no score_final
+FINAL_SCORE_WEIGHTS = {
+    "poder_de_decisao": 0.25,
+    "cultura_e_talentos": 0.15,
+    "processos_e_automacao": 0.25,
+    "inovacao_de_produtos": 0.15,
+    "inteligencia_de_mercado": 0.20,
+}
+
+DIMENSIONS = tuple(Scores.model_fields)
+
+# Arredondamento para 1 casa "half up" com folga: os dois caminhos somam na
+# mesma ordem só até ~1e-15, e um x.x5 não pode virar para lados diferentes
+ROUNDING_EPSILON = 1e-9
+
+
+def round_score(value: float) -> float:
+    return math.floor(value * 10 + 0.5 + ROUNDING_EPSILON) / 10
+
+
+class ScoringTables:
+    """
+    Tabelas de lookup compiladas uma vez a partir dos mapas de perguntas
+    """
+
+    def __init__(
+        self,
+        questions: Mapping[str, Mapping[str, float]] = ALL_QUESTIONS_DATA,
+        dimension_weights: Mapping[str, Mapping[str, float]] = DIMENSION_WEIGHTS,
+        final_weights: Mapping[str, float] = FINAL_SCORE_WEIGHTS,
+    ):
+        self.questions = tuple(QUESTION_FIELDS)
+        # Texto do formulário -> código da resposta (mesma ordem dos mapas)
+        self.answer_index = AnswerIndex(questions)
+        # resposta -> código; o código len(mapa) é o das respostas desconhecidas
+        self.codes: Dict[str, Dict[str, int]] = {}
+        # pontos normalizados por código, com o valor neutro no último slot
+        self.values: Dict[str, np.ndarray] = {}
+        for question in self.questions:
+            answers = questions[question]
+            top = max(answers.values()) or 1
+            self.codes[question] = {answer: code for code, answer in enumerate(answers)}
+            self.values[question] = np.array(
+                [points / top for points in answers.values()] + [UNKNOWN_ANSWER_VALUE]
+            )
+
+        # (perguntas x dimensões) e (dimensões,)
+        self.weights = np.array([
+            [dimension_weights[dimension].get(question, 0.0) for dimension in DIMENSIONS]
+            for question in self.questions
+        ])
+        self.final_weights = np.array([final_weights[dimension] for dimension in DIMENSIONS])
+
+        # As mesmas tabelas como listas, para o caminho de um lead só
+        self._values_list = {question: values.tolist() for question, values in self.values.items()}
+        self._weights_list = self.weights.tolist()
+        self._final_weights_list = self.final_weights.tolist()
+
+    def encode(self, question: str, answer: Optional[str]) -> int:
+        code = self.answer_index.lookup(question, answer)
+        return len(self.codes[question]) if code is None else code
+
+    def encode_columns(self, columns: Mapping[str, Sequence[Optional[str]]]) -> np.ndarray:
+        """
+        Colunas de respostas (campo de LeadProfileInput -> N respostas) para
+        uma matriz (N x perguntas) de códigos
+        """
+        return np.array(
+            [[self.encode(question, answer) for answer in columns[QUESTION_FIELDS[question]]] for question in self.questions],
+            dtype=np.intp,
+        ).T
+
+    def score_codes(self, codes: np.ndarray) -> Tuple[np.ndarray, np.ndarray]:
+        """
+        Pontua N leads codificados: (N x 5) dimensões e (N,) score_final, em escala 0-10
+        """
+        points = np.empty(codes.shape, dtype=float)
+        for column, question in enumerate(self.questions):
+            points[:, column] = self.values[question][codes[:, column]]
+        dimensions = points @ self.weights * 10
+        final = dimensions @ self.final_weights
+        return (
+            np.floor(dimensions * 10 + 0.5 + ROUNDING_EPSILON) / 10,
+            np.floor(final * 10 + 0.5 + ROUNDING_EPSILON) / 10,
+        )
+
+    def score_one(self, form_data: LeadProfileInput) -> Tuple[Scores, float]:
+        points = [
+            self._values_list[question][self.encode(question, getattr(form_data, QUESTION_FIELDS[question]))]
+            for question in self.questions
+        ]
+        dimensions = [
+            sum(point * row[d] for point, row in zip(points, self._weights_list)) * 10
+            for d in range(len(DIMENSIONS))
+        ]
+        final = sum(value * weight for value, weight in zip(dimensions, self._final_weights_list))
+        return Scores(**{name: round_score(value) for name, value in zip(DIMENSIONS, dimensions)}), round_score(final)
+
+
+scoring_tables = ScoringTables()
+answer_index = scoring_tables.answer_index
+
+
+def score_lead(form_data: LeadProfileInput) -> Tuple[Scores, float]:
+    """
+    Caminho rápido para um lead: (Scores do radar, score_final)
+    """
+    return scoring_tables.score_one(form_data)
+
+
+def score_batch(leads: Sequence[LeadProfileInput]) -> List[Tuple[Scores, float]]:
+    """
+    Pontua vários leads de uma vez (vetorizado)
+    """
+    columns = {field: [getattr(lead, field) for lead in leads] for field in QUESTION_FIELDS.values()}
+    dimensions, final = scoring_tables.score_codes(scoring_tables.encode_columns(columns))
+    return [
+        (Scores(**dict(zip(DIMENSIONS, row))), score)
+        for row, score in zip(dimensions.tolist(), final.tolist())
+    ]
+
+
+async def rescore_lead_profiles(chunk_size: int):
+    """
+    Recalcula ai_score_final e ai_scores_json de toda a tabela lead_profiles
+    """
+    from database import db_manager
+    import queries
+
+    if not await db_manager.initialize():
+        raise SystemExit("❌ Banco de dados indisponível")
+
+    raw_columns = [f"raw_{field}" for field in QUESTION_FIELDS.values()]
+    start = time.perf_counter()
+    total = 0
+    try:
+        async with db_manager.pool.acquire() as conn:
+            async with conn.transaction():
+                cursor = conn.cursor(f"SELECT id, {', '.join(raw_columns)} FROM lead_profiles")
+                while True:
+                    rows = await cursor.fetch(chunk_size)
+                    if not rows:
+                        break
+                    columns = {field: [row[f"raw_{field}"] for row in rows] for field in QUESTION_FIELDS.values()}
+                    dimensions, final = scoring_tables.score_codes(scoring_tables.encode_columns(columns))
+                    await queries.executemany(
+                        conn, queries.UPDATE_LEAD_SCORES,
+                        [
+                            (row["id"], score, dict(zip(DIMENSIONS, values)))
+                            for row, values, score in zip(rows, dimensions.tolist(), final.tolist())
+                        ]
+                    )
+                    total += len(rows)
+                    logger.info(f"📊 {total} leads recalculados")
+    finally:
+        await db_manager.close()
+
+    elapsed = time.perf_counter() - start
+    logger.info(f"✅ {total} leads recalculados em {elapsed:.1f}s ({total / elapsed if elapsed else 0:.0f} leads/s)")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rescore", action="store_true", required=True, help="recalcula os scores de lead_profiles")
+    parser.add_argument("--chunk-size", type=int, default=1000, help="linhas lidas e gravadas por lote")
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    asyncio.run(rescore_lead_profiles(args.chunk_size))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+#!/usr/bin/env python3
+"""
+Catálogo de soluções e cases usado pelo OpportunityTracker
+
+O catálogo fica em solution_catalog.json, fora do prompt. O arquivo também
+guarda um índice das entradas por dor (ideal_para_dores) e por indústria.
+As dores e indústrias são resolvidas para as respostas canônicas de
+p4_main_pain e p1_sector com o mesmo AnswerIndex do scoring. A cada chamada,
+o system prompt dinâmico recebe só as top-k soluções e cases do perfil do
+lead, e não o catálogo inteiro.
+
+Uso (rodar sempre que o solution_catalog.json for editado):
+    python solution_catalog.py build    (recalcula o índice do arquivo)
+    python solution_catalog.py check    (falha se o índice estiver desatualizado)
+    python solution_catalog.py show --sector "Varejo/E-commerce" --pain "Perda de oportunidades de venda"
+"""
+
+import argparse
+import json
+import os
+import logging
+from functools import lru_cache
+from typing import Any, Dict, List, Optional, Tuple
+
+from scoring import answer_index
+
+logger = logging.getLogger(__name__)
+
+SOLUTION_CATALOG_PATH = os.environ.get(
+    "SOLUTION_CATALOG_PATH",
+    os.path.join(os.path.dirname(os.path.abspath(__file__)), "solution_catalog.json"),
+)
+TOP_SOLUTIONS = int(os.environ.get("OPPORTUNITY_TOP_SOLUTIONS", "3"))
+TOP_CASES = int(os.environ.get("OPPORTUNITY_TOP_CASES", "4"))
+
+# Peso de cada tipo de match no ranking dos cases
+PAIN_MATCH_WEIGHT = 2
+SECTOR_MATCH_WEIGHT = 1
+
+
+def canonical_answer(question: str, value: Optional[str]) -> Optional[str]:
+    """
+    Resposta do mapa da pergunta correspondente ao texto ("Custos operacionais
+    muito altos em Logística" -> "Custos operacionais muito altos"), ou None
+    """
+    code = answer_index.lookup(question, value)
+    return None if code is None else answer_index.answers[question][code]
+
+
+def build_index(solutions: List[Dict[str, Any]], cases: List[Dict[str, Any]]) -> Dict[str, Any]:
+    """
+    Posições das soluções e dos cases por dor e dos cases por indústria,
+    indexadas pela resposta canônica
+    """
+    index: Dict[str, Any] = {"dores": {}, "industrias": {}}
+    for kind, entries in (("solucoes", solutions), ("cases", cases)):
+        for position, entry in enumerate(entries):
+            pains = {canonical_answer("pain", pain) for pain in entry.get("ideal_para_dores", [])}
+            for pain in sorted(pains - {None}):
+                index["dores"].setdefault(pain, {"solucoes": [], "cases": []})[kind].append(position)
+    for position, case in enumerate(cases):
+        sector = canonical_answer("sector", case.get("industria"))
+        if sector is not None:
+            index["industrias"].setdefault(sector, []).append(position)
+    return index
+
+
+def unindexed_terms(solutions: List[Dict[str, Any]], cases: List[Dict[str, Any]]) -> List[str]:
+    """
+    Dores e indústrias do catálogo que não correspondem a nenhuma resposta do formulário
+    """
+    terms = [
+        pain for entry in solutions + cases for pain in entry.get("ideal_para_dores", [])
+        if canonical_answer("pain", pain) is None
+    ]
+    terms += [case["industria"] for case in cases if canonical_answer("sector", case.get("industria")) is None]
+    return sorted(set(terms))
+
+
+class SolutionCatalog:
+    """
+    Catálogo em memória e seleção das entradas relevantes para um lead.
+
+    A seleção depende só da dor e do setor canônicos, então a seção do prompt
+    de cada combinação é montada uma vez e fica em cache.
+    """
+
+    def __init__(
+        self,
+        solutions: Optional[List[Dict[str, Any]]] = None,
+        cases: Optional[List[Dict[str, Any]]] = None,
+        index: Optional[Dict[str, Any]] = None,
+        top_solutions: int = TOP_SOLUTIONS,
+        top_cases: int = TOP_CASES,
+    ):
+        self.solutions = solutions or []
+        self.cases = cases or []
+        self.index = index or build_index(self.solutions, self.cases)
+        self.top_solutions = top_solutions
+        self.top_cases = top_cases
+        self._prompt_section = lru_cache(maxsize=None)(self._build_prompt_section)
+
+    @classmethod
+    def load(cls, path: str = SOLUTION_CATALOG_PATH) -> "SolutionCatalog":
+        try:
+            with open(path, encoding="utf-8") as f:
+                artifact = json.load(f)
+        except Exception as e:
+            logger.error(f"❌ Erro ao ler catálogo de soluções: {e}")
+            return cls()
+
+        index = artifact.get("indice")
+        if index is None:
+            logger.warning(f"⚠️  {os.path.basename(path)} sem índice, montado em memória (rode solution_catalog.py build)")
+        return cls(artifact.get("solucoes", []), artifact.get("cases", []), index)
+
+    def select(self, sector: Optional[str], pain: Optional[str]) -> Tuple[List[Dict[str, Any]], List[Dict[str, Any]]]:
+        """
+        Top-k soluções e cases para o setor e a dor do lead.
+        Cases pontuam pela dor e pela indústria; as soluções, pela dor.
+        Vagas que sobram são completadas na ordem do catálogo, para o prompt
+        ter sempre opções para as oportunidades #2 e #3.
+        """
+        pain_entries = self.index["dores"].get(canonical_answer("pain", pain) or "", {})
+        sector_cases = self.index["industrias"].get(canonical_answer("sector", sector) or "", [])
+
+        solution_ranking = _ranked(
+            {position: 1 for position in pain_entries.get("solucoes", [])},
+            len(self.solutions), self.top_solutions,
+        )
+        case_scores: Dict[int, int] = {}
+        for position in pain_entries.get("cases", []):
+            case_scores[position] = case_scores.get(position, 0) + PAIN_MATCH_WEIGHT
+        for position in sector_cases:
+            case_scores[position] = case_scores.get(position, 0) + SECTOR_MATCH_WEIGHT
+        case_ranking = _ranked(case_scores, len(self.cases), self.top_cases)
+
+        return [self.solutions[i] for i in solution_ranking], [self.cases[i] for i in case_ranking]
+
+    def prompt_section(self, sector: Optional[str], pain: Optional[str]) -> str:
+        """
+        Seção do system prompt com as soluções e cases selecionados
+        """
+        return self._prompt_section(canonical_answer("sector", sector), canonical_answer("pain", pain))
+
+    def _build_prompt_section(self, sector: Optional[str], pain: Optional[str]) -> str:
+        solutions, cases = self.select(sector, pain)
+        section = "# BASE DE CONHECIMENTO (Seu Catálogo de Soluções)\n"
+        section += "Use este catálogo como sua principal fonte de inspiração e conhecimento para basear suas recomendações. Adapte a descrição para o contexto do cliente.\n"
+        section += "IMPORTANTE: VOCÊ DEVE COMUNICAR ESSAS SOLUÇÕES TÉCNICAS PARA UM GESTOR. PORTANTO, USE UMA LINGUAGEM CLARA, FOCADA EM BENEFÍCIOS E RESULTADOS, SEM JARGÕES TÉCNICOS DESNECESSÁRIOS.\n"
+        section += json.dumps(solutions, ensure_ascii=False, indent=2)
+        section += "\nCASES: " + json.dumps(cases, ensure_ascii=False, indent=2)
+        return section
+
+
+def _ranked(scores: Dict[int, int], total: int, top: int) -> List[int]:
+    # Maior pontuação primeiro; empates e vagas restantes na ordem do catálogo
+    ranking = sorted(scores, key=lambda position: (-scores[position], position))
+    ranking += [position for position in range(total) if position not in scores]
+    return ranking[:top]
+
+
+def read_artifact(path: str) -> Dict[str, Any]:
+    with open(path, encoding="utf-8") as f:
+        return json.load(f)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("command", choices=("build", "check", "show"))
+    parser.add_argument("--path", default=SOLUTION_CATALOG_PATH)
+    parser.add_argument("--sector", help="p1_sector do lead (show)")
+    parser.add_argument("--pain", help="p4_main_pain do lead (show)")
+    args = parser.parse_args()
+
+    artifact = read_artifact(args.path)
+    solutions, cases = artifact.get("solucoes", []), artifact.get("cases", [])
+    index = build_index(solutions, cases)
+
+    if args.command == "build":
+        artifact["indice"] = index
+        with open(args.path, "w", encoding="utf-8") as f:
+            json.dump(artifact, f, ensure_ascii=False, indent=2)
+            f.write("\n")
+        for term in unindexed_terms(solutions, cases):
+            logger.warning(f"⚠️  Sem resposta correspondente no formulário: {term}")
+        logger.info(f"✅ Índice gravado: {len(index['dores'])} dores, {len(index['industrias'])} indústrias")
+    elif args.command == "check":
+        if artifact.get("indice") != index:
+            raise SystemExit(f"❌ Índice de {os.path.basename(args.path)} desatualizado (rode solution_catalog.py build)")
+        logger.info("✅ Índice do catálogo de soluções atualizado")
+    else:
+        catalog = SolutionCatalog(solutions, cases, index)
+        section = catalog.prompt_section(args.sector, args.pain)
+        full = SolutionCatalog(solutions, cases, index, top_solutions=len(solutions), top_cases=len(cases))
+        print(section)
+        print(f"\n# {len(section)} caracteres (catálogo completo: {len(full.prompt_section(args.sector, args.pain))})")
+
+
+# Instância global
+solution_catalog = SolutionCatalog.load()
+
+
+if __name__ == "__main__":
+    logging.basicConfig(level=logging.INFO, format="%(message)s")
+    main()
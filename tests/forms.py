@@ -0,0 +1,63 @@
+"""
+Formulários de exemplo usados pelos testes
+"""
+
+from schemas import LeadProfileInput
+
+CONTACT = {
+    "name": "Maria Silva",
+    "email": "maria.silva@corporate.com",
+    "phone": "11999998888",
+    "critical_area": "Financeiro/Cobrança",
+}
+
+# Payload do request_post.py: respostas com o detalhe que o formulário acrescenta
+FORM_ANSWERS = {
+    "sector": "Serviços Profissionais (Consultoria, Advocacia, etc.)",
+    "company_size": "51-250 funcionários",
+    "role": "Gerente/Coordenador(a)",
+    "main_pain": "Processos manuais e repetitivos que consomem muito tempo da equipe",
+    "pain_quantification": "Nossa equipe gasta umas 30 horas por mês em tarefas de faturamento manual.",
+    "digital_maturity": "Usamos relatórios básicos e planilhas (Excel/Google Sheets)",
+    "investment_capacity": "Até R$ 30.000 (projeto piloto/teste)",
+    "urgency": "Alta - Gostaríamos de agir nos próximos 3 meses",
+}
+
+# A resposta de maior pontuação em cada pergunta
+TOP_ANSWERS = {
+    "sector": "Tecnologia/Software",
+    "company_size": "+500 funcionários",
+    "role": "Sócio(a)/CEO/Fundador(a)",
+    "main_pain": "Processos manuais e repetitivos",
+    "pain_quantification": "Sim, é um custo significativo (>R$ 10k/mês)",
+    "digital_maturity": "Já usamos alguns insights automatizados/IA",
+    "investment_capacity": "Acima de R$ 300.000",
+    "urgency": "Crítica! Para ontem",
+}
+
+BOTTOM_ANSWERS = {
+    "sector": "Outros",
+    "company_size": "1-10 funcionários",
+    "role": "Estagiário/Trainee",
+    "main_pain": "Não temos grandes gargalos no momento",
+    "pain_quantification": "Não consigo medir, mas o impacto é alto",
+    "digital_maturity": "Principalmente na intuição",
+    "investment_capacity": "Estamos em fase de estudo, sem orçamento",
+    "urgency": "Baixa - Apenas pesquisando",
+}
+
+# Nenhuma resposta reconhecida: todas valem UNKNOWN_ANSWER_VALUE
+UNKNOWN_ANSWERS = {
+    "sector": "Serviços de limpeza",
+    "company_size": "Muitos",
+    "role": "Voluntário",
+    "main_pain": "Custos",
+    "pain_quantification": None,
+    "digital_maturity": "",
+    "investment_capacity": "Depende",
+    "urgency": "Alta prioridade mas sem data",
+}
+
+
+def make_form(answers, **overrides) -> LeadProfileInput:
+    return LeadProfileInput(**{**CONTACT, **answers, **overrides})
@@ -0,0 +1,170 @@
+import asyncio
+
+import pytest
+
+import agent_resilience
+from agent_resilience import (
+    STATE_CLOSED, STATE_HALF_OPEN, STATE_OPEN, AgentGuard, CircuitBreaker, CircuitOpenError, LatencyWindow,
+)
+from metrics import STAGE_OPPORTUNITY_AGENT
+
+
+class Clock:
+    """
+    time.monotonic controlado pelo teste
+    """
+
+    def __init__(self):
+        self.now = 1000.0
+
+    def __call__(self):
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch):
+    clock = Clock()
+    monkeypatch.setattr(agent_resilience.time, "monotonic", clock)
+    return clock
+
+
+def make_breaker():
+    return CircuitBreaker("test", error_rate=0.5, min_calls=4, window_seconds=60, open_seconds=30)
+
+
+def test_latency_window_percentile():
+    window = LatencyWindow(size=100)
+    for seconds in range(1, 101):
+        window.add(float(seconds))
+    assert window.percentile(95) == 95.0
+    assert window.percentile(50) == 50.0
+    assert window.percentile(0) == 1.0
+    window.add(1000.0)
+    assert len(window) == 100
+
+
+def test_breaker_needs_min_calls(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.before_call()
+        breaker.record(False)
+    assert breaker.state == STATE_CLOSED
+
+
+def test_breaker_opens_and_rejects(clock):
+    breaker = make_breaker()
+    for success in (True, False, True, False):
+        breaker.before_call()
+        breaker.record(success)
+    assert breaker.state == STATE_OPEN
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    assert breaker.stats()["rejected"] == 1
+    assert breaker.stats()["times_opened"] == 1
+
+
+def test_breaker_window_forgets_old_failures(clock):
+    breaker = make_breaker()
+    for _ in range(3):
+        breaker.record(False)
+    clock.now += 61
+    breaker.record(False)
+    assert breaker.state == STATE_CLOSED
+
+
+def test_breaker_half_open_probe(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False)
+    clock.now += 30
+
+    breaker.before_call()
+    assert breaker.state == STATE_HALF_OPEN
+    # Só uma chamada de teste por vez
+    with pytest.raises(CircuitOpenError):
+        breaker.before_call()
+    breaker.record(False)
+    assert breaker.state == STATE_OPEN
+
+    clock.now += 30
+    breaker.before_call()
+    breaker.record(True)
+    assert breaker.state == STATE_CLOSED
+
+
+def test_breaker_release_frees_the_probe(clock):
+    breaker = make_breaker()
+    for _ in range(4):
+        breaker.record(False)
+    clock.now += 30
+    breaker.before_call()
+    breaker.release()
+    breaker.before_call()
+    assert breaker.state == STATE_HALF_OPEN
+
+
+def test_guard_returns_result_and_records_latency():
+    guard = AgentGuard("test", STAGE_OPPORTUNITY_AGENT)
+
+    async def call():
+        return "ok"
+
+    assert asyncio.run(guard.run(call, timeout=1)) == "ok"
+    assert len(guard.latencies) == 1
+    assert guard.breaker.stats()["window_calls"] == 1
+
+
+def test_guard_timeout_counts_as_failure():
+    guard = AgentGuard("test", STAGE_OPPORTUNITY_AGENT)
+    cancelled = []
+
+    async def slow():
+        try:
+            await asyncio.sleep(10)
+        except asyncio.CancelledError:
+            cancelled.append(True)
+            raise
+
+    with pytest.raises(asyncio.TimeoutError):
+        asyncio.run(guard.run(slow, timeout=0.05))
+    assert cancelled == [True]
+    assert guard.breaker.stats()["window_error_rate"] == 1.0
+    assert len(guard.latencies) == 0
+
+
+def test_guard_open_circuit_skips_the_call():
+    guard = AgentGuard("test", STAGE_OPPORTUNITY_AGENT)
+    guard.breaker = CircuitBreaker("test", min_calls=1, open_seconds=30)
+    calls = []
+
+    async def failing():
+        calls.append(True)
+        raise RuntimeError("LLM fora do ar")
+
+    with pytest.raises(RuntimeError):
+        asyncio.run(guard.run(failing))
+    with pytest.raises(CircuitOpenError):
+        asyncio.run(guard.run(failing))
+    assert len(calls) == 1
+
+
+def test_guard_hedge_wins_when_first_call_is_slow(monkeypatch):
+    monkeypatch.setattr(agent_resilience, "HEDGE_MIN_SAMPLES", 5)
+    guard = AgentGuard("test", STAGE_OPPORTUNITY_AGENT, hedge_enabled=True)
+    for _ in range(5):
+        guard.latencies.add(0.02)
+    delays = iter([10, 0])
+
+    async def call():
+        delay = next(delays)
+        await asyncio.sleep(delay)
+        return delay
+
+    assert asyncio.run(guard.run(call, timeout=1)) == 0
+    assert guard.hedges_launched == 1
+    assert guard.hedges_won == 1
+
+
+def test_guard_without_enough_samples_does_not_hedge():
+    guard = AgentGuard("test", STAGE_OPPORTUNITY_AGENT, hedge_enabled=True)
+    assert guard.hedge_delay() is None
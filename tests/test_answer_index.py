@@ -0,0 +1,74 @@
+import pytest
+
+from answer_index import AnswerIndex, fold, label
+from scoring import ALL_QUESTIONS_DATA, answer_index
+
+
+def test_fold():
+    assert fold("Usamos relatórios (Excel)") == "usamos relatorios excel"
+    assert fold("  CRÍTICA! Para ontem  ") == "critica para ontem"
+    assert fold(None) == ""
+    assert fold("") == ""
+
+
+def test_label():
+    assert label("Alta - Próximos 3 meses") == "alta"
+    assert label("Crítica! Para ontem") == "critica"
+    assert label("Alta prioridade mas sem data") is None
+    assert label("Entre R$ 30.000 e R$ 100.000") is None
+    assert label(None) is None
+
+
+@pytest.mark.parametrize("question", ALL_QUESTIONS_DATA)
+def test_every_known_answer_maps_to_itself(question):
+    for code, answer in enumerate(ALL_QUESTIONS_DATA[question]):
+        assert answer_index.lookup(question, answer) == code
+        assert answer_index.canonical(question, answer.upper()) == answer
+
+
+@pytest.mark.parametrize("question, value, expected", [
+    # Detalhe depois da resposta
+    ("sector", "Serviços Profissionais (Consultoria, Advocacia, etc.)", "Serviços Profissionais"),
+    ("maturity", "Usamos relatórios básicos e planilhas (Excel/Google Sheets)", "Usamos relatórios básicos e planilhas"),
+    ("investment", "Até R$ 30.000 (projeto piloto/teste)", "Até R$ 30.000"),
+    ("pain", "Custos operacionais muito altos em uma área específica", "Custos operacionais muito altos"),
+    # Acentos e caixa
+    ("sector", "saude/medicina", "Saúde/Medicina"),
+    # Rótulo com o mesmo separador
+    ("urgency", "Alta - Gostaríamos de agir nos próximos 3 meses", "Alta - Próximos 3 meses"),
+    ("urgency", "Crítica! Precisamos já", "Crítica! Para ontem"),
+])
+def test_lookup_matches(question, value, expected):
+    assert answer_index.canonical(question, value) == expected
+
+
+@pytest.mark.parametrize("question, value", [
+    # Só começa como uma resposta conhecida
+    ("sector", "Serviços de limpeza"),
+    ("urgency", "Alta prioridade mas sem data"),
+    ("pain", "Custos"),
+    ("pain", "Processos manuais"),
+    # Sem nenhuma relação
+    ("role", "Voluntário"),
+    ("size", ""),
+    ("size", None),
+])
+def test_lookup_rejects(question, value):
+    assert answer_index.lookup(question, value) is None
+    assert answer_index.answer_id(question, value) is None
+
+
+def test_longest_answer_wins():
+    index = AnswerIndex({"q": {"Sim": 1, "Sim, com certeza": 2}})
+    assert index.canonical("q", "Sim, com certeza absoluta") == "Sim, com certeza"
+    assert index.canonical("q", "Sim, talvez") == "Sim"
+
+
+def test_ambiguous_label_is_ignored():
+    index = AnswerIndex({"q": {"Alta - 3 meses": 1, "Alta - 6 meses": 2, "Baixa - sem prazo": 0}})
+    assert index.lookup("q", "Alta - quando der") is None
+    assert index.canonical("q", "Baixa - só pesquisando") == "Baixa - sem prazo"
+
+
+def test_answer_id():
+    assert answer_index.answer_id("maturity", "Usamos relatórios básicos e planilhas (Excel)") == "maturity:1"
@@ -0,0 +1,37 @@
+import asyncio
+
+import pytest
+
+from forms import FORM_ANSWERS, make_form
+from jobs import STATUS_COMPLETED, JobManager, JobsFull
+
+
+def test_submit_never_evicts_active_jobs():
+    lead_form = make_form(FORM_ANSWERS)
+
+    async def scenario():
+        manager = JobManager()
+        manager.max_in_memory = 2
+        manager.start()
+        release = asyncio.Event()
+
+        async def runner(job):
+            await release.wait()
+
+        first = await manager.submit(lead_form, runner)
+        second = await manager.submit(lead_form, runner)
+        with pytest.raises(JobsFull):
+            await manager.submit(lead_form, runner)
+        assert set(manager.jobs) == {first.id, second.id}
+
+        release.set()
+        await manager.stop()
+        assert first.status == second.status == STATUS_COMPLETED
+
+        # Com os dois terminados, o mais antigo sai para abrir lugar
+        third = await manager.submit(lead_form, runner)
+        assert list(manager.jobs) == [second.id, third.id]
+        await manager.stop()
+
+    asyncio.run(scenario())
+
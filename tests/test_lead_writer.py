@@ -0,0 +1,156 @@
+import asyncio
+import contextlib
+import json
+from uuid import uuid4
+
+import asyncpg
+import pytest
+
+import queries
+from lead_writer import LeadWriter, row_from_spool, spool_line
+
+
+def make_row(lead_id=None, email="maria.silva@corporate.com"):
+    return (
+        lead_id or uuid4(), email, "11999998888", "Maria Silva",
+        "Tecnologia/Software", "51-250 funcionários", "Gerente/Coordenador(a)",
+        "Processos manuais", "Financeiro/Cobrança", "30 horas por mês",
+        "Planilhas", "Até R$ 30.000", "Alta", "COMPLETED", 72.5,
+        queries.RawJSON(json.dumps({"score_final": 72.5, "scores_radar": {}})), None,
+    )
+
+
+class FakePool:
+    """
+    Pool fake: acquire() devolve uma conexão sem estado, com transaction()
+    """
+
+    class Connection:
+        def transaction(self):
+            return contextlib.nullcontext()
+
+    @contextlib.asynccontextmanager
+    async def acquire(self):
+        yield self.Connection()
+
+
+class FakeDatabase:
+    """
+    Simula o lead_profiles: o INSERT ignora ids repetidos (ON CONFLICT DO NOTHING)
+    e recusa os e-mails em bad_emails com um erro de dados
+    """
+
+    def __init__(self, bad_emails=()):
+        self.rows = {}
+        self.bad_emails = set(bad_emails)
+
+    async def execute(self, conn, name, *row):
+        if row[1] in self.bad_emails:
+            raise asyncpg.exceptions.StringDataRightTruncationError("valor longo demais")
+        self.rows.setdefault(row[0], row)
+
+    async def executemany(self, conn, name, rows):
+        rows = list(rows)
+        if any(row[1] in self.bad_emails for row in rows):
+            raise asyncpg.exceptions.StringDataRightTruncationError("valor longo demais")
+        for row in rows:
+            self.rows.setdefault(row[0], row)
+
+
+@pytest.fixture
+def database(monkeypatch):
+    db = FakeDatabase(bad_emails={"ruim@corporate.com"})
+    monkeypatch.setattr(queries, "execute", db.execute)
+    monkeypatch.setattr(queries, "executemany", db.executemany)
+    return db
+
+
+def test_spool_line_round_trip():
+    row = make_row()
+    assert row_from_spool(spool_line(row)) == row
+
+
+def test_replay_skips_committed_rows_and_rejects_bad_ones(database, tmp_path):
+    spool_path, rejected_path = tmp_path / "spool.jsonl", tmp_path / "rejected.jsonl"
+    committed, fresh, bad = make_row(), make_row(), make_row(email="ruim@corporate.com")
+    # Lote gravado no banco, mas a conexão caiu antes da confirmação: as linhas foram para o spool
+    database.rows[committed[0]] = committed
+    spool_path.write_text("".join(spool_line(row) for row in (committed, fresh, bad)), encoding="utf-8")
+
+    writer = LeadWriter(batch_size=10, spool_path=str(spool_path), rejected_path=str(rejected_path))
+    writer.pool = FakePool()
+    asyncio.run(writer._replay_spool())
+
+    assert set(database.rows) == {committed[0], fresh[0]}
+    assert writer.rows_replayed == 2
+    assert writer.rows_rejected == 1
+    assert writer.rows_spooled == 0
+    assert not spool_path.exists()
+    assert not (tmp_path / "spool.jsonl.replaying").exists()
+    assert [row_from_spool(line) for line in rejected_path.read_text(encoding="utf-8").splitlines()] == [bad]
+
+    # A linha recusada não volta a ser regravada
+    asyncio.run(writer._replay_spool())
+    assert writer.rows_replayed == 2
+    assert writer.rows_rejected == 1
+
+
+def test_connection_errors_go_back_to_the_spool(monkeypatch, tmp_path):
+    async def unavailable(conn, name, rows):
+        raise ConnectionRefusedError("banco fora do ar")
+
+    monkeypatch.setattr(queries, "executemany", unavailable)
+    spool_path, rejected_path = tmp_path / "spool.jsonl", tmp_path / "rejected.jsonl"
+    writer = LeadWriter(batch_size=10, spool_path=str(spool_path), rejected_path=str(rejected_path))
+    writer.pool = FakePool()
+    rows = [make_row(), make_row()]
+
+    assert asyncio.run(writer._flush(rows)) == 0
+    assert writer.rows_spooled == 2
+    assert not rejected_path.exists()
+    assert [row_from_spool(line) for line in spool_path.read_text(encoding="utf-8").splitlines()] == rows
+
+
+def test_replay_file_is_kept_until_rows_are_safe(monkeypatch, tmp_path):
+    async def unavailable(conn, name, rows):
+        raise ConnectionRefusedError("banco fora do ar")
+
+    def disk_full(rows):
+        raise OSError("disco cheio")
+
+    spool_path = tmp_path / "spool.jsonl"
+    rows = [make_row(), make_row()]
+    spool_path.write_text("".join(spool_line(row) for row in rows), encoding="utf-8")
+    writer = LeadWriter(batch_size=10, spool_path=str(spool_path), rejected_path=str(tmp_path / "rejected.jsonl"))
+    writer.pool = FakePool()
+    monkeypatch.setattr(queries, "executemany", unavailable)
+    monkeypatch.setattr(writer, "_append_spool", disk_full)
+
+    asyncio.run(writer._replay_spool())
+    replaying = tmp_path / "spool.jsonl.replaying"
+    assert [row_from_spool(line) for line in replaying.read_text(encoding="utf-8").splitlines()] == rows
+
+    # Com o banco de volta, o .replaying que sobrou é regravado e apagado
+    database = FakeDatabase()
+    monkeypatch.setattr(queries, "executemany", database.executemany)
+    asyncio.run(writer._replay_spool())
+    assert set(database.rows) == {row[0] for row in rows}
+    assert not replaying.exists()
+
+
+def test_only_one_process_replays_the_spool(database, tmp_path):
+    spool_path = tmp_path / "spool.jsonl"
+    spool_path.write_text(spool_line(make_row()), encoding="utf-8")
+    writer = LeadWriter(batch_size=10, spool_path=str(spool_path), rejected_path=str(tmp_path / "rejected.jsonl"))
+    writer.pool = FakePool()
+    other_process = LeadWriter(spool_path=str(spool_path))
+
+    # flock é por descrição de arquivo aberto: o lock de outro open() bloqueia como outro processo
+    with other_process._file_lock(".replay.lock", blocking=False) as locked:
+        assert locked
+        asyncio.run(writer._replay_spool())
+        assert database.rows == {}
+        assert spool_path.exists()
+
+    asyncio.run(writer._replay_spool())
+    assert len(database.rows) == 1
@@ -0,0 +1,60 @@
+from forms import FORM_ANSWERS, make_form
+from llm_cache import cache_key, prompt_inputs
+
+
+def key(form, agent="opportunityTracker", model="openai:gpt-4o", prompt_version=1):
+    return cache_key(agent, model, prompt_version, form)
+
+
+def test_prompt_inputs_use_canonical_ids():
+    inputs = prompt_inputs(make_form(FORM_ANSWERS))
+    assert inputs == {
+        "sector": "sector:2",
+        "company_size": "size:2",
+        "main_pain": "pain:0",
+        "critical_area": "financeiro cobranca",
+        "digital_maturity": "maturity:1",
+        "investment_capacity": "investment:1",
+    }
+
+
+def test_unknown_answer_falls_back_to_folded_text():
+    inputs = prompt_inputs(make_form(FORM_ANSWERS, sector="Serviços de Limpeza"))
+    assert inputs["sector"] == "servicos de limpeza"
+
+
+def test_equivalent_answers_share_the_key():
+    form = make_form(FORM_ANSWERS)
+    variant = make_form(
+        FORM_ANSWERS,
+        sector="SERVIÇOS PROFISSIONAIS",
+        main_pain="processos manuais e repetitivos",
+        critical_area="financeiro / cobrança",
+        digital_maturity="Usamos relatorios basicos e planilhas",
+    )
+    assert key(form) == key(variant)
+
+
+def test_fields_outside_the_prompt_do_not_change_the_key():
+    form = make_form(FORM_ANSWERS)
+    other_lead = make_form(
+        FORM_ANSWERS,
+        name="João Souza",
+        email="joao@example.com",
+        role="Sócio(a)/CEO/Fundador(a)",
+        urgency="Crítica! Para ontem",
+        pain_quantification=None,
+    )
+    assert key(form) == key(other_lead)
+
+
+def test_key_changes_with_prompt_inputs_and_agent():
+    form = make_form(FORM_ANSWERS)
+    base = key(form)
+    assert key(make_form(FORM_ANSWERS, sector="Varejo/E-commerce")) != base
+    assert key(make_form(FORM_ANSWERS, critical_area="Vendas")) != base
+    assert key(form, agent="researchAgent") != base
+    assert key(form, model="openai:gpt-4o-mini") != base
+    assert key(form, prompt_version=2) != base
+    # Textos não reconhecidos diferentes não colidem
+    assert key(make_form(FORM_ANSWERS, sector="Serviços de limpeza")) != key(make_form(FORM_ANSWERS, sector="Mineração"))
@@ -0,0 +1,39 @@
+import json
+
+from forms import FORM_ANSWERS, make_form
+from precomputed_catalog import PROMPT_FIELDS, count_jsonl_profiles, top_profiles
+
+
+def inputs(**overrides):
+    form = make_form(FORM_ANSWERS, **overrides)
+    return {field: getattr(form, field) for field in PROMPT_FIELDS}
+
+
+def test_top_profiles_merges_equivalent_answers():
+    counted = [
+        (inputs(), 3),
+        (inputs(sector="SERVIÇOS PROFISSIONAIS", main_pain="Processos manuais e repetitivos"), 2),
+        (inputs(sector="Varejo/E-commerce"), 4),
+    ]
+    profiles = top_profiles(counted, top=10)
+    assert [total for _, total in profiles] == [5, 4]
+    # O primeiro texto visto representa o perfil
+    assert profiles[0][0] == inputs()
+
+
+def test_top_profiles_cuts_after_merging():
+    counted = [(inputs(sector="Varejo/E-commerce"), 4)] + [(inputs(critical_area=area), 2) for area in ("Vendas", "vendas", "VENDAS")]
+    profiles = top_profiles(counted, top=1)
+    assert profiles == [(inputs(critical_area="Vendas"), 6)]
+
+
+def test_count_jsonl_profiles(tmp_path):
+    path = tmp_path / "leads.jsonl"
+    lines = [
+        {"name": "A", "email": "a@example.com", **FORM_ANSWERS},
+        {"name": "B", "email": "b@example.com", **FORM_ANSWERS, "sector": "serviços profissionais"},
+        {"name": "C", "email": "c@example.com", **FORM_ANSWERS, "sector": "Educação"},
+        {"name": "sem email"},
+    ]
+    path.write_text("\n".join(json.dumps(line, ensure_ascii=False) for line in lines) + "\n\n", encoding="utf-8")
+    assert [total for _, total in count_jsonl_profiles(str(path), top=10)] == [2, 1]
@@ -0,0 +1,129 @@
+import asyncio
+import datetime
+import gzip
+
+import pytest
+
+from render_report import renderizar_relatorio, report_renderer, template_from_sources
+from report_store import ReportStore, StoredReport, accepts_encoding, compress_html
+
+GERADO_EM = datetime.datetime(2026, 10, 16, 23, 59)
+
+REPORT_DATA = {
+    "empresa": {"nome": "Nexus Corp"},
+    "introduction": "Introdução de teste.",
+    "scores_radar": {
+        "poder_de_decisao": 8.8,
+        "cultura_e_talentos": 6.5,
+        "processos_e_automacao": 9.2,
+        "inovacao_de_produtos": 7.1,
+        "inteligencia_de_mercado": 5.5,
+    },
+    "score_final": 7.4,
+    "relatorio_oportunidades": [],
+    "relatorio_riscos": [],
+}
+
+
+@pytest.mark.parametrize("header, expected", [
+    ("gzip", True),
+    ("gzip, deflate, br", True),
+    ("GZIP;q=0.5", True),
+    ("deflate, gzip;q=0", False),
+    ("gzip; q=0.000", False),
+    ("*", True),
+    ("*;q=0", False),
+    ("*, gzip;q=0", False),
+    ("gzip;q=1, *;q=0", True),
+    ("x-gzip", False),
+    ("gzip;q=abc", False),
+    ("identity", False),
+    ("", False),
+    (None, False),
+])
+def test_accepts_encoding(header, expected):
+    assert accepts_encoding(header, "gzip") is expected
+
+
+def test_compress_html_is_deterministic():
+    first, second = compress_html("<html>olá</html>"), compress_html("<html>olá</html>")
+    assert first == second
+    assert gzip.decompress(first).decode("utf-8") == "<html>olá</html>"
+
+
+def test_each_coding_has_its_own_etag():
+    report = StoredReport("v1", REPORT_DATA, GERADO_EM)
+    assert report.etag == f'"{report.content_hash}"'
+    assert report.gzip_etag == f'"{report.content_hash}-gzip"'
+
+
+def test_content_hash_follows_data_version_and_date():
+    report = StoredReport("v1", REPORT_DATA, GERADO_EM)
+    # Ordem das chaves não importa (o JSONB não a preserva)
+    assert StoredReport("v1", dict(reversed(REPORT_DATA.items())), GERADO_EM).content_hash == report.content_hash
+    assert StoredReport("v2", REPORT_DATA, GERADO_EM).content_hash != report.content_hash
+    assert StoredReport("v1", REPORT_DATA, GERADO_EM + datetime.timedelta(minutes=1)).content_hash != report.content_hash
+    assert StoredReport("v1", {**REPORT_DATA, "score_final": 7.5}, GERADO_EM).content_hash != report.content_hash
+
+
+def test_template_from_sources_renders_the_same_html():
+    template = template_from_sources(report_renderer.template_sources())
+    assert renderizar_relatorio(REPORT_DATA, gerado_em=GERADO_EM, template=template) == renderizar_relatorio(
+        REPORT_DATA, gerado_em=GERADO_EM
+    )
+
+
+class SlowStore(ReportStore):
+    """
+    ReportStore com save() fake, para medir concorrência e drenagem
+    """
+
+    def __init__(self, delay: float):
+        super().__init__()
+        self.pool = object()
+        self.delay = delay
+        self.running = 0
+        self.max_running = 0
+        self.saved = []
+
+    async def save(self, lead_id, report):
+        self.running += 1
+        self.max_running = max(self.max_running, self.running)
+        try:
+            await asyncio.sleep(self.delay)
+            self.saved.append(lead_id)
+        finally:
+            self.running -= 1
+
+
+def test_submit_is_bounded_and_drained():
+    async def scenario():
+        store = SlowStore(delay=0.01)
+        store.max_concurrency, store.max_pending = 2, 5
+        store._semaphore = asyncio.Semaphore(store.max_concurrency)
+        for lead_id in range(8):
+            store.submit(lead_id, REPORT_DATA, GERADO_EM)
+        assert store.stats()["pending"] == 5
+        await store.stop()
+        store.submit(99, REPORT_DATA, GERADO_EM)
+        return store
+
+    store = asyncio.run(scenario())
+    assert store.saved == [0, 1, 2, 3, 4]
+    assert store.max_running == 2
+    assert store.reports_dropped == 3
+    assert not store._pending
+
+
+def test_stop_cancels_after_drain_timeout():
+    async def scenario():
+        store = SlowStore(delay=10)
+        store.drain_timeout_seconds = 0.05
+        store._semaphore = asyncio.Semaphore(store.max_concurrency)
+        store.submit(1, REPORT_DATA, GERADO_EM)
+        await store.stop()
+        return store
+
+    store = asyncio.run(scenario())
+    assert store.saved == []
+    assert not store._pending
@@ -0,0 +1,86 @@
+import random
+
+import pytest
+
+from forms import BOTTOM_ANSWERS, FORM_ANSWERS, TOP_ANSWERS, UNKNOWN_ANSWERS, make_form
+from scoring import (
+    ALL_QUESTIONS_DATA, DIMENSION_WEIGHTS, FINAL_SCORE_WEIGHTS, QUESTION_FIELDS, UNKNOWN_ANSWER_VALUE,
+    round_score, score_batch, score_lead,
+)
+from schemas import LeadProfileInput
+
+# Campo de LeadProfileInput -> alias do formulário
+ALIASES = {name: field.alias for name, field in LeadProfileInput.model_fields.items()}
+
+
+@pytest.mark.parametrize("answers, expected_scores, expected_final", [
+    (
+        FORM_ANSWERS,
+        {"poder_de_decisao": 5.3, "cultura_e_talentos": 4.4, "processos_e_automacao": 8.0,
+         "inovacao_de_produtos": 4.3, "inteligencia_de_mercado": 6.3},
+        5.9,
+    ),
+    (TOP_ANSWERS, dict.fromkeys(DIMENSION_WEIGHTS, 10.0), 10.0),
+    (
+        BOTTOM_ANSWERS,
+        {"poder_de_decisao": 1.7, "cultura_e_talentos": 0.9, "processos_e_automacao": 2.5,
+         "inovacao_de_produtos": 2.5, "inteligencia_de_mercado": 0.8},
+        1.7,
+    ),
+    (UNKNOWN_ANSWERS, dict.fromkeys(DIMENSION_WEIGHTS, UNKNOWN_ANSWER_VALUE * 10), UNKNOWN_ANSWER_VALUE * 10),
+], ids=["form", "top", "bottom", "unknown"])
+def test_score_lead_known_answers(answers, expected_scores, expected_final):
+    scores, final = score_lead(make_form(answers))
+    assert scores.model_dump() == expected_scores
+    assert final == expected_final
+
+
+def test_critical_area_does_not_change_scores():
+    # Fora de QUESTION_FIELDS de propósito (ver o comentário em scoring.py)
+    forms = [make_form(FORM_ANSWERS, critical_area=area) for area in ("Vendas", "Operações", "Financeiro/Cobrança", None)]
+    results = [score_lead(form) for form in forms]
+    assert all(result == results[0] for result in results)
+    assert score_batch(forms) == results
+
+
+def test_weights_sum_to_one():
+    for dimension, weights in DIMENSION_WEIGHTS.items():
+        assert sum(weights.values()) == pytest.approx(1), dimension
+    assert sum(FINAL_SCORE_WEIGHTS.values()) == pytest.approx(1)
+
+
+def test_round_score_half_up():
+    assert round_score(4.25) == 4.3
+    assert round_score(4.249999) == 4.2
+    # round() arredonda para o par (0.2)
+    assert round_score(0.25) == 0.3
+
+
+def random_answers(rng: random.Random):
+    answers = {}
+    for question, field in QUESTION_FIELDS.items():
+        options = list(ALL_QUESTIONS_DATA[question])
+        choice = rng.choice(options + ["Resposta fora do mapa", ""])
+        # Às vezes com o detalhe que o formulário acrescenta depois da resposta
+        if choice and rng.random() < 0.3:
+            choice += " (detalhe do formulário)"
+        answers[ALIASES[field]] = choice
+    return answers
+
+
+def test_score_batch_matches_score_lead():
+    rng = random.Random(0)
+    forms = [make_form(answers) for answers in (FORM_ANSWERS, TOP_ANSWERS, BOTTOM_ANSWERS, UNKNOWN_ANSWERS)]
+    forms += [make_form(random_answers(rng)) for _ in range(500)]
+
+    batch = score_batch(forms)
+
+    assert len(batch) == len(forms)
+    for form, (scores, final) in zip(forms, batch):
+        expected_scores, expected_final = score_lead(form)
+        assert scores == expected_scores
+        assert final == expected_final
+
+
+def test_score_batch_empty():
+    assert score_batch([]) == []
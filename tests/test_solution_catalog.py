@@ -0,0 +1,63 @@
+from solution_catalog import SOLUTION_CATALOG_PATH, SolutionCatalog, build_index, canonical_answer, read_artifact
+
+SOLUTIONS = [
+    {"nome": "S0", "ideal_para_dores": ["Processos manuais e repetitivos"]},
+    {"nome": "S1", "ideal_para_dores": ["Custos operacionais muito altos em Logística/Entrega"]},
+    {"nome": "S2", "ideal_para_dores": ["Perda de oportunidades de venda", "Custos operacionais muito altos"]},
+    {"nome": "S3", "ideal_para_dores": ["Algo fora do formulário"]},
+]
+CASES = [
+    {"nome": "C0", "industria": "Varejo/E-commerce", "ideal_para_dores": ["Perda de oportunidades de venda"]},
+    {"nome": "C1", "industria": "Saúde/Medicina", "ideal_para_dores": ["Custos operacionais muito altos"]},
+    {"nome": "C2", "industria": "Varejo/E-commerce", "ideal_para_dores": ["Custos operacionais muito altos em uma área específica"]},
+    {"nome": "C3", "industria": "Mineração", "ideal_para_dores": []},
+    {"nome": "C4", "industria": "Educação", "ideal_para_dores": ["Processos manuais e repetitivos"]},
+]
+
+
+def names(entries):
+    return [entry["nome"] for entry in entries]
+
+
+def test_canonical_answer():
+    assert canonical_answer("pain", "Custos operacionais muito altos em Logística") == "Custos operacionais muito altos"
+    assert canonical_answer("sector", "Serviços Profissionais (Consultoria)") == "Serviços Profissionais"
+    assert canonical_answer("pain", "Custos") is None
+    assert canonical_answer("sector", None) is None
+
+
+def test_build_index():
+    index = build_index(SOLUTIONS, CASES)
+    assert index["dores"] == {
+        "Processos manuais e repetitivos": {"solucoes": [0], "cases": [4]},
+        "Custos operacionais muito altos": {"solucoes": [1, 2], "cases": [1, 2]},
+        "Perda de oportunidades de venda": {"solucoes": [2], "cases": [0]},
+    }
+    assert index["industrias"] == {"Varejo/E-commerce": [0, 2], "Saúde/Medicina": [1], "Educação": [4]}
+
+
+def test_select_ranks_pain_over_sector():
+    catalog = SolutionCatalog(SOLUTIONS, CASES, top_solutions=3, top_cases=3)
+    solutions, cases = catalog.select("Varejo/E-commerce", "Custos operacionais muito altos em Logística")
+    assert names(solutions) == ["S1", "S2", "S0"]
+    # C2: dor + setor; C1: só dor; C0: só setor
+    assert names(cases) == ["C2", "C1", "C0"]
+
+
+def test_select_fills_with_catalog_order():
+    catalog = SolutionCatalog(SOLUTIONS, CASES, top_solutions=2, top_cases=2)
+    solutions, cases = catalog.select("Mineração", "Algo fora do formulário")
+    assert names(solutions) == ["S0", "S1"]
+    assert names(cases) == ["C0", "C1"]
+
+
+def test_prompt_section_is_cached_by_canonical_answers():
+    catalog = SolutionCatalog(SOLUTIONS, CASES, top_solutions=1, top_cases=1)
+    section = catalog.prompt_section("Varejo/E-commerce", "Perda de oportunidades de venda")
+    assert '"S2"' in section and '"C0"' in section
+    assert catalog.prompt_section("VAREJO/E-COMMERCE", "Perda de oportunidades de venda (leads frios)") is section
+
+
+def test_checked_in_index_is_up_to_date():
+    artifact = read_artifact(SOLUTION_CATALOG_PATH)
+    assert artifact["indice"] == build_index(artifact["solucoes"], artifact["cases"])
@@ -0,0 +1,60 @@
+import hmac
+import json
+import logging
+import os
+from contextlib import contextmanager
+from contextvars import ContextVar
+from typing import Optional
+
+logger = logging.getLogger("trace")
+
+# DEBUG_TRACE=1 liga o trace para todas as requisições; caso contrário ele é
+# ligado por requisição com o header X-Debug-Trace igual a DEBUG_TRACE_TOKEN
+# (sem DEBUG_TRACE_TOKEN o header é ignorado). O trace inclui dados do lead:
+# os eventos saem em nível DEBUG no logger "trace"
+TRACE_ALL_REQUESTS = os.environ.get("DEBUG_TRACE", "0") == "1"
+TRACE_TOKEN = os.environ.get("DEBUG_TRACE_TOKEN")
+TRACE_HEADER = "x-debug-trace"
+
+if (TRACE_ALL_REQUESTS or TRACE_TOKEN) and logger.level == logging.NOTSET:
+    logger.setLevel(logging.DEBUG)
+
+_trace_enabled: ContextVar[bool] = ContextVar("debug_trace", default=False)
+
+
+def is_tracing() -> bool:
+    """
+    Indica se o trace de diagnóstico está ligado para a requisição atual.
+    Use antes de montar qualquer dado caro que só serve para o trace.
+    """
+    return TRACE_ALL_REQUESTS or _trace_enabled.get()
+
+
+def trace_requested(header_value: Optional[str]) -> bool:
+    """
+    Indica se o header X-Debug-Trace da requisição traz o token de DEBUG_TRACE_TOKEN
+    """
+    if not TRACE_TOKEN or not header_value:
+        return False
+    return hmac.compare_digest(header_value.encode(), TRACE_TOKEN.encode())
+
+
+@contextmanager
+def tracing(enabled: bool):
+    """
+    Liga ou desliga o trace para o contexto atual (uma requisição)
+    """
+    token = _trace_enabled.set(enabled)
+    try:
+        yield
+    finally:
+        _trace_enabled.reset(token)
+
+
+def trace(event: str, **fields):
+    """
+    Emite um evento estruturado (uma linha JSON) se o trace estiver ligado
+    """
+    if not is_tracing():
+        return
+    logger.debug(json.dumps({"event": event, **fields}, ensure_ascii=False, default=str))
@@ -0,0 +1,303 @@
+import asyncio
+import json
+import os
+import sqlite3
+import threading
+import time
+import logging
+from datetime import datetime, timezone
+from typing import Any, Dict, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# (id, payload, attempts)
+OutboxItem = Tuple[int, Dict[str, Any], int]
+
+DEFAULT_SQLITE_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "webhook_outbox.db")
+
+
+class PostgresOutboxStore:
+    """
+    Outbox de webhooks no Postgres, usando o pool do db_manager.
+
+    Os itens são reservados com FOR UPDATE SKIP LOCKED e um lease em
+    next_attempt_at, então vários workers do gunicorn podem drenar a mesma
+    tabela sem entregar o mesmo item duas vezes. Um item reservado por um
+    processo que morreu volta a ficar disponível quando o lease expira.
+    O payload JSONB é (de)serializado pelo codec registrado no pool
+    (queries.init_connection).
+    """
+
+    name = "postgres"
+
+    def __init__(self, pool):
+        self.pool = pool
+
+    async def setup(self):
+        async with self.pool.acquire() as conn:
+            await conn.execute("""
+                CREATE TABLE IF NOT EXISTS webhook_outbox (
+                    id BIGSERIAL PRIMARY KEY,
+                    payload JSONB NOT NULL,
+                    attempts INTEGER NOT NULL DEFAULT 0,
+                    next_attempt_at TIMESTAMPTZ NOT NULL DEFAULT now(),
+                    last_error TEXT,
+                    created_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                );
+                CREATE INDEX IF NOT EXISTS webhook_outbox_next_attempt_idx
+                    ON webhook_outbox (next_attempt_at);
+                CREATE TABLE IF NOT EXISTS webhook_dead_letter (
+                    id BIGSERIAL PRIMARY KEY,
+                    outbox_id BIGINT,
+                    payload JSONB NOT NULL,
+                    attempts INTEGER NOT NULL,
+                    last_error TEXT,
+                    created_at TIMESTAMPTZ NOT NULL,
+                    failed_at TIMESTAMPTZ NOT NULL DEFAULT now()
+                );
+            """)
+
+    async def add(self, payload: Dict[str, Any]) -> int:
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval(
+                "INSERT INTO webhook_outbox (payload) VALUES ($1::jsonb) RETURNING id",
+                payload
+            )
+
+    async def claim_due(self, limit: int, lease_seconds: float) -> List[OutboxItem]:
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                UPDATE webhook_outbox
+                SET next_attempt_at = now() + make_interval(secs => $2)
+                WHERE id IN (
+                    SELECT id FROM webhook_outbox
+                    WHERE next_attempt_at <= now()
+                    ORDER BY id
+                    LIMIT $1
+                    FOR UPDATE SKIP LOCKED
+                )
+                RETURNING id, payload, attempts
+                """,
+                limit, float(lease_seconds)
+            )
+        return [(row['id'], row['payload'], row['attempts']) for row in rows]
+
+    async def mark_delivered(self, item_id: int):
+        async with self.pool.acquire() as conn:
+            await conn.execute("DELETE FROM webhook_outbox WHERE id = $1", item_id)
+
+    async def reschedule(
+        self, item_id: int, attempts: int, delay_seconds: float, error: str, payload: Optional[Dict[str, Any]] = None
+    ):
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                """
+                UPDATE webhook_outbox
+                SET attempts = $2, next_attempt_at = now() + make_interval(secs => $3), last_error = $4,
+                    payload = COALESCE($5::jsonb, payload)
+                WHERE id = $1
+                """,
+                item_id, attempts, float(delay_seconds), error, payload
+            )
+
+    async def dead_letter(self, item_id: int, attempts: int, error: str):
+        async with self.pool.acquire() as conn:
+            await conn.execute(
+                """
+                WITH moved AS (
+                    DELETE FROM webhook_outbox WHERE id = $1 RETURNING payload, created_at
+                )
+                INSERT INTO webhook_dead_letter (outbox_id, payload, attempts, last_error, created_at)
+                SELECT $1, payload, $2, $3, created_at FROM moved
+                """,
+                item_id, attempts, error
+            )
+
+    async def replay(self, dead_letter_id: int) -> Optional[int]:
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval(
+                """
+                WITH moved AS (
+                    DELETE FROM webhook_dead_letter WHERE id = $1 RETURNING payload
+                )
+                INSERT INTO webhook_outbox (payload) SELECT payload FROM moved
+                RETURNING id
+                """,
+                dead_letter_id
+            )
+
+    async def list_dead_letters(self, limit: int) -> List[Dict[str, Any]]:
+        async with self.pool.acquire() as conn:
+            rows = await conn.fetch(
+                """
+                SELECT id, outbox_id, attempts, last_error, created_at, failed_at
+                FROM webhook_dead_letter
+                ORDER BY id DESC
+                LIMIT $1
+                """,
+                limit
+            )
+        return [
+            {**dict(row), "created_at": row['created_at'].isoformat(), "failed_at": row['failed_at'].isoformat()}
+            for row in rows
+        ]
+
+    async def pending_count(self) -> int:
+        async with self.pool.acquire() as conn:
+            return await conn.fetchval("SELECT count(*) FROM webhook_outbox")
+
+    async def close(self):
+        # O pool pertence ao db_manager
+        pass
+
+
+class SQLiteOutboxStore:
+    """
+    Outbox de webhooks em um arquivo SQLite local, usado quando o banco de
+    dados não está disponível. As chamadas bloqueantes rodam em threads.
+    """
+
+    name = "sqlite"
+
+    def __init__(self, path: str = DEFAULT_SQLITE_PATH):
+        self.path = path
+        self.conn: Optional[sqlite3.Connection] = None
+        self.lock = threading.Lock()
+
+    async def _run(self, fn, *args):
+        def locked():
+            with self.lock:
+                with self.conn:
+                    return fn(*args)
+        return await asyncio.to_thread(locked)
+
+    async def setup(self):
+        self.conn = sqlite3.connect(self.path, check_same_thread=False)
+        self.conn.row_factory = sqlite3.Row
+        await self._run(self.conn.executescript, """
+            PRAGMA journal_mode=WAL;
+            CREATE TABLE IF NOT EXISTS webhook_outbox (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                next_attempt_at REAL NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS webhook_outbox_next_attempt_idx
+                ON webhook_outbox (next_attempt_at);
+            CREATE TABLE IF NOT EXISTS webhook_dead_letter (
+                id INTEGER PRIMARY KEY AUTOINCREMENT,
+                outbox_id INTEGER,
+                payload TEXT NOT NULL,
+                attempts INTEGER NOT NULL,
+                last_error TEXT,
+                created_at REAL NOT NULL,
+                failed_at REAL NOT NULL
+            );
+        """)
+
+    async def add(self, payload: Dict[str, Any]) -> int:
+        def insert():
+            now = time.time()
+            cursor = self.conn.execute(
+                "INSERT INTO webhook_outbox (payload, next_attempt_at, created_at) VALUES (?, ?, ?)",
+                (json.dumps(payload, ensure_ascii=False), now, now)
+            )
+            return cursor.lastrowid
+        return await self._run(insert)
+
+    async def claim_due(self, limit: int, lease_seconds: float) -> List[OutboxItem]:
+        def claim():
+            # Seleção e lease em um único UPDATE (atômico): vários processos
+            # compartilhando o arquivo nunca pegam a mesma entrega
+            now = time.time()
+            rows = self.conn.execute(
+                """
+                UPDATE webhook_outbox SET next_attempt_at = ?
+                WHERE id IN (
+                    SELECT id FROM webhook_outbox WHERE next_attempt_at <= ? ORDER BY id LIMIT ?
+                )
+                RETURNING id, payload, attempts
+                """,
+                (now + lease_seconds, now, limit)
+            ).fetchall()
+            rows.sort(key=lambda row: row['id'])
+            return [(row['id'], json.loads(row['payload']), row['attempts']) for row in rows]
+        return await self._run(claim)
+
+    async def mark_delivered(self, item_id: int):
+        await self._run(self.conn.execute, "DELETE FROM webhook_outbox WHERE id = ?", (item_id,))
+
+    async def reschedule(
+        self, item_id: int, attempts: int, delay_seconds: float, error: str, payload: Optional[Dict[str, Any]] = None
+    ):
+        await self._run(
+            self.conn.execute,
+            "UPDATE webhook_outbox SET attempts = ?, next_attempt_at = ?, last_error = ?, payload = COALESCE(?, payload) WHERE id = ?",
+            (attempts, time.time() + delay_seconds, error,
+             json.dumps(payload, ensure_ascii=False) if payload is not None else None, item_id)
+        )
+
+    async def dead_letter(self, item_id: int, attempts: int, error: str):
+        def move():
+            row = self.conn.execute(
+                "SELECT payload, created_at FROM webhook_outbox WHERE id = ?", (item_id,)
+            ).fetchone()
+            if row is None:
+                return
+            self.conn.execute(
+                "INSERT INTO webhook_dead_letter (outbox_id, payload, attempts, last_error, created_at, failed_at) VALUES (?, ?, ?, ?, ?, ?)",
+                (item_id, row['payload'], attempts, error, row['created_at'], time.time())
+            )
+            self.conn.execute("DELETE FROM webhook_outbox WHERE id = ?", (item_id,))
+        await self._run(move)
+
+    async def replay(self, dead_letter_id: int) -> Optional[int]:
+        def move():
+            row = self.conn.execute(
+                "SELECT payload FROM webhook_dead_letter WHERE id = ?", (dead_letter_id,)
+            ).fetchone()
+            if row is None:
+                return None
+            now = time.time()
+            cursor = self.conn.execute(
+                "INSERT INTO webhook_outbox (payload, next_attempt_at, created_at) VALUES (?, ?, ?)",
+                (row['payload'], now, now)
+            )
+            self.conn.execute("DELETE FROM webhook_dead_letter WHERE id = ?", (dead_letter_id,))
+            return cursor.lastrowid
+        return await self._run(move)
+
+    async def list_dead_letters(self, limit: int) -> List[Dict[str, Any]]:
+        def select():
+            rows = self.conn.execute(
+                """
+                SELECT id, outbox_id, attempts, last_error, created_at, failed_at
+                FROM webhook_dead_letter
+                ORDER BY id DESC
+                LIMIT ?
+                """,
+                (limit,)
+            ).fetchall()
+            return [dict(row) for row in rows]
+        items = await self._run(select)
+        for item in items:
+            item['created_at'] = datetime_from_epoch(item['created_at'])
+            item['failed_at'] = datetime_from_epoch(item['failed_at'])
+        return items
+
+    async def pending_count(self) -> int:
+        def count():
+            return self.conn.execute("SELECT count(*) FROM webhook_outbox").fetchone()[0]
+        return await self._run(count)
+
+    async def close(self):
+        if self.conn:
+            self.conn.close()
+            self.conn = None
+
+
+def datetime_from_epoch(value: float) -> str:
+    return datetime.fromtimestamp(value, tz=timezone.utc).isoformat()
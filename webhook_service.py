@@ -1,55 +1,423 @@
-import requests
-import json
-import os
+import asyncio
 import base64
+import multiprocessing
+import os
+import random
+import signal
 import tempfile
+from concurrent.futures import ProcessPoolExecutor
 from datetime import datetime
+from typing import Any, Dict, List, Optional
 
+import httpx
 import logging
 
+from report_assets import offline_url_fetcher
+from metrics import STAGE_WEBHOOK_DELIVERY, stage_timer
+from webhook_outbox import PostgresOutboxStore, SQLiteOutboxStore, DEFAULT_SQLITE_PATH
+
 logger = logging.getLogger(__name__)
 
-async def convert_html_to_pdf_and_send_webhook(form_data: dict, html_content: str):
+# Folga do lease do outbox sobre o pior caso de uma entrega (PDF + POST)
+LEASE_MARGIN_SECONDS = 30
+
+DEFAULT_WEBHOOK_URL = "https://flows.profissionalai.com.br/webhook-test/6e2f0fa5-6cc5-4415-943c-7d7b9a6a7719"
+
+
+def build_webhook_payload(form_data: dict, html_content: str) -> Dict[str, Any]:
     """
-    Envia dados completos (form_data + HTML) para o webhook
+    Monta o JSON completo com form_data e HTML
     """
-    webhook_url = "https://flows.profissionalai.com.br/webhook-test/6e2f0fa5-6cc5-4415-943c-7d7b9a6a7719"
-    
-    try:
-        logger.info("📤 Preparando dados para envio ao webhook...")
-        
-        # Prepara os dados completos para envio
-        timestamp = datetime.now().strftime("%Y%m%d_%H%M%S")
-        
-        # Monta o JSON completo com form_data e HTML
-        payload = {
-            "form_data": form_data,
-            "html_content": html_content,
-            "metadata": {
-                "generated_at": datetime.now().isoformat(),
-                "timestamp": timestamp,
-                "client_name": form_data.get("name", "Unknown"),
-                "client_email": form_data.get("email", "Unknown")
-            }
-        }
-        
-        # Headers para JSON
-        json_headers = {
-            "Content-Type": "application/json"
+    now = datetime.now()
+    return {
+        "form_data": form_data,
+        "html_content": html_content,
+        "metadata": {
+            "generated_at": now.isoformat(),
+            "timestamp": now.strftime("%Y%m%d_%H%M%S"),
+            "client_name": form_data.get("name", "Unknown"),
+            "client_email": form_data.get("email", "Unknown")
         }
-        
-        logger.info("📤 Enviando dados completos (form_data + HTML) para o webhook...")
-        response = requests.post(webhook_url, data=json.dumps(payload), headers=json_headers)
-        
-        if response.status_code == 200:
-            logger.info("✅ Dados enviados com sucesso para o webhook!")
-            logger.info(f"Resposta: {response.text}")
-            return True
+    }
+
+
+def with_pdf_attachment(payload: Dict[str, Any], pdf_content: bytes) -> Dict[str, Any]:
+    """
+    Anexa o PDF ao payload no mesmo formato usado por request_post.py
+    """
+    return {
+        **payload,
+        "pdf_data": {
+            "filename": f"relatorio_diagnostico_{payload['metadata']['timestamp']}.pdf",
+            "content": base64.b64encode(pdf_content).decode("ascii"),
+            "content_type": "application/pdf",
+        },
+    }
+
+
+# --- Geração de PDF em processos separados ---
+
+# CSS adicional para melhorar a formatação do PDF
+PDF_CSS = """
+    @page {
+        size: A4;
+        margin: 0.75in;
+    }
+    body {
+        font-family: Arial, sans-serif;
+        line-height: 1.4;
+    }
+    .chart-container {
+        page-break-inside: avoid;
+    }
+    h1, h2, h3 {
+        page-break-after: avoid;
+    }
+"""
+
+# Estado de cada processo worker, montado uma vez no initializer
+_pdf_worker_state: Dict[str, Any] = {}
+
+
+class PdfTimeoutError(Exception):
+    """A conversão excedeu PDF_TIMEOUT_SECONDS"""
+
+
+def _pdf_timeout_handler(signum, frame):
+    raise PdfTimeoutError()
+
+
+def _init_pdf_worker():
+    """
+    Initializer do processo: importa o WeasyPrint e faz o parse das fontes e
+    do CSS uma única vez, reaproveitados em todas as conversões do worker
+    """
+    from weasyprint import CSS
+    from weasyprint.text.fonts import FontConfiguration
+
+    font_config = FontConfiguration()
+    _pdf_worker_state["font_config"] = font_config
+    _pdf_worker_state["stylesheets"] = [CSS(string=PDF_CSS, font_config=font_config)]
+    signal.signal(signal.SIGALRM, _pdf_timeout_handler)
+
+
+def _render_pdf_file(html_path: str, pdf_path: str, timeout_seconds: int) -> int:
+    """
+    Converte o HTML de html_path em PDF em pdf_path (executa no worker).
+    O timeout é aplicado dentro do processo, que continua vivo para o próximo job.
+    Recursos remotos são recusados: o relatório já vem com CSS e radar embutidos.
+    """
+    from weasyprint import HTML
+
+    signal.alarm(timeout_seconds)
+    try:
+        HTML(filename=html_path, url_fetcher=offline_url_fetcher).write_pdf(
+            pdf_path,
+            stylesheets=_pdf_worker_state["stylesheets"],
+            font_config=_pdf_worker_state["font_config"],
+        )
+    finally:
+        signal.alarm(0)
+    return os.path.getsize(pdf_path)
+
+
+class PdfRenderer:
+    """
+    Conversão HTML -> PDF (WeasyPrint) em um pool de processos, fora do event loop.
+
+    HTML e PDF trafegam por arquivos temporários, não por strings grandes
+    serializadas entre processos. PDF_MAX_CONCURRENCY limita as conversões
+    simultâneas e PDF_TIMEOUT_SECONDS limita cada uma (FR-04: < 20s).
+    Desligado por padrão (PDF_ENABLED=1 para anexar o PDF aos webhooks).
+    """
+
+    def __init__(self):
+        self.enabled = os.environ.get("PDF_ENABLED", "0") == "1"
+        self.num_workers = int(os.environ.get("PDF_WORKERS", "2"))
+        self.max_concurrency = int(os.environ.get("PDF_MAX_CONCURRENCY", str(self.num_workers)))
+        self.timeout_seconds = int(os.environ.get("PDF_TIMEOUT_SECONDS", "20"))
+        self.tmp_dir = os.environ.get("PDF_TMP_DIR") or None
+
+        self.executor: Optional[ProcessPoolExecutor] = None
+        self._semaphore: Optional[asyncio.Semaphore] = None
+
+    def start(self):
+        if not self.enabled:
+            return
+        # spawn: fork a partir de um processo com threads (asyncio, to_thread) pode travar os filhos
+        self.executor = ProcessPoolExecutor(
+            max_workers=self.num_workers,
+            initializer=_init_pdf_worker,
+            mp_context=multiprocessing.get_context("spawn"),
+        )
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        logger.info(f"📄 Geração de PDF iniciada com {self.num_workers} processos")
+
+    def stop(self):
+        if self.executor:
+            self.executor.shutdown(wait=False, cancel_futures=True)
+            self.executor = None
+
+    def is_running(self) -> bool:
+        return self.executor is not None
+
+    async def render(self, html_content: str) -> bytes:
+        """
+        Converte o HTML em PDF e retorna os bytes do arquivo
+        """
+        loop = asyncio.get_running_loop()
+        async with self._semaphore:
+            html_fd, html_path = tempfile.mkstemp(suffix=".html", dir=self.tmp_dir)
+            pdf_fd, pdf_path = tempfile.mkstemp(suffix=".pdf", dir=self.tmp_dir)
+            os.close(pdf_fd)
+            try:
+                with os.fdopen(html_fd, "w", encoding="utf-8") as f:
+                    await asyncio.to_thread(f.write, html_content)
+                start = loop.time()
+                # Margem sobre o alarme do worker, caso o processo não responda
+                size = await asyncio.wait_for(
+                    loop.run_in_executor(self.executor, _render_pdf_file, html_path, pdf_path, self.timeout_seconds),
+                    self.timeout_seconds + 5,
+                )
+                logger.info(f"📄 PDF gerado em {loop.time() - start:.1f}s ({size / 1024:.0f} KB)")
+                with open(pdf_path, "rb") as f:
+                    return await asyncio.to_thread(f.read)
+            finally:
+                for path in (html_path, pdf_path):
+                    try:
+                        os.unlink(path)
+                    except OSError:
+                        pass
+
+
+# Instância global
+pdf_renderer = PdfRenderer()
+
+
+class WebhookDeliveryError(Exception):
+    """Falha ao entregar um payload ao webhook"""
+
+
+class WebhookDispatcher:
+    """
+    Entrega assíncrona e durável dos relatórios para o webhook.
+
+    Cada entrega é gravada primeiro em um outbox (Postgres via db_manager, ou
+    SQLite local sem banco) e depois drenada por um número fixo de workers
+    que compartilham um único httpx.AsyncClient. Falhas são reagendadas com
+    backoff exponencial e jitter; após WEBHOOK_MAX_ATTEMPTS tentativas o item
+    vai para a tabela de dead-letter, de onde pode ser reenviado.
+
+    Com o pdf_renderer ligado, o PDF é gerado pelo worker no momento do
+    envio (fora do caminho da requisição) e anexado ao payload.
+    """
+
+    def __init__(self):
+        self.webhook_url = os.environ.get("WEBHOOK_URL", DEFAULT_WEBHOOK_URL)
+        self.num_workers = int(os.environ.get("WEBHOOK_WORKERS", "2"))
+        self.timeout_seconds = float(os.environ.get("WEBHOOK_TIMEOUT_SECONDS", "10"))
+        self.max_connections = int(os.environ.get("WEBHOOK_MAX_CONNECTIONS", "10"))
+        self.max_attempts = int(os.environ.get("WEBHOOK_MAX_ATTEMPTS", "8"))
+        self.backoff_base_seconds = float(os.environ.get("WEBHOOK_BACKOFF_BASE_SECONDS", "2"))
+        self.backoff_max_seconds = float(os.environ.get("WEBHOOK_BACKOFF_MAX_SECONDS", "600"))
+        self.poll_interval_seconds = float(os.environ.get("WEBHOOK_POLL_INTERVAL_SECONDS", "5"))
+        self.drain_timeout_seconds = float(os.environ.get("WEBHOOK_DRAIN_TIMEOUT_SECONDS", "20"))
+
+        self.client: Optional[httpx.AsyncClient] = None
+        self.store = None
+        self.workers: List[asyncio.Task] = []
+        self._wakeup = asyncio.Event()
+        self._stopping = False
+
+    async def start(self, pool=None):
+        """
+        Prepara o outbox, cria o cliente HTTP compartilhado e inicia os workers.
+        Com pool usa o Postgres; sem pool usa o arquivo SQLite local.
+        """
+        if pool is not None:
+            self.store = PostgresOutboxStore(pool)
         else:
-            logger.error(f"❌ Erro ao enviar para webhook: {response.status_code}")
-            logger.error(f"Resposta: {response.text}")
-            return False
-        
-    except Exception as e:
-        logger.error(f"❌ Erro ao enviar dados para webhook: {str(e)}")
-        return False
+            self.store = SQLiteOutboxStore(os.environ.get("WEBHOOK_OUTBOX_SQLITE_PATH", DEFAULT_SQLITE_PATH))
+        await self.store.setup()
+
+        self.client = httpx.AsyncClient(
+            timeout=httpx.Timeout(self.timeout_seconds),
+            limits=httpx.Limits(max_connections=self.max_connections, max_keepalive_connections=self.max_connections),
+            headers={"Content-Type": "application/json"},
+        )
+        self._stopping = False
+        self._wakeup = asyncio.Event()
+        pdf_renderer.start()
+        self.workers = [
+            asyncio.create_task(self._worker(i), name=f"webhook-worker-{i}")
+            for i in range(self.num_workers)
+        ]
+        logger.info(f"📤 Webhook dispatcher iniciado com {self.num_workers} workers (outbox: {self.store.name})")
+
+    async def stop(self):
+        """
+        Drena o outbox (até WEBHOOK_DRAIN_TIMEOUT_SECONDS) e fecha o cliente HTTP.
+        O que não for entregue continua no outbox para a próxima inicialização.
+        """
+        self._stopping = True
+        self._wakeup.set()
+        if self.workers:
+            done, pending = await asyncio.wait(self.workers, timeout=self.drain_timeout_seconds)
+            for worker in pending:
+                worker.cancel()
+            await asyncio.gather(*self.workers, return_exceptions=True)
+            if pending:
+                logger.warning(f"⚠️  Drenagem do outbox interrompida após {self.drain_timeout_seconds}s")
+        self.workers = []
+        pdf_renderer.stop()
+
+        if self.client:
+            await self.client.aclose()
+            self.client = None
+        if self.store:
+            await self.store.close()
+        logger.info("🔒 Webhook dispatcher finalizado.")
+
+    def is_running(self) -> bool:
+        return bool(self.workers) and not self._stopping
+
+    async def backlog(self) -> int:
+        """
+        Quantidade de entregas pendentes no outbox
+        """
+        return await self.store.pending_count() if self.store else 0
+
+    async def enqueue(self, form_data: dict, html_content: str) -> Optional[int]:
+        """
+        Grava a entrega no outbox e acorda os workers. Retorna o id do item
+        """
+        if not self.is_running():
+            logger.warning("⚠️  Webhook dispatcher não iniciado, entrega descartada")
+            return None
+
+        try:
+            item_id = await self.store.add(build_webhook_payload(form_data, html_content))
+        except Exception as e:
+            logger.error(f"❌ Erro ao gravar entrega no outbox: {e}")
+            return None
+        self._wakeup.set()
+        return item_id
+
+    async def replay_dead_letter(self, dead_letter_id: int) -> Optional[int]:
+        """
+        Move um item da dead-letter de volta para o outbox
+        """
+        item_id = await self.store.replay(dead_letter_id)
+        if item_id is not None:
+            logger.info(f"🔁 Dead-letter {dead_letter_id} reenfileirado como item {item_id}")
+            self._wakeup.set()
+        return item_id
+
+    async def list_dead_letters(self, limit: int = 50) -> List[Dict[str, Any]]:
+        return await self.store.list_dead_letters(limit)
+
+    def send_budget_seconds(self) -> float:
+        """
+        Tempo máximo de um POST: o httpx aplica o timeout a cada fase
+        (pool, connect, write, read), então o pior caso é a soma das quatro
+        """
+        return 4 * self.timeout_seconds
+
+    def lease_seconds(self) -> float:
+        """
+        Lease de um item do outbox: cobre a geração do PDF (incluindo a espera
+        por outros workers na fila do pdf_renderer), o POST completo e uma folga
+        """
+        pdf_budget = 0.0
+        if pdf_renderer.is_running():
+            queued = -(-self.num_workers // max(1, pdf_renderer.max_concurrency))
+            pdf_budget = queued * (pdf_renderer.timeout_seconds + 5)
+        return pdf_budget + self.send_budget_seconds() + LEASE_MARGIN_SECONDS
+
+    def backoff_delay(self, attempts: int) -> float:
+        """
+        Backoff exponencial com "full jitter": aleatório entre 0 e base * 2^tentativas
+        """
+        return random.uniform(0, min(self.backoff_max_seconds, self.backoff_base_seconds * (2 ** attempts)))
+
+    async def send(self, payload: Dict[str, Any]):
+        """
+        Envia um payload para o webhook usando o cliente compartilhado
+        """
+        logger.info("📤 Enviando dados completos (form_data + HTML) para o webhook...")
+        try:
+            with stage_timer(STAGE_WEBHOOK_DELIVERY):
+                response = await asyncio.wait_for(
+                    self.client.post(self.webhook_url, json=payload), self.send_budget_seconds()
+                )
+        except (httpx.TimeoutException, asyncio.TimeoutError):
+            raise WebhookDeliveryError(f"timeout de {self.timeout_seconds}s")
+        except httpx.HTTPError as e:
+            raise WebhookDeliveryError(f"{type(e).__name__}: {e}")
+
+        if not response.is_success:
+            raise WebhookDeliveryError(f"HTTP {response.status_code}: {response.text[:500]}")
+        logger.info("✅ Dados enviados com sucesso para o webhook!")
+
+    async def _attach_pdf(self, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """
+        Anexa o PDF se a geração estiver ligada; em caso de falha envia só o HTML
+        """
+        if not pdf_renderer.is_running() or "pdf_data" in payload:
+            return payload
+        try:
+            return with_pdf_attachment(payload, await pdf_renderer.render(payload["html_content"]))
+        except (asyncio.TimeoutError, PdfTimeoutError):
+            logger.error(f"⏱️  PDF excedeu o timeout de {pdf_renderer.timeout_seconds}s, enviando só o HTML")
+        except Exception as e:
+            logger.error(f"❌ Erro ao gerar PDF, enviando só o HTML: {type(e).__name__}: {e}")
+        return payload
+
+    async def _deliver(self, item_id: int, payload: Dict[str, Any], attempts: int):
+        with_pdf = await self._attach_pdf(payload)
+        try:
+            await self.send(with_pdf)
+        except WebhookDeliveryError as e:
+            attempts += 1
+            if attempts >= self.max_attempts:
+                logger.error(f"💀 Item {item_id} movido para dead-letter após {attempts} tentativas: {e}")
+                await self.store.dead_letter(item_id, attempts, str(e))
+            else:
+                delay = self.backoff_delay(attempts)
+                logger.warning(f"⚠️  Falha no item {item_id} (tentativa {attempts}): {e}. Nova tentativa em {delay:.1f}s")
+                # O PDF gerado nesta tentativa fica no outbox: as próximas não o geram de novo
+                await self.store.reschedule(item_id, attempts, delay, str(e), with_pdf if with_pdf is not payload else None)
+            return
+        await self.store.mark_delivered(item_id)
+
+    async def _worker(self, worker_id: int):
+        # O lease cobre a entrega inteira (PDF + POST): expirar no meio dela
+        # faria outro worker reservar o item e enviar o mesmo lead duas vezes.
+        # Se o processo morrer no meio do envio, o item volta a ficar disponível depois disso
+        lease_seconds = self.lease_seconds()
+        while True:
+            self._wakeup.clear()
+            try:
+                items = await self.store.claim_due(1, lease_seconds)
+            except Exception as e:
+                logger.error(f"❌ Erro ao ler o outbox (worker {worker_id}): {e}")
+                items = []
+
+            if not items:
+                if self._stopping:
+                    return
+                try:
+                    await asyncio.wait_for(self._wakeup.wait(), self.poll_interval_seconds)
+                except asyncio.TimeoutError:
+                    pass
+                continue
+
+            for item_id, payload, attempts in items:
+                try:
+                    await self._deliver(item_id, payload, attempts)
+                except Exception as e:
+                    logger.error(f"❌ Erro ao processar item {item_id} do outbox: {e}")
+
+
+# Instância global
+webhook_dispatcher = WebhookDispatcher()